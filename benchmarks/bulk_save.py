@@ -0,0 +1,63 @@
+"""How request signing and bulk saves scale with the number of worker
+threads. OpenSSL does the RSA work without holding the GIL, so signing
+throughput should grow with threads up to the number of cores.
+
+Run from a checkout with ``python benchmarks/bulk_save.py``.
+"""
+import datetime
+import multiprocessing
+import os
+import time
+from multiprocessing.pool import ThreadPool
+
+from chef.api import ChefAPI
+from chef.auth import RequestSigner
+from chef.base import ChefObject
+from chef.node import Node
+from chef.rsa import Key
+from stub_server import start_server
+
+TEST_ROOT = os.path.join(os.path.dirname(__file__), '..', 'chef', 'tests')
+KEY_PATH = os.path.join(TEST_ROOT, 'client.pem')
+SIGNATURES = 8000
+NODES = 2000
+
+
+def bench_sign(signer, threads):
+    timestamp = datetime.datetime.utcnow()
+    paths = ['/organizations/bench/nodes/node%d' % i for i in range(SIGNATURES)]
+    pool = ThreadPool(threads)
+    try:
+        start = time.time()
+        pool.map(lambda path: signer.sign('PUT', path, '{}', timestamp), paths, chunksize=100)
+        return SIGNATURES / (time.time() - start)
+    finally:
+        pool.close()
+
+
+def bench_save(api, threads):
+    nodes = [Node('node%d' % i, api=api, skip_load=True) for i in range(NODES)]
+    start = time.time()
+    errors = ChefObject.save_many(nodes, concurrency=threads)
+    assert not errors, errors
+    return NODES / (time.time() - start)
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    counts = sorted(set([1, 2, 4, cores, cores * 2]))
+    print('%d cores' % cores)
+    signer = RequestSigner(Key(KEY_PATH), 'bench')
+    for threads in counts:
+        print('%-16s %8.0f sig/s' % ('sign x%d' % threads, bench_sign(signer, threads)))
+    server = start_server(key_lookup=lambda name: Key(os.path.join(TEST_ROOT, 'client_spki.pem')))
+    try:
+        for threads in counts:
+            with ChefAPI(server.url, KEY_PATH, 'bench', pool_size=threads) as api:
+                print('%-16s %8.1f node/s' % ('save_many x%d' % threads, bench_save(api, threads)))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Merged attribute dicts per second for Ohai-sized nodes, comparing
+deep_merge with a recursive merge that copies every subtree.
+
+Run from a checkout with ``python benchmarks/deep_merge.py``.
+"""
+import json
+import time
+
+from chef.node import Node
+from chef.utils.merge import deep_merge
+from node_data import make_node
+
+NODES = 20
+ROUNDS = 20
+
+
+def copying_merge(*dicts):
+    merged = {}
+    for d in dicts:
+        for key, value in d.items():
+            if isinstance(value, dict):
+                value = copying_merge(merged.get(key) if isinstance(merged.get(key), dict) else {}, value)
+            merged[key] = value
+    return merged
+
+
+def bench(nodes, fn):
+    start = time.time()
+    for i in range(ROUNDS):
+        for node in nodes:
+            fn(node)
+    return ROUNDS * len(nodes) / (time.time() - start)
+
+
+def main():
+    docs = [make_node(i, packages=3000) for i in range(NODES)]
+    print('%.0f kB per node' % (sum(len(json.dumps(doc)) for doc in docs) / NODES / 1024.0))
+    nodes = [Node.from_search(doc) for doc in docs]
+    levels = lambda node: reversed(node.attributes.search_path)
+    print('%-16s %8.0f node/s' % ('copying merge', bench(nodes, lambda node: copying_merge(*levels(node)))))
+    print('%-16s %8.0f node/s' % ('deep_merge', bench(nodes, lambda node: deep_merge(*levels(node)))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Expanding the run lists of 10k nodes that share 40 roles, with a new
+RoleCache for every node and with one shared between all of them.
+
+A stub server answers ``/roles/<name>`` with a role that includes
+``role[base]`` and has a run list of its own for ``prod``, and counts the
+requests it gets. Without sharing, only the first 500 nodes are expanded.
+
+Run from a checkout with ``python benchmarks/expand.py``.
+"""
+import os
+import random
+import time
+
+from chef.api import ChefAPI
+from chef.node import Node
+from chef.run_list import RoleCache
+from node_data import make_node
+from stub_server import StubHandler, start_server
+
+KEY_PATH = os.path.join(os.path.dirname(__file__), '..', 'chef', 'tests', 'client.pem')
+NODES = 10000
+ROLES = 40
+UNSHARED = 500
+
+
+class RoleHandler(StubHandler):
+    requests = 0
+
+    def do_GET(self):
+        RoleHandler.requests += 1
+        name = self.path.rsplit('/', 1)[-1]
+        if '/environments/' in self.path:
+            return self.send_json(200, {'name': name, 'default_attributes': {'ntp': {'servers': ['ntp.%s' % name]}},
+                                        'override_attributes': {}})
+        run_list = [] if name == 'base' else ['role[base]', 'recipe[%s]' % name]
+        self.send_json(200, {'name': name, 'run_list': run_list,
+                             'env_run_lists': {'prod': run_list + ['recipe[%s::prod]' % name]},
+                             'default_attributes': {name: {'port': 8000, 'enabled': True}},
+                             'override_attributes': {'ntp': {'servers': ['ntp.%s' % name]}}})
+
+
+def make_nodes(api):
+    rng = random.Random(1)
+    nodes = []
+    for i in range(NODES):
+        data = make_node(i, packages=5)
+        data['run_list'] = ['role[role%d]' % n for n in rng.sample(range(ROLES), 3)]
+        nodes.append(Node.from_search(data, api=api))
+    return nodes
+
+
+def expand(nodes, shared):
+    cache = RoleCache(nodes[0].api)
+    for node in nodes:
+        node.expand(cache if shared else None).attributes.get_dotted('ntp.servers')
+
+
+def main():
+    server = start_server(RoleHandler)
+    api = ChefAPI(server.url, KEY_PATH, 'bench')
+    nodes = make_nodes(api)
+    for shared, count in ((False, UNSHARED), (True, NODES)):
+        RoleHandler.requests = 0
+        start = time.time()
+        expand(nodes[:count], shared)
+        elapsed = time.time() - start
+        print('%-10s %6d nodes %8.3f ms/node %8d requests' % ('shared' if shared else 'per node', count,
+                                                               elapsed * 1000.0 / count, RoleHandler.requests))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Attribute values read per second from node search rows, through Node
+objects and get_dotted, and with extract.
+
+Run from a checkout with ``python benchmarks/extract.py``.
+"""
+import time
+
+from chef.node import AttributePath, Node, extract
+from node_attributes import PATHS
+from node_data import make_node
+
+NODES = 20000
+
+
+def bench(fn, rows):
+    start = time.time()
+    fn(rows)
+    return NODES * len(PATHS) / (time.time() - start)
+
+
+def get_dotted(rows):
+    paths = [AttributePath(path) for path in PATHS]
+    results = []
+    for row in rows:
+        attributes = Node.from_search(row).attributes
+        values = []
+        for path in paths:
+            try:
+                values.append(attributes.get_dotted(path))
+            except KeyError:
+                values.append(None)
+        results.append(tuple(values))
+    return results
+
+
+def main():
+    rows = [make_node(i, packages=50) for i in range(NODES)]
+    print('%-16s %8.0f attr/s' % ('get_dotted', bench(get_dotted, rows)))
+    print('%-16s %8.0f attr/s' % ('extract', bench(lambda rows: extract(rows, PATHS), rows)))
+    print('%-16s %8.0f attr/s' % ('extract columns', bench(lambda rows: extract(rows, PATHS, columns=True), rows)))
+
+
+if __name__ == '__main__':
+    main()
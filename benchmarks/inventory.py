@@ -0,0 +1,70 @@
+"""Building an inventory of 100k partial search rows, and a count and a
+percentile grouped by platform over it, compared with the same report done
+with a Python loop over the rows. Runs with NumPy if it is installed and
+with the array fallback.
+
+Run from a checkout with ``python benchmarks/inventory.py``.
+"""
+import collections
+import random
+import time
+
+import mock
+
+from chef import inventory as inventory_module
+from chef.inventory import Inventory
+
+NODES = 100000
+COLUMNS = ['name', 'platform', 'uptime_seconds', 'cpu.total']
+
+
+def make_rows():
+    rng = random.Random(1)
+    return [{'name': 'node%d' % i,
+             'platform': rng.choice(['ubuntu', 'centos', 'debian']),
+             'uptime_seconds': rng.randint(0, 10**7),
+             'cpu.total': rng.choice([2, 4, 8, None])}
+            for i in range(NODES)]
+
+
+def loop_report(rows):
+    counts = collections.Counter()
+    uptimes = collections.defaultdict(list)
+    for row in rows:
+        platform = row.get('platform')
+        if platform is None:
+            continue
+        counts[platform] += 1
+        if row.get('uptime_seconds') is not None:
+            uptimes[platform].append(row['uptime_seconds'])
+    return counts, dict((key, inventory_module._percentile(values, 95)) for key, values in uptimes.items())
+
+
+def inventory_report(inv):
+    return inv.count(by='platform'), inv.percentile('uptime_seconds', 95, by='platform')
+
+
+def timed(fn, *args):
+    start = time.time()
+    result = fn(*args)
+    return result, (time.time() - start) * 1000.0
+
+
+def main():
+    rows = make_rows()
+    expected, elapsed = timed(loop_report, rows)
+    print('%-24s %8.1f ms' % ('python loop report', elapsed))
+    backends = [('array', None)]
+    if inventory_module.numpy is not None:
+        backends.insert(0, ('numpy', inventory_module.numpy))
+    for name, numpy in backends:
+        with mock.patch.object(inventory_module, 'numpy', numpy):
+            inv, elapsed = timed(Inventory.from_rows, rows, COLUMNS)
+            print('%-24s %8.1f ms' % ('%s build' % name, elapsed))
+            result, elapsed = timed(inventory_report, inv)
+            print('%-24s %8.1f ms' % ('%s report' % name, elapsed))
+            assert result == expected, (result, expected)
+
+
+if __name__ == '__main__':
+    main()
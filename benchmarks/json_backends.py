@@ -0,0 +1,44 @@
+"""Encode and decode throughput of each available JSON backend.
+
+Run from a checkout with ``python benchmarks/json_backends.py``.
+"""
+import time
+
+from chef import Node
+from chef.utils import json
+from node_data import make_node
+
+NODES = 200
+
+
+def bench(fn, items):
+    start = time.time()
+    for item in items:
+        fn(item)
+    return len(items) / (time.time() - start)
+
+
+def main():
+    docs = [make_node(i) for i in range(NODES)]
+    nodes = []
+    for doc in docs:
+        node = Node(doc['name'], skip_load=True)
+        node.exists = True
+        node._populate(dict(doc))
+        nodes.append(node)
+    json.use('json')
+    encoded = [json.dumps(doc) for doc in docs]
+    print('%d nodes, %.0f KB average' % (NODES, sum(map(len, encoded)) / NODES / 1024.0))
+    print('%-10s %14s %14s %14s' % ('backend', 'decode/s', 'encode dict/s', 'encode Node/s'))
+    for name, loader in json.backends:
+        try:
+            json.use(name)
+        except (ImportError, TypeError):
+            print('%-10s not available' % name)
+            continue
+        print('%-10s %14.0f %14.0f %14.0f' % (name, bench(json.loads, encoded),
+                                               bench(json.dumps, docs), bench(json.dumps, nodes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""ChefAPI objects created per second, with and without the shared key
+cache.
+
+Run from a checkout with ``python benchmarks/key_load.py``.
+"""
+import os
+import time
+
+from chef.api import ChefAPI
+from chef.rsa import key_cache
+
+KEY_PATH = os.path.join(os.path.dirname(__file__), '..', 'chef', 'tests', 'client.pem')
+APIS = 2000
+
+
+def bench(clear):
+    start = time.time()
+    for i in range(APIS):
+        if clear:
+            key_cache.clear()
+        ChefAPI('http://localhost:4000', KEY_PATH, 'bench')
+    return APIS / (time.time() - start)
+
+
+def main():
+    print('%-16s %8.0f api/s' % ('uncached', bench(True)))
+    print('%-16s %8.0f api/s' % ('cached', bench(False)))
+
+
+if __name__ == '__main__':
+    main()
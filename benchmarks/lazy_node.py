@@ -0,0 +1,74 @@
+"""Loading nodes to read their run lists, with and without ``lazy=True``.
+
+A stub server answers every GET with a synthetic node carrying a realistic
+amount of Ohai data. For each mode this reports the time per node, including
+the request, and the memory held by all of the loaded nodes.
+
+Finding where each level ends takes about as long as decoding it with the
+standard library, and somewhat longer than decoding it with orjson, so lazy
+loading is not expected to be faster per node. What it saves is building and
+keeping the decoded levels that are never read.
+
+Run from a checkout with ``python benchmarks/lazy_node.py``.
+"""
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+from chef.api import ChefAPI
+from chef.node import Node
+from node_data import make_node
+from stub_server import StubHandler, start_server
+
+KEY_PATH = os.path.join(os.path.dirname(__file__), '..', 'chef', 'tests', 'client.pem')
+NODES = 300
+PACKAGES = 600
+
+
+class NodeHandler(StubHandler):
+    body = None
+
+    def do_GET(self):
+        body = self.body
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def load(api, lazy):
+    nodes = [Node('node%d' % i, api=api, lazy=lazy) for i in range(NODES)]
+    for node in nodes:
+        node.run_list, node.chef_environment
+    return nodes
+
+
+def main():
+    NodeHandler.body = json.dumps(make_node(1, packages=PACKAGES)).encode()
+    server = start_server(NodeHandler)
+    api = ChefAPI(server.url, KEY_PATH, 'bench')
+    print('%d nodes of %.1f KB' % (NODES, len(NodeHandler.body) / 1024.0))
+    for lazy in (False, True):
+        load(api, lazy)
+        gc.collect()
+        start = time.time()
+        nodes = load(api, lazy)
+        elapsed = time.time() - start
+        del nodes
+        gc.collect()
+        tracemalloc.start()
+        nodes = load(api, lazy)
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del nodes
+        print('%-6s %8.2f ms/node %8.1f MB' % ('lazy' if lazy else 'eager',
+                                             elapsed * 1000.0 / NODES, size / 1024.0 / 1024.0))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Attribute reads per second on loaded nodes.
+
+Run from a checkout with ``python benchmarks/node_attributes.py``.
+"""
+import time
+
+from chef.node import Node
+from node_data import make_node
+
+NODES = 20000
+PATHS = [
+    'fqdn', 'hostname', 'ipaddress', 'platform', 'platform_version', 'uptime_seconds',
+    'cloud.provider', 'cloud.public_hostname',
+    'memory.total', 'memory.free',
+    'kernel.name', 'kernel.release', 'kernel.machine',
+    'kernel.modules.mod1.size', 'kernel.modules.mod2.size', 'kernel.modules.mod3.refcount',
+    'network.interfaces.eth0.state', 'network.interfaces.eth0.mtu', 'network.interfaces.lo.state',
+    'filesystem./dev/xvda.kb_size', 'filesystem./dev/xvda.mount', 'filesystem./dev/xvdb.fs_type',
+    'cpu.0.model_name', 'cpu.0.mhz', 'cpu.1.mhz',
+    'packages.package-1.version', 'packages.package-2.version',
+    'ntp.servers', 'app.version', 'tags',
+]
+
+
+def bench(nodes):
+    paths = [path.split('.') for path in PATHS]
+    start = time.time()
+    for node in nodes:
+        for path in paths:
+            value = node.attributes
+            for key in path:
+                value = value[key]
+        len(node.attributes['kernel']['modules'])
+        list(node.attributes['packages'])
+    return len(nodes) * len(PATHS) / (time.time() - start)
+
+
+def main():
+    nodes = [Node.from_search(make_node(i, packages=50)) for i in range(NODES)]
+    print('%-16s %8.0f attr/s' % ('first read', bench(nodes)))
+    print('%-16s %8.0f attr/s' % ('second read', bench(nodes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Synthetic node documents shaped like what chef-client and Ohai report."""
+import random
+
+
+def ohai(i, packages=600, rng=None):
+    rng = rng or random.Random(i)
+    ip = '10.%d.%d.%d' % (i // 65536 % 256, i // 256 % 256, i % 256)
+    return {
+        'fqdn': 'node%d.example.com' % i,
+        'hostname': 'node%d' % i,
+        'ipaddress': ip,
+        'platform': rng.choice(['ubuntu', 'centos', 'debian']),
+        'platform_version': rng.choice(['16.04', '18.04', '7.4', '9.1']),
+        'uptime_seconds': rng.randint(0, 10**7),
+        'cloud': {'provider': 'ec2', 'public_hostname': 'ec2-%d.compute.amazonaws.com' % i},
+        'cpu': dict(('%d' % n, {'model_name': 'Intel(R) Xeon(R) CPU', 'mhz': '2400.000', 'cache_size': '30720 KB',
+                                 'flags': ['fpu', 'vme', 'de', 'pse', 'tsc', 'msr', 'pae', 'mce', 'sse4_2', 'avx']})
+                    for n in range(rng.choice([2, 4, 8]))),
+        'memory': {'total': '%dkB' % (rng.choice([4, 8, 16, 32]) * 1048576), 'free': '%dkB' % rng.randint(0, 10**6)},
+        'kernel': {
+            'name': 'Linux', 'release': '4.4.0-%d-generic' % rng.randint(1, 200), 'machine': 'x86_64',
+            'modules': dict(('mod%d' % n, {'size': str(rng.randint(1000, 99999)), 'refcount': str(rng.randint(0, 9))})
+                            for n in range(80)),
+        },
+        'network': {'interfaces': {
+            'eth0': {'addresses': {ip: {'family': 'inet', 'prefixlen': '24', 'netmask': '255.255.255.0'}},
+                     'state': 'up', 'mtu': '9001', 'flags': ['BROADCAST', 'MULTICAST', 'UP']},
+            'lo': {'addresses': {'127.0.0.1': {'family': 'inet', 'prefixlen': '8'}}, 'state': 'unknown'},
+        }},
+        'filesystem': dict(('/dev/xvd%s' % chr(97 + n), {'kb_size': str(rng.randint(10**6, 10**9)), 'fs_type': 'ext4',
+                                                          'mount': '/mnt/%d' % n, 'percent_used': '%d%%' % rng.randint(0, 100)})
+                           for n in range(6)),
+        'packages': dict(('package-%d' % n, {'version': '1.%d.%d' % (n % 7, rng.randint(0, 30)), 'arch': 'amd64'})
+                         for n in range(packages)),
+    }
+
+
+def make_node(i, packages=600):
+    """Return the JSON document for node number ``i``."""
+    rng = random.Random(i)
+    role = rng.choice(['web', 'db', 'cache', 'worker'])
+    return {
+        'name': 'node%d' % i,
+        'json_class': 'Chef::Node',
+        'chef_type': 'node',
+        'chef_environment': rng.choice(['prod', 'staging']),
+        'run_list': ['role[base]', 'role[%s]' % role],
+        'automatic': ohai(i, packages, rng),
+        'default': {'ntp': {'servers': ['0.pool.ntp.org', '1.pool.ntp.org']}, role: {'port': rng.choice([80, 5432, 6379])}},
+        'normal': {'tags': [role], 'app': {'version': '2.%d' % rng.randint(0, 9)}},
+        'override': {'ntp': {'servers': ['ntp.internal']}},
+    }
@@ -0,0 +1,51 @@
+"""Memory held by 10k synthetic nodes, measured with tracemalloc.
+
+Every node is decoded from its own JSON document, as when nodes are loaded
+one by one, so nothing is shared between them up front.
+
+Run from a checkout with ``python benchmarks/node_memory.py``.
+"""
+import gc
+import json
+import tracemalloc
+
+from chef.node import Node
+from chef.search import SearchRow
+from node_data import make_node
+
+NODES = 10000
+
+
+def measure(build):
+    docs = [json.dumps(make_node(i, packages=50)) for i in range(NODES)]
+    gc.collect()
+    tracemalloc.start()
+    objs = build(docs)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return size / 1024.0 / 1024.0
+
+
+def nodes(docs):
+    return [Node.from_search(json.loads(doc)) for doc in docs]
+
+
+def compact_nodes(docs):
+    return [Node.from_search(json.loads(doc)).compact() for doc in docs]
+
+
+def rows(docs):
+    return [SearchRow(json.loads(doc), None) for doc in docs]
+
+
+def main():
+    print('%-16s %8.1f MB' % ('search rows', measure(rows)))
+    print('%-16s %8.1f MB' % ('nodes', measure(nodes)))
+    if hasattr(Node, 'compact'):
+        print('%-16s %8.1f MB' % ('compact nodes', measure(compact_nodes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Compare requests per second with and without connection pooling.
+
+Run from a checkout with ``python benchmarks/pool.py``.
+"""
+import os
+import time
+
+import requests
+
+from chef.api import ChefAPI
+from stub_server import start_server
+
+KEY_PATH = os.path.join(os.path.dirname(__file__), '..', 'chef', 'tests', 'client.pem')
+REQUESTS = 2000
+
+
+class UnpooledChefAPI(ChefAPI):
+    """The pre-pooling behavior, a new connection for every request."""
+
+    def _request(self, method, url, data, headers, stream=False):
+        return requests.api.request(method, url, headers=headers, data=data, verify=self.ssl_verify, stream=stream)
+
+
+def bench(api):
+    start = time.time()
+    for i in range(REQUESTS):
+        api['/nodes/node%d' % i]
+    return REQUESTS / (time.time() - start)
+
+
+def main():
+    server = start_server()
+    try:
+        for cls in (UnpooledChefAPI, ChefAPI):
+            with cls(server.url, KEY_PATH, 'bench') as api:
+                print('%-16s %8.1f req/s' % (cls.__name__, bench(api)))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Queries per second against a local SearchIndex of synthetic nodes, the
+first time a query is run and when it is repeated.
+
+Run from a checkout with ``python benchmarks/search_index.py``.
+"""
+import time
+
+from chef.index import SearchIndex
+from node_data import make_node
+
+NODES = 5000
+QUERIES = [
+    'role:web AND chef_environment:prod',
+    'platform:ubuntu OR platform:debian',
+    'name:node1* AND NOT role:db',
+    'uptime_seconds:[0 TO 5000000]',
+    'tags:cache && platform_version:16.04',
+]
+
+
+def main():
+    docs = [make_node(i, packages=50) for i in range(NODES)]
+    start = time.time()
+    index = SearchIndex(docs)
+    print('%-20s %8.2f s for %d nodes' % ('build', time.time() - start, NODES))
+    for q in QUERIES:
+        index._cache.clear()
+        start = time.time()
+        count = index.count(q)
+        first = time.time() - start
+        repeats = 10000
+        start = time.time()
+        for i in range(repeats):
+            index.count(q)
+        repeated = (time.time() - start) / repeats
+        print('%-40s %5d rows  first %8.2f ms  repeated %6.2f us' % (q, count, first * 1000.0, repeated * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Building the objects of a 10k-row search page, one row at a time through
+SearchRow.object and all at once with Search.objects().
+
+The page is set on the search directly so only the object construction is
+timed, for rows of nodes and of data bag items.
+
+Run from a checkout with ``python benchmarks/search_objects.py``.
+"""
+import os
+import time
+
+from chef.api import ChefAPI
+from chef.search import Search
+from node_data import make_node
+
+KEY_PATH = os.path.join(os.path.dirname(__file__), '..', 'chef', 'tests', 'client.pem')
+ROWS = 10000
+REPEATS = 5
+
+
+def make_item(i):
+    return {'name': 'data_bag_item_users_user%d' % i, 'json_class': 'Chef::DataBagItem',
+            'chef_type': 'data_bag_item', 'data_bag': 'users',
+            'raw_data': {'id': 'user%d' % i, 'shell': '/bin/bash', 'groups': ['staff']}}
+
+
+def by_row(search):
+    return [row.object for row in search]
+
+
+def by_page(search):
+    return search.objects()
+
+
+def best(fn, search):
+    times = []
+    for i in range(REPEATS):
+        start = time.time()
+        fn(search)
+        times.append(time.time() - start)
+    return min(times) * 1000.0
+
+
+def main():
+    api = ChefAPI('https://chef.example.com', KEY_PATH, 'bench')
+    for index, make_row in (('node', lambda i: make_node(i, packages=5)), ('data', make_item)):
+        search = Search(index, rows=ROWS, api=api)
+        search._data = {'total': ROWS, 'start': 0, 'rows': [make_row(i) for i in range(ROWS)]}
+        row_ms = best(by_row, search)
+        page_ms = best(by_page, search)
+        print('%-5s SearchRow.object %8.1f ms  Search.objects() %8.1f ms  %.1fx' % (
+            index, row_ms, page_ms, row_ms / page_ms))
+
+
+if __name__ == '__main__':
+    main()
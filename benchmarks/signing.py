@@ -0,0 +1,34 @@
+"""Request signatures per second.
+
+Run from a checkout with ``python benchmarks/signing.py``.
+"""
+import datetime
+import os
+import time
+
+from chef.auth import RequestSigner, sign_request
+from chef.rsa import Key
+
+KEY_PATH = os.path.join(os.path.dirname(__file__), '..', 'chef', 'tests', 'client.pem')
+SIGNATURES = 5000
+
+
+def bench(fn):
+    timestamp = datetime.datetime.utcnow()
+    start = time.time()
+    for i in range(SIGNATURES):
+        fn('/organizations/bench/nodes/node%d' % i, timestamp)
+    return SIGNATURES / (time.time() - start)
+
+
+def main():
+    key = Key(KEY_PATH)
+    signer = RequestSigner(key, 'bench')
+    print('%-16s %8.0f sig/s' % ('sign_request', bench(
+        lambda path, ts: sign_request(key, 'GET', path, None, 'chef', ts, 'bench'))))
+    print('%-16s %8.0f sig/s' % ('RequestSigner', bench(
+        lambda path, ts: signer.sign('GET', path, None, ts))))
+
+
+if __name__ == '__main__':
+    main()
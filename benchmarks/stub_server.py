@@ -0,0 +1,71 @@
+"""A minimal local stand-in for a Chef server, used by the benchmarks.
+
+Every GET is answered with a small JSON document and every PUT or POST echoes
+its body back, using HTTP/1.1 keep-alive so clients are free to reuse
+connections. If the server has a ``key_lookup``, requests are authenticated
+with :func:`chef.auth.verify_request` first, and refused with a 401 like a
+real Chef server would.
+"""
+import json
+import threading
+
+from six.moves import BaseHTTPServer, socketserver
+
+from chef.auth import verify_request
+from chef.exceptions import ChefAuthenticationError
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        try:
+            self.authenticate()
+        except ChefAuthenticationError as e:
+            return self.send_json(401, {'error': [str(e)]})
+        self.send_json(200, {'name': self.path.rsplit('/', 1)[-1]})
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            self.authenticate(body)
+        except ChefAuthenticationError as e:
+            return self.send_json(401, {'error': [str(e)]})
+        self.send_json(200, json.loads(body.decode() or '{}'))
+
+    do_POST = do_PUT
+
+    def authenticate(self, body=None):
+        if self.server.key_lookup is not None:
+            verify_request(self.headers, self.command, self.path, body, self.server.key_lookup)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    key_lookup = None
+
+    @property
+    def url(self):
+        return 'http://%s:%s' % self.server_address[:2]
+
+
+def start_server(handler=StubHandler, key_lookup=None):
+    """Start a stub server on a free local port in a background thread."""
+    server = StubServer(('127.0.0.1', 0), handler)
+    server.key_lookup = key_lookup
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
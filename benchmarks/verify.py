@@ -0,0 +1,57 @@
+"""Request signature verifications per second, and requests per second
+against a stub server that authenticates every request.
+
+Run from a checkout with ``python benchmarks/verify.py``.
+"""
+import datetime
+import os
+import time
+
+from chef.api import ChefAPI
+from chef.auth import PublicKeyCache, RequestSigner, verify_request
+from chef.rsa import Key
+from stub_server import start_server
+
+TEST_ROOT = os.path.join(os.path.dirname(__file__), '..', 'chef', 'tests')
+KEY_PATH = os.path.join(TEST_ROOT, 'client.pem')
+VERIFICATIONS = 5000
+REQUESTS = 2000
+
+
+def public_key(name):
+    return open(os.path.join(TEST_ROOT, 'client_spki.pem')).read()
+
+
+def bench_verify(version, keys):
+    signer = RequestSigner(Key(KEY_PATH), 'bench', version)
+    now = datetime.datetime.utcnow()
+    signed = [(path, signer.sign('GET', path, None, now))
+              for path in ('/organizations/bench/nodes/node%d' % i for i in range(VERIFICATIONS))]
+    start = time.time()
+    for path, headers in signed:
+        verify_request(headers, 'GET', path, None, keys, now=now)
+    return VERIFICATIONS / (time.time() - start)
+
+
+def bench_server(keys):
+    server = start_server(key_lookup=keys)
+    try:
+        with ChefAPI(server.url, KEY_PATH, 'bench') as api:
+            start = time.time()
+            for i in range(REQUESTS):
+                api['/nodes/node%d' % i]
+            return REQUESTS / (time.time() - start)
+    finally:
+        server.shutdown()
+
+
+def main():
+    keys = PublicKeyCache(public_key)
+    for version in ('1.0', '1.3'):
+        print('%-16s %8.0f verify/s' % ('verify ' + version, bench_verify(version, keys)))
+    print('%-16s %8.0f verify/s' % ('uncached keys', bench_verify('1.0', lambda name: Key(public_key(name).encode()))))
+    print('%-16s %8.1f req/s' % ('authenticated', bench_server(keys)))
+
+
+if __name__ == '__main__':
+    main()
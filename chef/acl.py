@@ -2,6 +2,7 @@ import pkg_resources
 from chef.api import ChefAPI
 from chef.exceptions import ChefObjectTypeError
 from chef.permissions import Permissions
+from chef.utils import json
 
 
 class Acl(object):
@@ -169,3 +170,5 @@ class Acl(object):
 
     def is_supported(self):
         return self.api.version_parsed >= self.version
+
+json.register_type(Acl, Acl.to_dict)
@@ -0,0 +1,150 @@
+"""An :mod:`asyncio` interface to a Chef server.
+
+This module requires Python 3.6 or newer and is not imported by :mod:`chef`
+itself.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import copy
+import functools
+import threading
+
+from chef.api import ChefAPI
+from chef.data_bag import DataBag
+from chef.search import Search, SearchRow
+
+try:
+    _get_running_loop = asyncio.get_running_loop
+except AttributeError: # Python 3.6
+    _get_running_loop = asyncio.get_event_loop
+
+
+def _private_api(api, pool_size):
+    # A copy of api with a connection pool of its own, so resizing it does
+    # not touch the connections of the original
+    api = copy.copy(api)
+    api.pool_size = pool_size
+    api._session = None
+    api._session_lock = threading.Lock()
+    return api
+
+
+class AsyncChefAPI(object):
+    """An awaitable wrapper around a :class:`~chef.ChefAPI`.
+
+    Requests are signed by the wrapped API in the same way as any other
+    request, and run on a pool of ``concurrency`` workers so that many
+    requests can be in flight at once from a single event loop::
+
+        async with AsyncChefAPI(ChefAPI(...), concurrency=200) as api:
+            nodes = await api.load_many(Node, names)
+            async for row in api.search('node', 'roles:web'):
+                print(row['name'])
+
+    If the connection pool of the wrapped API is smaller than
+    ``concurrency``, requests go through a copy of it with a pool of
+    ``concurrency`` connections, so every worker can keep its connection
+    alive. The API passed in is left as it is, and objects loaded through
+    this wrapper are bound to the copy, available as :attr:`api`.
+
+    .. versionadded:: 0.4
+    """
+
+    def __init__(self, api=None, concurrency=100):
+        api = api or ChefAPI.get_global()
+        self._private = api.pool_size < concurrency
+        if self._private:
+            api = _private_api(api, concurrency)
+        self.api = api
+        self.concurrency = concurrency
+        self._executor = concurrent.futures.ThreadPoolExecutor(concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        """Shut down the worker pool, and the connections of the private
+        copy of the API if one was made. The API passed in is left open.
+        """
+        self._executor.shutdown(wait=False)
+        if self._private:
+            self.api.close()
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = _get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def request(self, method, path, headers={}, data=None):
+        return await self._run(self.api.request, method, path, headers, data)
+
+    async def api_request(self, method, path, headers={}, data=None):
+        return await self._run(self.api.api_request, method, path, headers, data)
+
+    def __getitem__(self, path):
+        return self.api_request('GET', path)
+
+    async def load(self, cls, name):
+        """Load a single object of the given :class:`~chef.base.ChefObject`
+        subclass.
+        """
+        return await self._run(cls, name, api=self.api)
+
+    async def load_many(self, cls, names):
+        """Load many objects concurrently. Returns a dict of name to object."""
+        names = list(names)
+        objs = await asyncio.gather(*[self.load(cls, name) for name in names])
+        return dict(zip(names, objs))
+
+    async def save(self, obj):
+        """Save an object, as with :meth:`ChefObject.save <chef.base.ChefObject.save>`."""
+        await self._run(obj.save, self.api)
+
+    async def delete(self, obj):
+        """Delete an object, as with :meth:`ChefObject.delete <chef.base.ChefObject.delete>`."""
+        await self._run(obj.delete, self.api)
+
+    async def search(self, index, q='*:*', rows=1000):
+        """Iterate over every row matching a search, as :class:`~chef.search.SearchRow`
+        objects. After the first page, up to ``concurrency`` pages are
+        requested at once.
+        """
+        search = Search(index, q, rows=rows, api=self.api)
+        data = await self[search.url]
+        for row in data['rows']:
+            if row is not None:
+                yield SearchRow(row, self.api)
+        starts = iter(range(rows, data['total'], rows))
+        pending = collections.deque()
+        try:
+            while True:
+                while len(pending) < self.concurrency:
+                    start = next(starts, None)
+                    if start is None:
+                        break
+                    pending.append(asyncio.ensure_future(self[search.start(start).url]))
+                if not pending:
+                    break
+                data = await pending.popleft()
+                for row in data['rows']:
+                    if row is not None:
+                        yield SearchRow(row, self.api)
+        finally:
+            # Stop fetching pages nobody will read if the caller stops early
+            for future in pending:
+                future.cancel()
+
+    async def data_bag_items(self, bag):
+        """Iterate over ``(name, item)`` pairs for every item in a data bag,
+        loading the items concurrently. Items are yielded in the order they
+        finish loading.
+        """
+        if not isinstance(bag, DataBag):
+            bag = await self._run(DataBag, bag, api=self.api)
+        futures = [self._run(bag.obj_class, name, self.api) for name in bag.names]
+        for future in asyncio.as_completed(futures):
+            item = await future
+            yield item.name, item
@@ -1,19 +1,26 @@
+import collections
 import datetime
+import io
 import logging
 import os
 import re
 import socket
 import subprocess
+import tempfile
 import threading
+import time
 import weakref
 import six
 
 import pkg_resources
 
 import requests
+import requests.adapters
 
-from chef.auth import sign_request
+from chef.auth import RequestSigner
+from chef.cache import ResponseCache
 from chef.exceptions import ChefServerError
+from chef.retry import RetryPolicy
 from chef.rsa import Key
 from chef.utils import json
 from chef.utils.file import walk_backwards
@@ -37,6 +44,24 @@ class UnknownRubyExpression(Exception):
     """Token exception for unprocessed Ruby expressions."""
 
 
+def _seekable(fp):
+    try:
+        if hasattr(fp, 'seekable') and not fp.seekable():
+            return False
+        fp.tell()
+    except (IOError, OSError, ValueError):
+        return False
+    return True
+
+
+def _read_chunks(fp, size):
+    while True:
+        chunk = fp.read(size)
+        if not chunk:
+            break
+        yield chunk
+
+
 class ChefAPI(object):
     """The ChefAPI object is a wrapper for a single Chef server.
 
@@ -50,13 +75,54 @@ class ChefAPI(object):
 
             with ChefAPI('http://localhost:4000', 'client.pem', 'admin'):
                 n = Node('web1')
+
+    .. admonition:: Connection pooling
+
+        Each ChefAPI owns a :class:`requests.Session` so HTTP connections to
+        the server are kept alive and reused between requests. ``pool_size``
+        sets the maximum number of connections kept open to the server. The
+        connections are closed by :meth:`ChefAPI.close`, or when leaving the
+        ``with`` block if the API is used as a context manager.
+
+        .. versionadded:: 0.4
+
+    .. admonition:: Response caching
+
+        Passing ``cache=True`` (or a :class:`~chef.cache.ResponseCache`)
+        keeps GET responses and revalidates them with conditional requests.
+        Writes made through the same API invalidate the affected entries.
+
+        .. versionadded:: 0.4
+
+    .. admonition:: Retries
+
+        Passing ``retry=True`` (or a :class:`~chef.retry.RetryPolicy`) retries
+        idempotent requests that fail with a connection error or while the
+        server is shedding load.
+
+        .. versionadded:: 0.4
+
+    .. admonition:: Signing protocol
+
+        ``sign_version`` selects the version of the authentication protocol
+        used to sign requests, one of ``'1.0'`` (the default), ``'1.1'`` or
+        ``'1.3'``. Version 1.3 uses SHA-256 and also signs
+        ``server_api_version``. See :class:`~chef.auth.RequestSigner`.
+
+        .. versionadded:: 0.4
     """
 
     ruby_value_re = re.compile(r'#\{([^}]+)\}')
     env_value_re = re.compile(r'ENV\[(.+)\]')
     ruby_string_re = re.compile(r'^\s*(["\'])(.*?)\1\s*$')
 
-    def __init__(self, url, key, client, version='0.10.8', headers={}, ssl_verify=True):
+    stream_chunk_size = 64 * 1024
+
+    # Iterable request bodies larger than this are spooled to disk
+    spool_size = 1024 * 1024
+
+    def __init__(self, url, key, client, version='0.10.8', headers={}, ssl_verify=True, pool_size=10, cache=None, retry=None,
+                 sign_version='1.0', server_api_version=None):
         self.url = url.rstrip('/')
         self.parsed_url = six.moves.urllib.parse.urlparse(self.url)
         if not isinstance(key, Key):
@@ -65,11 +131,25 @@ class ChefAPI(object):
             raise ValueError("ChefAPI attribute 'key' was invalid.")
         self.key = key
         self.client = client
+        self.sign_version = sign_version
+        self.server_api_version = server_api_version
+        self._signer = None
+        # Build it now so an unsupported sign_version fails early
+        self.signer
         self.version = version
         self.headers = dict((k.lower(), v) for k, v in six.iteritems(headers))
         self.version_parsed = pkg_resources.parse_version(self.version)
         self.platform = self.parsed_url.hostname == 'api.opscode.com'
         self.ssl_verify = ssl_verify
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+        if cache is True:
+            cache = ResponseCache()
+        self.cache = cache
+        if retry is True:
+            retry = RetryPolicy()
+        self.retry = retry
         if not api_stack_value():
             self.set_default()
 
@@ -186,39 +266,208 @@ class ChefAPI(object):
 
     def __exit__(self, type, value, traceback):
         del api_stack_value()[-1]
+        self.close()
 
-    def _request(self, method, url, data, headers):
-        return requests.api.request(method, url, headers=headers, data=data, verify=self.ssl_verify)
-
-    def request(self, method, path, headers={}, data=None):
-        auth_headers = sign_request(key=self.key, http_method=method,
-            path=self.parsed_url.path+path.split('?', 1)[0], body=data,
-            host=self.parsed_url.netloc, timestamp=datetime.datetime.utcnow(),
-            user_id=self.client)
+    @property
+    def signer(self):
+        """The :class:`~chef.auth.RequestSigner` for the current ``key``,
+        ``client``, ``sign_version`` and ``server_api_version``. It is built
+        again when any of them is changed.
+        """
+        params = (self.key, self.client, self.sign_version, self.server_api_version)
+        cached = self._signer
+        if cached is None or cached[0] != params:
+            cached = self._signer = (params, RequestSigner(*params))
+        return cached[1]
+
+    @property
+    def session(self):
+        """The :class:`requests.Session` used to talk to the server. It is
+        created on first use, and again after :meth:`close`.
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.pool_size)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def close(self):
+        """Close all pooled connections to the server."""
+        with self._session_lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def _request(self, method, url, data, headers, stream=False):
+        return self.session.request(method, url, headers=headers, data=data, verify=self.ssl_verify, stream=stream)
+
+    def request(self, method, path, headers={}, data=None, stream=False):
+        """Make a signed request to the server and return the
+        :class:`requests.Response`.
+
+        The body can be a string, a file-like object or an iterator of byte
+        strings, such as a generator. Other iterables, like a dict or a
+        list, raise :exc:`TypeError`. File-like bodies are hashed in chunks
+        and streamed to the server from their current position without being
+        read into memory, and are rewound if the request is retried.
+        Iterators, and files that cannot be rewound or are open in text mode,
+        are first spooled to a temporary file, kept in memory while smaller
+        than ``spool_size`` bytes, and closed once the request is done.
+        """
+        body = self._request_body(data)
+        try:
+            return self._send(method, path, headers, body, stream)
+        finally:
+            if body is not data:
+                body.close()
+
+    def _send(self, method, path, headers, data, stream):
+        if hasattr(data, 'read'):
+            body_position = data.tell()
         request_headers = {}
         request_headers.update(self.headers)
         request_headers.update(dict((k.lower(), v) for k, v in six.iteritems(headers)))
         request_headers['x-chef-version'] = self.version
-        request_headers.update(auth_headers)
-        try:
-            response = self._request(method, self.url + path, data, dict(
-                (k.capitalize(), v) for k, v in six.iteritems(request_headers)))
-        except requests.ConnectionError as e:
-            raise ChefServerError(e.message)
-
-        if not response.ok:
-            raise ChefServerError.from_error(response.reason, code=response.status_code)
-
+        hashed_body = self.signer.hash_body(data)
+        start = time.time()
+        attempt = 0
+        status_codes = []
+        while True:
+            attempt += 1
+            # Sign every attempt so the timestamp is always fresh
+            request_headers.update(self.signer.sign(method,
+                self.parsed_url.path+path.split('?', 1)[0], data,
+                datetime.datetime.utcnow(), hashed_body=hashed_body))
+            response = error = None
+            if hasattr(data, 'read'):
+                data.seek(body_position)
+            try:
+                response = self._request(method, self.url + path, data, dict(
+                    (k.capitalize(), v) for k, v in six.iteritems(request_headers)), stream=stream)
+            except requests.ConnectionError as e:
+                error = ChefServerError(str(e))
+            else:
+                if response.ok:
+                    break
+                error = ChefServerError.from_error(response.reason, code=response.status_code)
+            if self.retry is None:
+                break
+            delay = self.retry.next_delay(method, attempt, time.time() - start, response)
+            if delay is None:
+                break
+            if response is not None:
+                status_codes.append(response.status_code)
+                # Give the connection back to the pool before waiting
+                response.close()
+            log.debug('Retrying %s %s in %.2fs after attempt %s failed: %s', method, path, delay, attempt, error)
+            time.sleep(delay)
+
+        retries = attempt - 1
+        if self.retry is not None:
+            self.retry.record(retries, status_codes, error is None)
+        if error is not None:
+            error.retries = retries
+            raise error
+        response.retries = retries
         return response
 
-    def api_request(self, method, path, headers={}, data=None):
+    def _request_body(self, data):
+        if data is None or isinstance(data, six.string_types + (six.binary_type,)):
+            return data
+        if hasattr(data, 'read'):
+            if _seekable(data) and not isinstance(data, io.TextIOBase):
+                return data
+            # A pipe or a text file, which has to be spooled as bytes
+            data = _read_chunks(data, self.stream_chunk_size)
+        elif not isinstance(data, collections.Iterator):
+            # A dict or list would otherwise be sent as its keys or items
+            raise TypeError('Request body must be a string, a file or an iterator of byte strings, not %s' %
+                            type(data).__name__)
+        # An iterator of chunks, which can only be read once
+        body = io.BytesIO()
+        for chunk in data:
+            if not isinstance(chunk, six.binary_type):
+                chunk = chunk.encode()
+            body.write(chunk)
+            if isinstance(body, io.BytesIO) and body.tell() > self.spool_size:
+                spooled = tempfile.TemporaryFile()
+                spooled.write(body.getvalue())
+                body = spooled
+        body.seek(0)
+        return body
+
+    def _api_request_args(self, headers, data):
         headers = dict((k.lower(), v) for k, v in six.iteritems(headers))
         headers['accept'] = 'application/json'
         if data is not None:
             headers['content-type'] = 'application/json'
-            data = json.dumps(data)
-        response = self.request(method, path, headers, data)
-        return response.json()
+            data = json.dumpb(data)
+        return headers, data
+
+    def api_request(self, method, path, headers={}, data=None, loads=json.loads):
+        """Make a request and decode the JSON response. A different decoding
+        function, such as :func:`chef.utils.json.loads_deferred`, can be
+        passed as ``loads``.
+        """
+        headers, data = self._api_request_args(headers, data)
+        if self.cache is None:
+            return loads(self.request(method, path, headers, data).content)
+        if method == 'GET':
+            return self._cached_get(path, headers, loads)
+        try:
+            return loads(self.request(method, path, headers, data).content)
+        finally:
+            self.cache.invalidate(path)
+
+    def iter_api_request(self, method, path, headers={}, data=None, stream=('rows',)):
+        """Like :meth:`api_request`, but decode the response while it is
+        still downloading. Yields ``(key, value)`` pairs for the members of
+        the returned JSON object, with arrays named in ``stream`` yielded one
+        element at a time. See :func:`chef.utils.json.iterload`.
+
+        .. versionadded:: 0.4
+        """
+        headers, data = self._api_request_args(headers, data)
+        response = self.request(method, path, headers, data, stream=True)
+        try:
+            for item in json.iterload(response.iter_content(self.stream_chunk_size), stream):
+                yield item
+        finally:
+            response.close()
+
+    def _cached_get(self, path, headers, loads=json.loads):
+        entry = self.cache.get(path)
+        if entry is not None:
+            if entry.etag:
+                headers['if-none-match'] = entry.etag
+            if entry.last_modified:
+                headers['if-modified-since'] = entry.last_modified
+        response = self.request('GET', path, headers)
+        if response.status_code == 304 and entry is not None:
+            # The body the validators came from, even if the entry has been
+            # evicted or has expired since it was looked up
+            body = entry.body
+            self.cache.set(path, body, entry.etag, entry.last_modified)
+            # Decode again on every hit so callers never share mutable data
+            return loads(body)
+        if response.status_code == 304:
+            # Nothing to serve, so ask again for the full response
+            headers.pop('if-none-match', None)
+            headers.pop('if-modified-since', None)
+            response = self.request('GET', path, headers)
+        body = response.text
+        etag = response.headers.get('etag')
+        last_modified = response.headers.get('last-modified')
+        if etag or last_modified:
+            self.cache.set(path, body, etag, last_modified)
+        else:
+            # Whatever was cached before can no longer be revalidated
+            self.cache.discard(path)
+        return loads(body)
 
     def __getitem__(self, path):
         return self.api_request('GET', path)
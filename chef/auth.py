@@ -1,23 +1,56 @@
 import six.moves
 import base64
+import binascii
+import collections
 import datetime
 import hashlib
 import re
+import threading
+
+from chef.exceptions import ChefAuthenticationError
+from chef.rsa import Key, SSLError
 
 def _ruby_b64encode(value):
     """The Ruby function Base64.encode64 automatically breaks things up
     into 60-character chunks.
     """
-    b64 = base64.b64encode(value)
-    for i in six.moves.range(0, len(b64), 60):
-        yield b64[i:i + 60].decode()
+    b64 = base64.b64encode(value).decode()
+    if len(b64) <= 60:
+        return [b64]
+    return [b64[i:i + 60] for i in six.moves.range(0, len(b64), 60)]
 
 def ruby_b64encode(value):
     return '\n'.join(_ruby_b64encode(value))
 
+# Bytes read at a time when hashing a file-like body
+hash_chunk_size = 64 * 1024
+
+def digest_base64(value, digest='sha1'):
+    """An implementation of Mixlib::Authentication::Digester. File-like
+    values are hashed in chunks from their current position, and rewound
+    afterwards.
+    """
+    if hasattr(value, 'read'):
+        return ruby_b64encode(_digest_file(value, digest).digest())
+    if not isinstance(value, six.binary_type):
+        value = value.encode()
+    return ruby_b64encode(hashlib.new(digest, value).digest())
+
+def _digest_file(fp, digest):
+    hashed = hashlib.new(digest)
+    position = fp.tell()
+    while True:
+        chunk = fp.read(hash_chunk_size)
+        if not chunk:
+            break
+        if not isinstance(chunk, six.binary_type):
+            chunk = chunk.encode()
+        hashed.update(chunk)
+    fp.seek(position)
+    return hashed
+
 def sha1_base64(value):
-    """An implementation of Mixlib::Authentication::Digester."""
-    return ruby_b64encode(hashlib.sha1(value.encode()).digest())
+    return digest_base64(value, 'sha1')
 
 class UTC(datetime.tzinfo):
     """UTC timezone stub."""
@@ -42,7 +75,8 @@ def canonical_time(timestamp):
 
 canonical_path_regex = re.compile(r'/+')
 def canonical_path(path):
-    path = canonical_path_regex.sub('/', path)
+    if '//' in path:
+        path = canonical_path_regex.sub('/', path)
     if len(path) > 1:
         path = path.rstrip('/')
     return path
@@ -60,22 +94,206 @@ def canonical_request(http_method, path, hashed_body, timestamp, user_id):
             'X-Ops-Timestamp:%(timestamp)s\n'
             'X-Ops-UserId:%(user_id)s' % vars())
 
+class RequestSigner(object):
+    """Signs requests for a single client, with the parts of the canonical
+    request that never change for that client computed once.
+
+    ``sign_version`` selects the protocol version: ``'1.0'``, ``'1.1'``
+    (hashed user ID) or ``'1.3'`` (SHA-256 hashing and signatures, and the
+    ``X-Ops-Server-API-Version`` header). If ``server_api_version`` is given
+    it is sent with every request; version 1.3 defaults it to ``'0'``.
+
+    .. versionadded:: 0.4
+    """
+
+    digests = {
+        '1.0': 'sha1',
+        '1.1': 'sha1',
+        '1.3': 'sha256',
+    }
+
+    def __init__(self, key, user_id, sign_version='1.0', server_api_version=None):
+        if sign_version not in self.digests:
+            raise ValueError('Unsupported signing protocol version %s' % sign_version)
+        self.key = key
+        self.user_id = user_id
+        self.sign_version = sign_version
+        self.digest = self.digests[sign_version]
+        if server_api_version is None and sign_version == '1.3':
+            server_api_version = '0'
+        self.server_api_version = server_api_version
+        if sign_version == '1.0':
+            self.sign_header = 'version=1.0'
+        else:
+            self.sign_header = 'algorithm=%s;version=%s;' % (self.digest, sign_version)
+        if sign_version == '1.3':
+            self._request_suffix = '\nX-Ops-UserId:%s\nX-Ops-Server-API-Version:%s' % (user_id, server_api_version)
+        elif sign_version == '1.1':
+            self._request_suffix = '\nX-Ops-UserId:%s' % digest_base64(user_id, self.digest)
+        else:
+            self._request_suffix = '\nX-Ops-UserId:%s' % user_id
+
+    def hash_body(self, body):
+        """Hash a request body for the ``X-Ops-Content-Hash`` header. The
+        result can be passed to :meth:`sign` to avoid hashing it again.
+        """
+        return digest_base64(body or '', self.digest)
+
+    def canonical_request(self, http_method, path, hashed_body, timestamp):
+        if isinstance(timestamp, datetime.datetime):
+            timestamp = canonical_time(timestamp)
+        path = canonical_path(path)
+        if self.sign_version == '1.3':
+            return ('Method:%s\nPath:%s\nX-Ops-Content-Hash:%s\nX-Ops-Sign:version=1.3\nX-Ops-Timestamp:%s%s' % (
+                http_method.upper(), path, hashed_body, timestamp, self._request_suffix))
+        return ('Method:%s\nHashed Path:%s\nX-Ops-Content-Hash:%s\nX-Ops-Timestamp:%s%s' % (
+            http_method.upper(), digest_base64(path, self.digest), hashed_body,
+            timestamp, self._request_suffix))
+
+    def sign(self, http_method, path, body, timestamp, hashed_body=None):
+        """Generate the needed headers for the Opscode authentication protocol."""
+        timestamp = canonical_time(timestamp)
+        if hashed_body is None:
+            hashed_body = self.hash_body(body)
+
+        # Simple headers
+        headers = {
+            'x-ops-sign': self.sign_header,
+            'x-ops-userid': self.user_id,
+            'x-ops-timestamp': timestamp,
+            'x-ops-content-hash': hashed_body,
+        }
+        if self.server_api_version is not None:
+            headers['x-ops-server-api-version'] = self.server_api_version
+
+        # Create RSA signature
+        req = self.canonical_request(http_method, path, hashed_body, timestamp).encode()
+        if self.sign_version == '1.3':
+            sig = self.key.sign(req, self.digest)
+        else:
+            sig = self.key.private_encrypt(req)
+        for i, line in enumerate(_ruby_b64encode(sig)):
+            headers['x-ops-authorization-%s'%(i+1)] = line
+        return headers
+
 def sign_request(key, http_method, path, body, host, timestamp, user_id):
     """Generate the needed headers for the Opscode authentication protocol."""
-    timestamp = canonical_time(timestamp)
-    hashed_body = sha1_base64(body or '')
-
-    # Simple headers
-    headers = {
-        'x-ops-sign': 'version=1.0',
-        'x-ops-userid': user_id,
-        'x-ops-timestamp': timestamp,
-        'x-ops-content-hash': hashed_body,
-    }
+    return RequestSigner(key, user_id).sign(http_method, path, body, timestamp)
+
+class PublicKeyCache(object):
+    """Parsed client public keys, for use as the ``key_lookup`` of
+    :func:`verify_request`.
+
+    ``lookup`` is called with a client name the first time that client is
+    seen, and should return its public key as PEM text or a
+    :class:`~chef.rsa.Key`, or None if the client is unknown. Parsed keys
+    are kept for the ``max_size`` most recently used clients::
+
+        keys = PublicKeyCache(lambda name: clients[name]['public_key'])
+        user_id = verify_request(headers, 'GET', '/nodes', None, keys)
+
+    .. versionadded:: 0.4
+    """
+
+    def __init__(self, lookup, max_size=1024):
+        self.lookup = lookup
+        self.max_size = max_size
+        self._keys = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __call__(self, name):
+        with self._lock:
+            key = self._keys.pop(name, None)
+            if key is not None:
+                self._keys[name] = key
+                return key
+        key = self.lookup(name)
+        if key is None:
+            return None
+        if not isinstance(key, Key):
+            if not isinstance(key, six.binary_type):
+                key = key.encode()
+            key = Key(key)
+        with self._lock:
+            self._keys[name] = key
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+        return key
+
+    def invalidate(self, name):
+        """Forget the key of a client, for instance after it was rotated."""
+        with self._lock:
+            self._keys.pop(name, None)
+
+def verify_request(headers, http_method, path, body, key_lookup, max_skew=900, now=None):
+    """Check the signature of a request made with the Opscode authentication
+    protocol, as a Chef server would. Protocol versions 1.0, 1.1 and 1.3 are
+    accepted.
+
+    ``key_lookup`` is called with the client name from the request and
+    should return its public :class:`~chef.rsa.Key`, or None if the client is
+    unknown; wrap it in a :class:`PublicKeyCache` to avoid parsing keys on
+    every request. Requests whose timestamp is more than ``max_skew``
+    seconds away from ``now`` (by default the current UTC time) are refused.
+
+    Returns the authenticated client name, or raises
+    :class:`~chef.exceptions.ChefAuthenticationError`.
+
+    .. versionadded:: 0.4
+    """
+    headers = dict((k.lower(), v) for k, v in headers.items())
+    for name in ('x-ops-sign', 'x-ops-userid', 'x-ops-timestamp', 'x-ops-content-hash'):
+        if name not in headers:
+            raise ChefAuthenticationError('Missing %s header' % name)
+    user_id = headers['x-ops-userid']
+
+    # Protocol version
+    params = dict(p.strip().split('=', 1) for p in headers['x-ops-sign'].split(';') if '=' in p)
+    version = params.get('version')
+    if version not in RequestSigner.digests:
+        raise ChefAuthenticationError('Unsupported signing protocol version %s' % version)
+    signer = RequestSigner(None, user_id, version, headers.get('x-ops-server-api-version'))
+    if params.get('algorithm', signer.digest) != signer.digest:
+        raise ChefAuthenticationError('Unsupported algorithm %s' % params['algorithm'])
+
+    # Clock skew
+    timestamp = headers['x-ops-timestamp']
+    try:
+        signed_at = datetime.datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
+    except ValueError:
+        raise ChefAuthenticationError('Invalid timestamp %s' % timestamp)
+    if abs((now or datetime.datetime.utcnow()) - signed_at) > datetime.timedelta(seconds=max_skew):
+        raise ChefAuthenticationError('Request timestamp %s is outside the allowed clock skew' % timestamp)
+
+    # Body hash
+    hashed_body = headers['x-ops-content-hash']
+    if signer.hash_body(body) != hashed_body:
+        raise ChefAuthenticationError('Content hash does not match the request body')
 
-    # Create RSA signature
-    req = canonical_request(http_method, path, hashed_body, timestamp, user_id)
-    sig = _ruby_b64encode(key.private_encrypt(req))
-    for i, line in enumerate(sig):
-        headers['x-ops-authorization-%s'%(i+1)] = line
-    return headers
+    # Signature
+    lines = []
+    while 'x-ops-authorization-%s' % (len(lines) + 1) in headers:
+        lines.append(headers['x-ops-authorization-%s' % (len(lines) + 1)])
+    try:
+        sig = base64.b64decode(''.join(lines))
+    except (binascii.Error, TypeError):
+        raise ChefAuthenticationError('Invalid signature encoding')
+    if not sig:
+        raise ChefAuthenticationError('Missing signature')
+    key = key_lookup(user_id)
+    if key is None:
+        raise ChefAuthenticationError('Unknown client %s' % user_id)
+    req = signer.canonical_request(http_method, path.split('?', 1)[0], hashed_body, timestamp)
+    if version == '1.3':
+        valid = key.verify(req, sig, signer.digest)
+    else:
+        try:
+            valid = key.public_decrypt(sig) == req
+        except (SSLError, ValueError):
+            valid = False
+    if not valid:
+        raise ChefAuthenticationError('Invalid signature for %s' % user_id)
+    return user_id
@@ -1,13 +1,40 @@
 import six
 import collections
+from multiprocessing.pool import ThreadPool
 
 import pkg_resources
 from chef.acl import Acl
 
 from chef.api import ChefAPI
 from chef.exceptions import *
+from chef.utils import json
+
+def _parallel(fn, items, concurrency):
+    """Call fn for each item using up to ``concurrency`` worker threads.
+    Returns a list of ``(item, result, error)`` tuples, in order, where error
+    is the exception raised for that item if any. Any exception is recorded,
+    including transport errors from :mod:`requests` and JSON decoding
+    errors, so one failing item never loses the results of the others.
+    """
+    def call(item):
+        try:
+            return item, fn(item), None
+        except Exception as e:
+            return item, None, e
+    if not items:
+        return []
+    pool = ThreadPool(max(1, min(concurrency, len(items))))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
+
 
 class ChefQuery(collections.Mapping):
+    # Filled in by prefetch()
+    objects = None
+    errors = None
+
     def __init__(self, obj_class, names, api):
         self.obj_class = obj_class
         self.names = names
@@ -25,8 +52,40 @@ class ChefQuery(collections.Mapping):
     def __getitem__(self, name):
         if name not in self:
             raise KeyError('%s not found'%name)
+        if self.objects is not None:
+            if name in self.objects:
+                return self.objects[name]
+            if name in self.errors:
+                raise self.errors[name]
         return self.obj_class(name, api=self.api)
 
+    def prefetch(self, concurrency=10):
+        """Load all objects in this query in parallel using up to
+        ``concurrency`` worker threads. Loaded objects are stored in the
+        :attr:`objects` dict and served from there by later lookups. If an
+        object fails to load, the error is stored in the :attr:`errors` dict
+        and re-raised when that name is looked up, while the rest of the
+        batch is still loaded. Returns the query itself::
+
+            nodes = Node.list().prefetch(concurrency=20)
+            for name, error in six.iteritems(nodes.errors):
+                print 'Unable to load %s: %s' % (name, error)
+            for name, node in six.iteritems(nodes.objects):
+                print node['fqdn']
+
+        .. versionadded:: 0.4
+        """
+        objects = {}
+        errors = {}
+        for name, obj, error in _parallel(lambda name: self.obj_class(name, api=self.api), self.names, concurrency):
+            if error is None:
+                objects[name] = obj
+            else:
+                errors[name] = error
+        self.objects = objects
+        self.errors = errors
+        return self
+
 
 class ChefObjectMeta(type):
     def __init__(cls, name, bases, d):
@@ -38,6 +97,7 @@ class ChefObjectMeta(type):
 
 class ChefObject(six.with_metaclass(ChefObjectMeta, object)):
     """A base class for Chef API objects."""
+
     types = {}
 
     url = ''
@@ -55,13 +115,16 @@ class ChefObject(six.with_metaclass(ChefObjectMeta, object)):
         data = {}
         if not skip_load:
             try:
-                data = self.api[self.url]
+                data = self._fetch()
             except ChefServerNotFoundError:
                 pass
             else:
                 self.exists = True
         self._populate(data)
 
+    def _fetch(self):
+        return self.api[self.url]
+
     def _populate(self, data):
         for name, cls in six.iteritems(self.__class__.attributes):
             if name in data:
@@ -72,7 +135,18 @@ class ChefObject(six.with_metaclass(ChefObjectMeta, object)):
 
     @classmethod
     def from_search(cls, data, api=None):
-        obj = cls(data.get('name'), api=api, skip_load=True)
+        api = api or ChefAPI.get_global()
+        cls._check_api_version(api)
+        return cls._hydrate(data, api)
+
+    @classmethod
+    def _hydrate(cls, data, api):
+        # Build an existing object straight from its data, skipping __init__.
+        # The API version must already have been checked.
+        obj = cls.__new__(cls)
+        obj.name = data.get('name')
+        obj.api = api
+        obj.url = cls.url + '/' + obj.name
         obj.exists = True
         obj._populate(data)
         return obj
@@ -86,6 +160,18 @@ class ChefObject(six.with_metaclass(ChefObjectMeta, object)):
         names = [name for name, url in six.iteritems(api[cls.url])]
         return ChefQuery(cls, names, api)
 
+    @classmethod
+    def load_many(cls, names, api=None, concurrency=10):
+        """Load the named objects of this type in parallel. Returns a
+        :class:`ChefQuery` that has already been prefetched, see
+        :meth:`ChefQuery.prefetch` for how failures are reported.
+
+        .. versionadded:: 0.4
+        """
+        api = api or ChefAPI.get_global()
+        cls._check_api_version(api)
+        return ChefQuery(cls, list(names), api).prefetch(concurrency)
+
     @classmethod
     def create(cls, name, api=None, **kwargs):
         """Create a new object of this type. Pass the initial value for any
@@ -111,6 +197,26 @@ class ChefObject(six.with_metaclass(ChefObjectMeta, object)):
             # This mirrors the logic in the Chef code
             api.api_request('POST', self.__class__.url, data=self)
 
+    @staticmethod
+    def save_many(objects, api=None, concurrency=10):
+        """Save many objects in parallel using up to ``concurrency`` worker
+        threads, as with :meth:`save`. Request signing runs inside OpenSSL
+        without holding the GIL, so for a bulk import both the signing and
+        the round trips to the server are spread across the workers. An
+        object that fails to save, whether with a server error or a
+        transport error such as a timeout, does not stop the rest of the
+        batch, and every object missing from the result was saved. Returns a
+        dict of object name to the error raised while saving it::
+
+            errors = ChefObject.save_many(nodes, concurrency=20)
+            for name, error in six.iteritems(errors):
+                print 'Unable to save %s: %s' % (name, error)
+
+        .. versionadded:: 0.4
+        """
+        results = _parallel(lambda obj: obj.save(api), list(objects), concurrency)
+        return dict((obj.name, error) for obj, _, error in results if error is not None)
+
     def delete(self, api=None):
         """Delete this object from the server."""
         api = api or self.api
@@ -142,3 +248,5 @@ class ChefObject(six.with_metaclass(ChefObjectMeta, object)):
 
     def get_acl(self):
         return Acl(self.__class__.url.strip('/'), self.name, self.api)
+
+json.register_type(ChefObject, lambda obj: obj.to_dict())
@@ -0,0 +1,73 @@
+import collections
+import threading
+import time
+
+CacheEntry = collections.namedtuple('CacheEntry', 'body etag last_modified stored')
+
+
+class ResponseCache(object):
+    """A cache of GET responses for a :class:`~chef.ChefAPI`, keyed by
+    request path.
+
+    Only responses carrying an ``ETag`` or ``Last-Modified`` header are
+    stored, and every cache hit is revalidated with the server using a
+    conditional GET, so an unchanged object costs a ``304 Not Modified``
+    instead of a full response. At most ``max_size`` entries are kept, the
+    least recently used being evicted first, and entries are dropped
+    ``ttl`` seconds after they were last validated.
+
+    Enable it by passing ``cache=True`` (or a ResponseCache instance) when
+    creating the API::
+
+        api = ChefAPI('http://localhost:4000', 'client.pem', 'admin', cache=True)
+
+    .. versionadded:: 0.4
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    def get(self, path):
+        """Return the :class:`CacheEntry` for a path, or None."""
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is None:
+                return None
+            if self.ttl is not None and time.time() - entry.stored > self.ttl:
+                return None
+            # Re-insert to mark it as the most recently used
+            self._entries[path] = entry
+            return entry
+
+    def set(self, path, body, etag=None, last_modified=None):
+        with self._lock:
+            self._entries.pop(path, None)
+            self._entries[path] = CacheEntry(body, etag, last_modified, time.time())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, path):
+        """Drop a single path."""
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def invalidate(self, path):
+        """Drop a path and the collection containing it, since writes to an
+        object usually change the listing as well.
+        """
+        with self._lock:
+            self._entries.pop(path, None)
+            self._entries.pop(path.rsplit('/', 1)[0], None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -56,7 +56,7 @@ class DataBagItem(six.with_metaclass(DataBagMeta, ChefObject, collections.Mutabl
         return self._bag
 
     @classmethod
-    def from_search(cls, data, api):
+    def _hydrate(cls, data, api):
         bag = data.get('data_bag')
         if not bag:
             raise ChefError('No data_bag key in data bag item information')
@@ -64,9 +64,10 @@ class DataBagItem(six.with_metaclass(DataBagMeta, ChefObject, collections.Mutabl
         if not name:
             raise ChefError('No name key in the data bag item information')
         item = name[len('data_bag_item_' + bag + '_'):]
-        obj = cls(bag, item, api=api, skip_load=True)
-        obj.exists = True
-        obj._populate(data)
+        obj = super(DataBagItem, cls)._hydrate(data, api)
+        obj._bag = bag
+        obj.name = item
+        obj.url = cls.url + '/' + bag + '/' + item
         return obj
 
     def _populate(self, data):
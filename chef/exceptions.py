@@ -35,3 +35,6 @@ class ChefAPIVersionError(ChefError):
 class ChefObjectTypeError(ChefError):
     """An invalid object type error"""
 
+
+class ChefAuthenticationError(ChefError):
+    """A signed request that could not be authenticated"""
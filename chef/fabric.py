@@ -4,7 +4,8 @@ import functools
 from chef.api import ChefAPI, autoconfigure
 from chef.environment import Environment
 from chef.exceptions import ChefError, ChefAPIVersionError
-from chef.search import Search
+from chef.node import AttributePath, extract
+from chef.search import Search, _partial_search
 
 try:
     from fabric.api import env, task, roles, output
@@ -48,23 +49,27 @@ class Roledef(object):
             environment = env.get('chef_environment', DEFAULT_ENVIRONMENT)
         if environment:
             query += ' AND chef_environment:%s' % environment
-        for row in Search('node', query, api=self.api):
-            if row:
-                if callable(self.hostname_attr):
+        if callable(self.hostname_attr):
+            for row in Search('node', query, api=self.api):
+                if row:
                     val = self.hostname_attr(row.object)
                     if val:
                         yield val
-                else:
-                    for attr in self.hostname_attr:
-                        try:
-                            val =  row.object.attributes.get_dotted(attr)
-                            if val: # Don't ever give out '' or None, since it will error anyway
-                                yield val
-                                break
-                        except KeyError:
-                            pass # Move on to the next
-                    else:
-                        raise ChefError('Cannot find a usable hostname attribute for node %s', row.object)
+        else:
+            paths = [AttributePath(attr) for attr in self.hostname_attr]
+            # Only fetch the hostname attributes, not the whole node, if the
+            # server supports it
+            keys = dict((path.path, list(path.keys)) for path in paths)
+            keys['name'] = ['name']
+            rows = [row for row in _partial_search('node', query, keys, api=self.api) if row]
+            for row, values in zip(rows, extract(rows, paths)):
+                yield self._hostname(row['name'], values)
+
+    def _hostname(self, name, values):
+        for val in values:
+            if val: # Don't ever give out '' or None, since it will error anyway
+                return val
+        raise ChefError('Cannot find a usable hostname attribute for node %s', name)
 
 
 def chef_roledefs(api=None, hostname_attr=DEFAULT_HOSTNAME_ATTR, environment=_default_environment):
@@ -88,6 +93,11 @@ def chef_roledefs(api=None, hostname_attr=DEFAULT_HOSTNAME_ATTR, environment=_de
 
     To refer to a nested attribute, separate the levels with ``'.'`` e.g. ``'ec2.public_hostname'``
 
+    Unless ``hostname_attr`` is a callable, only the hostname attributes of
+    each node are downloaded if the server supports partial search. With an
+    API ``version`` older than 11.0, as by default, partial search is tried
+    once and whole nodes are fetched if the server rejects it.
+
     ``environment`` is the Chef :class:`~chef.Environment` name in which to
     search for nodes. If set to ``None``, no environment filter is added. If
     set to a string, it is used verbatim as a filter string. If not passed as
@@ -0,0 +1,416 @@
+"""An in-memory index of Chef objects that answers search queries locally.
+
+Documents are flattened the way the Chef server flattens them for its search
+index, and queries use the same Solr syntax as :class:`~chef.Search`, so a
+snapshot of the nodes can be queried many times without a round trip to the
+server.
+"""
+import collections
+import re
+
+import six
+
+from chef.api import ChefAPI
+from chef.node import precedence_levels
+from chef.run_list import parse_item
+from chef.search import Search, SearchRow
+from chef.utils.merge import deep_merge
+
+
+def _index_value(value):
+    if value is True:
+        return u'true'
+    if value is False:
+        return u'false'
+    return six.text_type(value)
+
+
+def _expand(value, fields, paths=None):
+    # With a paths dict, values are only added under their full path, and
+    # paths maps each full path to all of the field names it stands for
+    stack = [((), u'', value)]
+    while stack:
+        keys, path, value = stack.pop()
+        if isinstance(value, dict):
+            prefix = path + u'_' if keys else u''
+            for key, child in value.items():
+                if not isinstance(key, six.string_types):
+                    key = six.text_type(key)
+                stack.append((keys + (key,), prefix + key, child))
+        elif isinstance(value, list):
+            for child in value:
+                stack.append((keys, path, child))
+        elif value is not None and keys:
+            if not isinstance(value, six.string_types):
+                value = _index_value(value)
+            if paths is None:
+                names = [u'_'.join(keys[i:]) for i in six.moves.range(len(keys))]
+            else:
+                if path not in paths:
+                    paths[path] = tuple(u'_'.join(keys[i:]) for i in six.moves.range(len(keys)))
+                names = (path,)
+            for name in names:
+                values = fields.get(name)
+                if values is None:
+                    values = fields[name] = set()
+                values.add(value)
+
+
+def flatten(doc, index='node'):
+    """Flatten a document into a dict mapping each search field to the set
+    of string values it holds, as the Chef server does when indexing it.
+    Every value is indexed under its full path of keys joined with ``_``,
+    and under each shorter path ending with the same key, so that
+    ``{'kernel': {'os': 'Linux'}}`` can be matched by both ``kernel_os``
+    and ``os``.
+
+    Nodes are indexed by their merged attributes together with their other
+    top-level fields, and the items of the run list also give the ``role``
+    and ``recipe`` fields.
+
+    .. versionadded:: 0.4
+    """
+    return _flatten(doc, index)
+
+
+def _flatten(doc, index, paths=None):
+    fields = {}
+    if index == 'node':
+        levels = [doc.get(level) or {} for level in reversed(precedence_levels)]
+        _expand(deep_merge(*levels), fields, paths)
+        _expand(dict((key, value) for key, value in six.iteritems(doc) if key not in precedence_levels), fields, paths)
+        for item in doc.get('run_list') or ():
+            try:
+                kind, name = parse_item(item)
+            except ValueError:
+                continue
+            fields.setdefault(kind, set()).add(name)
+    else:
+        _expand(doc, fields, paths)
+    return fields
+
+
+_token_re = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<range>(?P<open>[\[{])\s*(?P<low>(?:[^\s\\]|\\.)+)\s+TO\s+(?P<high>(?:[^\s\\\]}]|\\.)+)\s*(?P<close>[\]}]))
+  | (?P<phrase>"(?:[^"\\]|\\.)*")
+  | (?P<op>&&|\|\||[()!+\-:])
+  | (?P<word>(?:[^\s()"\\:\[\]{}]|\\.)+)
+''', re.X | re.S)
+
+_escape_re = re.compile(r'\\(.)', re.S)
+
+
+def _unescape(text):
+    return _escape_re.sub(r'\1', text)
+
+
+def _pattern(text):
+    """Return the unescaped text and, if it has wildcards, a regex."""
+    literal = []
+    regex = []
+    wildcard = False
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == '\\' and i + 1 < len(text):
+            i += 1
+            c = text[i]
+        elif c in '*?':
+            regex.append('.*' if c == '*' else '.')
+            wildcard = True
+            i += 1
+            continue
+        literal.append(c)
+        regex.append(re.escape(c))
+        i += 1
+    literal = u''.join(literal)
+    if not wildcard:
+        return literal, None
+    return literal, re.compile(u'(?:%s)\\Z' % u''.join(regex), re.S)
+
+
+def _number(text):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+class _Range(object):
+    """A ``[low TO high]`` or ``{low TO high}`` range of values. Values are
+    compared as numbers when both they and the bounds are numbers, and as
+    strings otherwise.
+    """
+
+    def __init__(self, low, high, include_low, include_high):
+        self.low = None if low == '*' else _unescape(low)
+        self.high = None if high == '*' else _unescape(high)
+        self.include_low = include_low
+        self.include_high = include_high
+        self.numeric = all(bound is None or _number(bound) is not None for bound in (self.low, self.high))
+        if self.numeric:
+            self.low_number = None if self.low is None else _number(self.low)
+            self.high_number = None if self.high is None else _number(self.high)
+
+    def __contains__(self, value):
+        low, high = self.low, self.high
+        if self.numeric:
+            number = _number(value)
+            if number is not None:
+                value, low, high = number, self.low_number, self.high_number
+        if low is not None and (value < low or (value == low and not self.include_low)):
+            return False
+        if high is not None and (value > high or (value == high and not self.include_high)):
+            return False
+        return True
+
+
+class _Parser(object):
+    """Parses a query into a tree of tuples:
+
+    * ``('all',)``
+    * ``('and', [nodes])``, ``('or', [nodes])`` and ``('not', node)``
+    * ``('term', field, value)``, where the field is a string, a compiled
+      regex for a field with wildcards, or None for any field, and the value
+      a string, a compiled regex or a :class:`_Range`.
+
+    As on the Chef server, terms without an operator between them must all
+    match, and AND binds more tightly than OR.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.tokens = []
+        pos = 0
+        while pos < len(query):
+            match = _token_re.match(query, pos)
+            if match is None:
+                raise ValueError('Invalid search query %r at position %s' % (query, pos))
+            if match.lastgroup != 'space':
+                self.tokens.append(match)
+            pos = match.end()
+        self.pos = 0
+
+    def peek(self, offset=0):
+        if self.pos + offset < len(self.tokens):
+            return self.tokens[self.pos + offset]
+        return None
+
+    def is_op(self, token, *ops):
+        return token is not None and token.lastgroup in ('op', 'word') and token.group() in ops
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError('Unexpected end of search query %r' % self.query)
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            return ('all',)
+        node = self.or_expr(None)
+        if self.peek() is not None:
+            raise ValueError('Unexpected %r in search query %r' % (self.peek().group(), self.query))
+        return node
+
+    def or_expr(self, field):
+        nodes = [self.and_expr(field)]
+        while self.is_op(self.peek(), 'OR', '||'):
+            self.next()
+            nodes.append(self.and_expr(field))
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def and_expr(self, field):
+        nodes = [self.unary(field)]
+        while True:
+            token = self.peek()
+            if token is None or self.is_op(token, ')', 'OR', '||'):
+                break
+            if self.is_op(token, 'AND', '&&'):
+                self.next()
+            nodes.append(self.unary(field))
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def unary(self, field):
+        token = self.peek()
+        if self.is_op(token, 'NOT', '!', '-'):
+            self.next()
+            return ('not', self.unary(field))
+        if self.is_op(token, '+'):
+            self.next()
+        return self.primary(field)
+
+    def primary(self, field):
+        token = self.next()
+        if self.is_op(token, '('):
+            node = self.or_expr(field)
+            if not self.is_op(self.next(), ')'):
+                raise ValueError("Expected ')' in search query %r" % self.query)
+            return node
+        if token.lastgroup == 'word' and self.is_op(self.peek(), ':'):
+            self.next()
+            name, regex = _pattern(token.group())
+            if self.is_op(self.peek(), '('):
+                return self.primary(regex or name)
+            value = self.next()
+            if name == '*' and value.group() == '*':
+                return ('all',)
+            return self.term(regex or name, value)
+        return self.term(field, token)
+
+    def term(self, field, token):
+        kind = token.lastgroup
+        if kind == 'range':
+            value = _Range(token.group('low'), token.group('high'),
+                           token.group('open') == '[', token.group('close') == ']')
+        elif kind == 'phrase':
+            value = _unescape(token.group()[1:-1])
+        elif kind == 'word' and token.group() not in ('AND', 'OR', 'NOT'):
+            literal, regex = _pattern(token.group())
+            value = regex or literal
+        else:
+            raise ValueError('Unexpected %r in search query %r' % (token.group(), self.query))
+        return ('term', field, value)
+
+
+class SearchIndex(object):
+    """A snapshot of search results held in memory, that can be queried with
+    the same syntax as :class:`~chef.Search` without talking to the server::
+
+        index = SearchIndex.load('node')
+        for row in index.search('roles:web AND chef_environment:prod'):
+            print row['name']
+
+    Each document is flattened with :func:`flatten` as it is added, into an
+    inverted index mapping every field and value to the documents holding
+    it. Queries support ``field:value`` terms with ``*`` and ``?`` wildcards
+    in fields and values, quoted values, ``[low TO high]`` and
+    ``{low TO high}`` ranges, ``AND``, ``OR``, ``NOT`` and their symbolic
+    forms, and parentheses. The results of the last :attr:`cache_size`
+    queries are kept until a document is added.
+
+    Unlike the Chef server, ranges compare numbers by value rather than as
+    text, and values are matched whole rather than split into words.
+
+    .. versionadded:: 0.4
+    """
+
+    cache_size = 256
+
+    def __init__(self, rows=(), index='node', api=None):
+        self.index = index
+        self.api = api
+        self.rows = []
+        # Values are stored once under their full path, such as kernel_os,
+        # and each field name maps to the full paths it matches, such as
+        # os to kernel_os
+        self._postings = {}
+        self._fields = {}
+        self._paths = {}
+        self._all = set()
+        self._cache = collections.OrderedDict()
+        for row in rows:
+            self.add(row)
+
+    @classmethod
+    def load(cls, index='node', q='*:*', rows=1000, api=None):
+        """Build an index from every result of a search on the server."""
+        api = api or ChefAPI.get_global()
+        return cls(Search(index, q, rows=rows, api=api).iter_all(), index, api)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, row):
+        """Add a document, such as a node document or search row."""
+        doc_id = len(self.rows)
+        self.rows.append(row)
+        self._all.add(doc_id)
+        for path, values in six.iteritems(_flatten(row, self.index, self._paths)):
+            postings = self._postings.get(path)
+            if postings is None:
+                postings = self._postings[path] = {}
+                for field in self._paths.get(path, (path,)):
+                    self._fields.setdefault(field, []).append(path)
+            for value in values:
+                ids = postings.get(value)
+                if ids is None:
+                    postings[value] = [doc_id]
+                else:
+                    ids.append(doc_id)
+        self._cache.clear()
+
+    def ids(self, q='*:*'):
+        """Return the positions in :attr:`rows` of the documents matching a
+        query, in the order they were added.
+        """
+        ids = self._cache.pop(q, None)
+        if ids is None:
+            ids = tuple(sorted(self._evaluate(_Parser(q).parse())))
+            while len(self._cache) >= self.cache_size:
+                self._cache.popitem(last=False)
+        self._cache[q] = ids
+        return ids
+
+    def search(self, q='*:*'):
+        """Return the documents matching a query as a list of
+        :class:`~chef.search.SearchRow`.
+        """
+        rows = self.rows
+        return [rows[i] if isinstance(rows[i], SearchRow) else SearchRow(rows[i], self.api) for i in self.ids(q)]
+
+    def count(self, q='*:*'):
+        """Return the number of documents matching a query."""
+        return len(self.ids(q))
+
+    def _evaluate(self, node):
+        kind = node[0]
+        if kind == 'all':
+            return set(self._all)
+        if kind == 'term':
+            return self._term(node[1], node[2])
+        if kind == 'not':
+            return self._all - self._evaluate(node[1])
+        if kind == 'or':
+            result = set()
+            for child in node[1]:
+                result |= self._evaluate(child)
+            return result
+        # Intersect the positive terms, then remove the negated ones
+        include = [child for child in node[1] if child[0] != 'not']
+        result = None
+        for child in include:
+            ids = self._evaluate(child)
+            result = ids if result is None else result & ids
+            if not result:
+                return result
+        if result is None:
+            result = set(self._all)
+        for child in node[1]:
+            if child[0] == 'not':
+                result -= self._evaluate(child[1])
+        return result
+
+    def _term(self, field, value):
+        if isinstance(field, six.string_types):
+            paths = self._fields.get(field, ())
+        else:
+            paths = set(path for name, paths in six.iteritems(self._fields)
+                        if field is None or field.match(name) for path in paths)
+        postings = [self._postings[path] for path in paths]
+        result = set()
+        for values in postings:
+            if isinstance(value, six.string_types):
+                result.update(values.get(value, ()))
+            elif isinstance(value, _Range):
+                for candidate, ids in six.iteritems(values):
+                    if candidate in value:
+                        result.update(ids)
+            else:
+                match_all = value.pattern == u'(?:.*)\\Z'
+                for candidate, ids in six.iteritems(values):
+                    if match_all or value.match(candidate):
+                        result.update(ids)
+        return result
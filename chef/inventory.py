@@ -0,0 +1,362 @@
+"""Columnar tables of node attributes, for reports over a whole fleet.
+
+Values are stored in compact typed arrays, using NumPy when it is installed
+and the standard :mod:`array` module otherwise, so counts, groups and
+percentiles over many thousands of nodes do not need a Python object per
+value.
+"""
+import array
+import collections
+import itertools
+import math
+
+import six
+
+from chef.api import ChefAPI
+from chef.node import AttributePath, extract
+from chef.search import _partial_search
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    array.array('q')
+except ValueError:
+    # Python 2 has no long long arrays
+    _int_typecode = 'l'
+else:
+    _int_typecode = 'q'
+
+# The array typecode used to store each column type. Strings are stored as
+# codes into a list of categories.
+_typecodes = {
+    bool: 'b',
+    int: _int_typecode,
+    float: 'd',
+    str: 'i',
+}
+
+
+def _infer_type(values):
+    types = set(type(value) for value in values if value is not None)
+    if types and types <= set([bool]):
+        return bool
+    if types and types <= set(six.integer_types):
+        return int
+    if types and types <= set(six.integer_types + (float,)):
+        return float
+    return str
+
+
+def _percentile(values, q):
+    # Linear interpolation between the closest ranks, as numpy.percentile
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100.0
+    low = int(math.floor(pos))
+    high = min(low + 1, len(values) - 1)
+    return float(values[low] + (values[high] - values[low]) * (pos - low))
+
+
+class _ColumnBuilder(object):
+    """Accumulates the values of one column while rows are read."""
+
+    def __init__(self, name, type=None):
+        self.name = name
+        self.type = None
+        # Inferred columns are widened for values that don't fit, see promote()
+        self.inferred = type is None
+        self.pending = []
+        if type is not None:
+            self.set_type(type)
+
+    def set_type(self, type):
+        if type not in _typecodes:
+            raise ValueError('Unsupported column type %r' % (type,))
+        self.type = type
+        self.values = array.array(_typecodes[type])
+        self.mask = bytearray()
+        self.categories = [] if type is str else None
+        self.codes = {}
+
+    def convert(self, value):
+        if value is None:
+            return None
+        if self.type is bool:
+            return value if isinstance(value, bool) else None
+        if self.type is str:
+            if isinstance(value, six.string_types):
+                return value
+            if isinstance(value, six.integer_types + (float,)):
+                return six.text_type(value)
+            return None
+        if isinstance(value, (bool, list, dict)):
+            return None
+        if self.type is int and isinstance(value, float) and not value.is_integer():
+            return None
+        try:
+            return self.type(value)
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+    def promote(self, value):
+        """Widen an inferred column so it can hold ``value``, as from int to
+        float or from a number to str, converting the values read so far.
+        Returns False if no wider type would hold it.
+        """
+        if not self.inferred:
+            return False
+        kind = _infer_type([self.type(), value])
+        if kind is self.type or (kind is str and not isinstance(value, six.string_types + six.integer_types + (float,))):
+            return False
+        values = list(self.build())
+        self.set_type(kind)
+        self.extend(values)
+        return True
+
+    def extend(self, values):
+        if self.type is None:
+            self.pending.extend(values)
+            if not any(value is not None for value in values):
+                return
+            self.set_type(_infer_type(self.pending))
+            values, self.pending = self.pending, None
+        append_value = self.values.append
+        append_mask = self.mask.append
+        kind = self.type
+        codes = self.codes if kind is str else None
+        missing = -1 if kind is str else 0
+        for i, value in enumerate(values):
+            # Values already of the column type, the usual case, skip convert()
+            if type(value) is not kind:
+                converted = self.convert(value)
+                if converted is None:
+                    if value is not None and self.promote(value):
+                        # Carry on from this value with the wider type
+                        return self.extend(values[i:])
+                    append_value(missing)
+                    append_mask(0)
+                    continue
+                value = converted
+            if codes is not None:
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(self.categories)
+                    self.categories.append(value)
+                value = code
+            try:
+                append_value(value)
+            except OverflowError:
+                append_value(missing)
+                append_mask(0)
+            else:
+                append_mask(1)
+
+    def build(self):
+        if self.type is None:
+            pending = self.pending
+            self.set_type(str)
+            self.extend(pending)
+        values, mask = self.values, self.mask
+        if numpy is not None:
+            values = numpy.frombuffer(values, dtype=values.typecode) if values else numpy.zeros(0, values.typecode)
+            if self.type is bool:
+                values = values.astype(numpy.bool_)
+            mask = numpy.frombuffer(mask, dtype=numpy.bool_) if mask else numpy.zeros(0, numpy.bool_)
+        return Column(self.name, self.type, values, mask, self.categories)
+
+
+class Column(object):
+    """One column of an :class:`Inventory`.
+
+    ``values`` holds a value for every row, in a NumPy array if NumPy is
+    installed or an :class:`array.array` otherwise, and ``mask`` is true for
+    the rows that have a value. For string columns, ``values`` holds codes
+    into the list of distinct strings in ``categories``, with ``-1`` for
+    missing values. Indexing and iterating a column give plain values, with
+    None for missing ones.
+
+    .. versionadded:: 0.4
+    """
+
+    def __init__(self, name, type, values, mask, categories=None):
+        self.name = name
+        self.type = type
+        self.values = values
+        self.mask = mask
+        self.categories = categories
+
+    def __repr__(self):
+        return '<Column %s %s[%d]>' % (self.name, self.type.__name__, len(self))
+
+    def __len__(self):
+        return len(self.mask)
+
+    def __getitem__(self, index):
+        if not self.mask[index]:
+            return None
+        value = self.values[index]
+        if self.categories is not None:
+            return self.categories[value]
+        return self.type(value)
+
+    def __iter__(self):
+        for index in six.moves.range(len(self)):
+            yield self[index]
+
+    def tolist(self):
+        """Return the values as a list, with None for missing values."""
+        return list(self)
+
+    def take(self, indices):
+        """Return a new column with only the given rows."""
+        if numpy is not None:
+            return Column(self.name, self.type, self.values[indices], self.mask[indices], self.categories)
+        values = array.array(self.values.typecode, [self.values[i] for i in indices])
+        mask = bytearray(self.mask[i] for i in indices)
+        return Column(self.name, self.type, values, mask, self.categories)
+
+    def count(self):
+        """The number of rows with a value."""
+        if numpy is not None:
+            return int(numpy.count_nonzero(self.mask))
+        return self.mask.count(b'\x01')
+
+    def percentile(self, q):
+        """The ``q``-th percentile of the values present, interpolating
+        linearly between values, or None if there are none.
+        """
+        if self.categories is not None:
+            raise TypeError('Cannot take a percentile of string column %s' % self.name)
+        if numpy is not None:
+            values = self.values[self.mask]
+            return float(numpy.percentile(values, q)) if len(values) else None
+        return _percentile([value for value, present in zip(self.values, self.mask) if present], q)
+
+    def groups(self):
+        """Return a dict mapping each distinct value to the indices of the
+        rows holding it. Rows without a value are left out.
+        """
+        if numpy is None:
+            groups = collections.defaultdict(list)
+            for index, value in enumerate(self):
+                if value is not None:
+                    groups[value].append(index)
+            return dict(groups)
+        if self.categories is not None:
+            keys, codes = self.categories, self.values
+        else:
+            keys, inverse = numpy.unique(self.values[self.mask], return_inverse=True)
+            keys = [self.type(key) for key in keys.tolist()]
+            codes = numpy.full(len(self), -1, dtype=numpy.int64)
+            codes[self.mask] = inverse
+        # Sorting the codes once gives every group as a contiguous slice
+        order = numpy.argsort(codes, kind='mergesort')
+        bounds = numpy.searchsorted(codes[order], numpy.arange(len(keys) + 1))
+        return dict((key, order[bounds[i]:bounds[i+1]]) for i, key in enumerate(keys) if bounds[i] < bounds[i+1])
+
+
+class Inventory(object):
+    """A table of attribute values, one :class:`Column` per attribute path
+    and one row per node, as returned by :func:`inventory`. Columns are
+    looked up by path::
+
+        inv = inventory('roles:web', ['name', 'platform', 'cpu.total'])
+        print inv.count(by='platform')
+        print inv.percentile('cpu.total', 95, by='platform')
+
+    .. versionadded:: 0.4
+    """
+
+    def __init__(self, columns):
+        self.columns = collections.OrderedDict((column.name, column) for column in columns)
+
+    @classmethod
+    def from_rows(cls, rows, columns, types=None):
+        """Build an inventory from any iterable of node documents, nodes or
+        partial search rows, see :func:`~chef.node.extract`. ``types`` maps
+        a column path to ``bool``, ``int``, ``float`` or ``str``. Other
+        columns take their type from the first values read, and are widened
+        from ``int`` to ``float``, or to ``str``, when a later value does not
+        fit. Values that cannot be converted to the column type are treated
+        as missing.
+        """
+        types = types or {}
+        paths = [AttributePath(column) for column in columns]
+        builders = [_ColumnBuilder(path.path, types.get(path.path)) for path in paths]
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, 1000))
+            if not batch:
+                break
+            for builder, values in zip(builders, extract(batch, paths, columns=True)):
+                builder.extend(values)
+        return cls([builder.build() for builder in builders])
+
+    def __len__(self):
+        for column in six.itervalues(self.columns):
+            return len(column)
+        return 0
+
+    def __getitem__(self, name):
+        return self.columns[str(name)]
+
+    def __iter__(self):
+        """Iterate over the rows, as tuples of plain values."""
+        return six.moves.zip(*self.columns.values())
+
+    def take(self, indices):
+        """Return a new inventory with only the given rows."""
+        return self.__class__([column.take(indices) for column in six.itervalues(self.columns)])
+
+    def group_by(self, name):
+        """Split the rows by the value of a column. Returns a dict mapping
+        each value to an :class:`Inventory` of the rows holding it.
+        """
+        return dict((key, self.take(indices)) for key, indices in six.iteritems(self[name].groups()))
+
+    def count(self, by=None):
+        """The number of rows, or with ``by`` a dict mapping each value of
+        that column to the number of rows holding it.
+        """
+        if by is None:
+            return len(self)
+        return dict((key, len(indices)) for key, indices in six.iteritems(self[by].groups()))
+
+    def percentile(self, name, q, by=None):
+        """The ``q``-th percentile of a numeric column, see
+        :meth:`Column.percentile`. With ``by``, returns a dict mapping each
+        value of that column to the percentile over the rows holding it.
+        """
+        column = self[name]
+        if by is None:
+            return column.percentile(q)
+        return dict((key, column.take(indices).percentile(q)) for key, indices in six.iteritems(self[by].groups()))
+
+
+def inventory(query='*:*', columns=(), types=None, index='node', rows=1000, api=None):
+    """Search the Chef index and collect the given attribute ``columns`` of
+    every result into an :class:`Inventory`. Columns are dotted attribute
+    paths, and ``types`` is passed on to :meth:`Inventory.from_rows`.
+
+    Results are read a page of ``rows`` at a time. On Chef servers that
+    support partial search only the requested attributes are downloaded,
+    otherwise whole objects are fetched and discarded once their columns
+    are read. If the API ``version`` is older than 11.0, as by default,
+    partial search is tried once and only used if the server accepts it::
+
+        inv = inventory('chef_environment:prod', ['name', 'platform', 'memory.total'],
+                        types={'memory.total': str})
+        for platform, count in inv.count(by='platform').items():
+            print platform, count
+
+    .. versionadded:: 0.4
+    """
+    api = api or ChefAPI.get_global()
+    paths = [AttributePath(column) for column in columns]
+    keys = dict((path.path, list(path.keys)) for path in paths)
+    search = _partial_search(index, query, keys, rows=rows, api=api)
+    return Inventory.from_rows(search.iter_all(), paths, types)
@@ -1,8 +1,139 @@
 import six
 import collections
+import functools
+import json as stdlib_json
+import sys
 
 from chef.base import ChefObject
 from chef.exceptions import ChefError
+from chef.run_list import NodeExpansion, RoleCache
+from chef.utils import json
+from chef.utils.merge import deep_merge
+
+_missing = object()
+
+# Attribute precedence levels, highest first
+precedence_levels = ('automatic', 'override', 'normal', 'default')
+
+if six.PY3:
+    _intern_text = sys.intern
+else:
+    # intern() only takes byte strings on Python 2, and JSON strings are
+    # unicode there, so they are shared through a table of our own
+    _interned_text = {}
+    def _intern_text(s):
+        return _interned_text.setdefault(s, s)
+
+class AttributePath(object):
+    """A dotted attribute path such as ``'cloud.public_hostname'``, split
+    once so it can be looked up in many nodes. It can be used anywhere a
+    dotted path string is accepted, such as :meth:`NodeAttributes.get_dotted`
+    and :func:`extract`::
+
+        hostname = AttributePath('cloud.public_hostname')
+        for node in nodes:
+            print node.attributes.get_dotted(hostname)
+
+    .. versionadded:: 0.4
+    """
+
+    __slots__ = ('path', 'keys')
+
+    def __init__(self, path):
+        if isinstance(path, AttributePath):
+            path = path.path
+        self.path = path
+        self.keys = tuple(path.split('.'))
+
+    def __repr__(self):
+        return 'AttributePath(%r)' % self.path
+
+    def __str__(self):
+        return self.path
+
+    def __eq__(self, other):
+        return isinstance(other, AttributePath) and self.path == other.path
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def lookup(self, levels):
+        """Find this path in a sequence of attribute dicts, highest precedence
+        first, without building :class:`NodeAttributes` views. A dict value
+        is returned merged across the levels, see
+        :func:`~chef.utils.merge.deep_merge`. Raises :exc:`KeyError` if the
+        path is missing.
+        """
+        if len(levels) == 1:
+            value = levels[0]
+            for key in self.keys:
+                if not isinstance(value, dict) or key not in value:
+                    raise KeyError(self.path)
+                value = value[key]
+            return value
+        last = len(self.keys) - 1
+        for i, key in enumerate(self.keys):
+            value = _missing
+            nested = []
+            for d in levels:
+                if key in d:
+                    level_value = d[key]
+                    if value is _missing:
+                        value = level_value
+                    if isinstance(level_value, dict):
+                        nested.append(level_value)
+            if value is _missing:
+                raise KeyError(self.path)
+            if not isinstance(value, dict):
+                if i == last:
+                    return value
+                raise KeyError(self.path)
+            levels = nested
+        return deep_merge(*reversed(levels))
+
+
+def _snapshot(level):
+    # A canonical form of a precedence level, to spot changes made in place
+    return stdlib_json.dumps(level, sort_keys=True, cls=json.JSONEncoder)
+
+
+class _AttributeState(object):
+    """Write counter and changed paths shared by the views of one node's
+    attributes.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self.changes = set()
+        # Precedence levels replaced on the node, see _LevelAttribute
+        self.levels = set()
+
+
+class _DeferredLevels(collections.Sequence):
+    """The precedence levels of a node loaded with ``lazy=True``. Levels
+    still held as :class:`~chef.utils.json.Deferred` text are decoded the
+    first time they are used.
+    """
+
+    __slots__ = ('levels',)
+
+    def __init__(self, levels):
+        self.levels = list(levels)
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.levels)))]
+        level = self.levels[index]
+        if isinstance(level, json.Deferred):
+            level = self.levels[index] = level.load()
+        return level
+
 
 class NodeAttributes(collections.MutableMapping):
     """A collection of Chef :class:`~chef.Node` attributes.
@@ -15,27 +146,61 @@ class NodeAttributes(collections.MutableMapping):
     When writing to new attributes, any dicts required in the hierarchy are
     created automatically.
 
+    The merged keys, and the nested view read last, are cached until the
+    next write through any view of the same node. Keys added or removed
+    directly in the underlying dicts, rather than through a view, may not be
+    seen by views that were already read.
+
     .. versionadded:: 0.1
     """
 
-    def __init__(self, search_path=[], path=None, write=None):
-        if not isinstance(search_path, collections.Sequence):
+    __slots__ = ('search_path', 'path', 'write', '_state', '_generation', '_keys', '_child_key', '_child')
+
+    def __init__(self, search_path=[], path=None, write=None, state=None):
+        if type(search_path) is not list and not isinstance(search_path, collections.Sequence):
             search_path = [search_path]
         self.search_path = search_path
         self.path = path or ()
         self.write = write
+        # Shared by every view of the same node, see _invalidate()
+        self._state = state = state or _AttributeState()
+        self._generation = state.generation
+        self._keys = None
+        self._child_key = self._child = None
+
+    def _reset(self):
+        self._generation = self._state.generation
+        self._keys = None
+        self._child_key = self._child = None
+
+    def _invalidate(self):
+        # Bumping the shared generation makes every view of this node drop
+        # its cached keys and children the next time it is read
+        self._state.generation += 1
 
     def __iter__(self):
-        keys = set()
-        for d in self.search_path:
-            keys |= set(six.iterkeys(d))
-        return iter(keys)
+        if self._generation != self._state.generation:
+            self._reset()
+        if self._keys is None:
+            if len(self.search_path) == 1:
+                keys = list(self.search_path[0])
+            else:
+                seen = set()
+                keys = [k for d in self.search_path for k in d if not (k in seen or seen.add(k))]
+            self._keys = keys
+        return iter(self._keys)
 
     def __len__(self):
-        l = 0
-        for key in self:
-            l += 1
-        return l
+        if self._keys is None or self._generation != self._state.generation:
+            for key in self:
+                break
+        return len(self._keys)
+
+    def __contains__(self, key):
+        for d in self.search_path:
+            if key in d:
+                return True
+        return False
 
     def __getitem__(self, key):
         for d in self.search_path:
@@ -46,6 +211,12 @@ class NodeAttributes(collections.MutableMapping):
             raise KeyError(key)
         if not isinstance(value, dict):
             return value
+        # Only the nested view read last is kept, so that consecutive reads
+        # under the same key share it without holding a view of everything
+        # that was ever read
+        child = self._child
+        if child is not None and self._child_key == key and self._generation == self._state.generation:
+            return child
         new_search_path = []
         for d in self.search_path:
             new_d = d.get(key, {})
@@ -53,23 +224,44 @@ class NodeAttributes(collections.MutableMapping):
                 # Structural mismatch
                 new_d = {}
             new_search_path.append(new_d)
-        return self.__class__(new_search_path, self.path+(key,), write=self.write)
-
-    def __setitem__(self, key, value):
+        child = self.__class__(new_search_path, self.path+(key,), self.write, self._state)
+        if self._generation != self._state.generation:
+            self._reset()
+        self._child_key = key
+        self._child = child
+        return child
+
+    def _write_dest(self):
         if self.write is None:
             raise ChefError('This attribute is not writable')
         dest = self.write
+        if callable(dest):
+            # The normal level of a lazily loaded node, decoded on first write
+            dest = dest()
         for path_key in self.path:
             dest = dest.setdefault(path_key, {})
-        dest[key] = value
+        return dest
+
+    def __setitem__(self, key, value):
+        self._write_dest()[key] = value
+        self._invalidate()
+        self._state.changes.add(self.path + (key,))
 
     def __delitem__(self, key):
-        if self.write is None:
-            raise ChefError('This attribute is not writable')
-        dest = self.write
-        for path_key in self.path:
-            dest = dest.setdefault(path_key, {})
-        del dest[key]
+        del self._write_dest()[key]
+        self._invalidate()
+        self._state.changes.add(self.path + (key,))
+
+    @property
+    def changes(self):
+        """The dotted paths written or deleted through any view of the same
+        attributes since they were loaded or last saved, sorted. Changes made
+        in place to a list or dict value, rather than by assigning it, are
+        not seen.
+
+        .. versionadded:: 0.4
+        """
+        return sorted('.'.join(six.text_type(k) for k in path) for path in self._state.changes)
 
     def has_dotted(self, key):
         """Check if a given dotted key path is present. See :meth:`.get_dotted`
@@ -89,13 +281,16 @@ class NodeAttributes(collections.MutableMapping):
         is a string of the form `'foo.bar.baz'`, with each `.` separating
         hierarcy levels.
 
+        The path can also be a compiled :class:`AttributePath`.
+
         Example::
 
             node.attributes['apache']['log_dir'] = '/srv/log'
             print node.attributes.get_dotted('apache.log_dir')
         """
         value = self
-        for k in key.split('.'):
+        keys = key.keys if isinstance(key, AttributePath) else key.split('.')
+        for k in keys:
             if not isinstance(value, NodeAttributes):
                 raise KeyError(key)
             value = value[k]
@@ -110,7 +305,7 @@ class NodeAttributes(collections.MutableMapping):
             node.attributes.set_dotted('apache.log_dir', '/srv/log')
         """
         dest = self
-        keys = key.split('.')
+        keys = list(key.keys) if isinstance(key, AttributePath) else key.split('.')
         last_key = keys.pop()
         for k in keys:
             if k not in dest:
@@ -121,10 +316,42 @@ class NodeAttributes(collections.MutableMapping):
         dest[last_key] = value
 
     def to_dict(self):
-        merged = {}
-        for d in reversed(self.search_path):
-            merged.update(d)
-        return merged
+        """Return the merged attributes as a dict. Subtrees that exist in only
+        one precedence level are shared with it, see
+        :func:`~chef.utils.merge.deep_merge`.
+        """
+        return deep_merge(*reversed(self.search_path))
+
+json.register_type(NodeAttributes, NodeAttributes.to_dict)
+
+
+class _LevelAttribute(object):
+    """The view of one precedence level of a :class:`Node`, created when it
+    is first used.
+    """
+
+    def __init__(self, level):
+        self.level = level
+        self.slot = '_' + level
+
+    def __get__(self, node, cls):
+        if node is None:
+            return self
+        view = getattr(node, self.slot, None)
+        if view is None:
+            data = node.attributes.search_path[precedence_levels.index(self.level)]
+            if self.level == 'normal':
+                # Writes through either view invalidate the cache of both
+                view = NodeAttributes(data, write=data, state=node.attributes._state)
+            else:
+                view = NodeAttributes(data)
+            setattr(node, self.slot, view)
+        return view
+
+    def __set__(self, node, value):
+        setattr(node, self.slot, value)
+        node.attributes._state.levels.add(self.level)
+
 
 
 class Node(ChefObject):
@@ -143,7 +370,8 @@ class Node(ChefObject):
 
         :class:`~chef.node.NodeAttributes` corresponding to the composite of all
         precedence levels. This only uses the stored data on the Chef server,
-        it does not merge in attributes from roles or environments on its own.
+        it does not merge in attributes from roles or environments on its own;
+        see :meth:`expand` for that.
 
         ::
 
@@ -187,6 +415,28 @@ class Node(ChefObject):
 
         :class:`~chef.node.NodeAttributes` corresponding to the ``automatic``
         precedence level.
+
+    With ``lazy=True``, the precedence levels are kept as JSON text when the
+    node is loaded, and each one is only decoded when it is first used. The
+    ``automatic`` level holds all of the Ohai data, so a script that only
+    reads the run list or environment of a node never builds it::
+
+        >>> node = Node('name', lazy=True)
+        >>> node.chef_environment
+        'prod'
+
+    Reading a single level, such as ``node.default``, decodes only that
+    level, while the merged :attr:`attributes` decode all of them.
+
+    Writes to the :attr:`normal` attributes, through either :attr:`normal`
+    or :attr:`attributes`, and changes to the :attr:`run_list` and
+    :attr:`chef_environment` are tracked, so that :meth:`save` can skip
+    nodes that have not changed. See :attr:`changes`. With
+    ``track_changes=True``, changes made in place inside the ``normal``
+    level are seen as well, see :meth:`track_changes`.
+
+    .. versionchanged:: 0.4
+        Added ``lazy`` and ``track_changes``.
     """
 
     url = '/nodes'
@@ -199,6 +449,31 @@ class Node(ChefObject):
         'chef_environment': str
     }
 
+    # Longest string value interned by compact()
+    compact_max_length = 64
+
+    automatic = _LevelAttribute('automatic')
+    override = _LevelAttribute('override')
+    normal = _LevelAttribute('normal')
+    default = _LevelAttribute('default')
+
+    def __init__(self, name, api=None, skip_load=False, lazy=False, track_changes=False):
+        self.lazy = lazy
+        super(Node, self).__init__(name, api, skip_load)
+        if track_changes:
+            self.track_changes()
+
+    @classmethod
+    def _hydrate(cls, data, api):
+        obj = super(Node, cls)._hydrate(data, api)
+        obj.lazy = False
+        return obj
+
+    def _fetch(self):
+        if not self.lazy:
+            return super(Node, self)._fetch()
+        return self.api.api_request('GET', self.url, loads=_loads_lazy)
+
     def has_key(self, key):
       return self.attributes.has_dotted(key)
 
@@ -217,12 +492,240 @@ class Node(ChefObject):
             # function correctly
             data['normal'] = {}
         data.setdefault('chef_environment', '_default')
-        super(Node, self)._populate(data)
-        self.attributes = NodeAttributes((data.get('automatic', {}),
-                                          data.get('override', {}),
-                                          data['normal'], # Must exist, see above
-                                          data.get('default', {})), write=data['normal'])
+        for name, cls in six.iteritems(self.__class__.attributes):
+            if name not in precedence_levels:
+                setattr(self, name, cls(data[name]) if name in data else cls())
+        levels = (data.get('automatic', {}),
+                  data.get('override', {}),
+                  data['normal'], # Must exist, see above
+                  data.get('default', {}))
+        write = data['normal']
+        if any(isinstance(level, json.Deferred) for level in levels):
+            levels = _DeferredLevels(levels)
+            write = functools.partial(levels.__getitem__, precedence_levels.index('normal'))
+        self.attributes = NodeAttributes(levels, write=write)
+        self._save_state(False)
+        # The views of each level are created on first use
+        for level in precedence_levels:
+            setattr(self, '_' + level, None)
+
+    @property
+    def changes(self):
+        """The changes made to this node since it was loaded or last saved,
+        as a sorted list of paths. Attribute paths are dotted and start with
+        the precedence level, such as ``'normal.app.version'``, and
+        ``'run_list'`` or ``'chef_environment'`` are included if they
+        changed::
+
+            >>> node.run_list.append('role[web]')
+            >>> node.normal['app']['version'] = '2.0'
+            >>> node.changes
+            ['normal.app.version', 'run_list']
+
+        Changes made in place to a list or dict inside the ``normal`` level,
+        such as ``node.normal['tags'].append('web')``, have no path of their
+        own. They are only seen once :meth:`track_changes` has been called,
+        and are listed as ``'normal'``.
+
+        .. versionadded:: 0.4
+        """
+        changes = ['normal.' + path for path in self.attributes.changes]
+        changes.extend(self.attributes._state.levels)
+        run_list, chef_environment, normal = self._saved
+        if not changes and self._normal_changed(normal):
+            changes.append('normal')
+        if self.run_list != run_list:
+            changes.append('run_list')
+        if self.chef_environment != chef_environment:
+            changes.append('chef_environment')
+        return sorted(changes)
+
+    def track_changes(self):
+        """Start watching the ``normal`` level for changes made in place, so
+        that they show up in :attr:`changes` and are saved by
+        :meth:`save` with ``only_if_changed=True``. This keeps a copy of the
+        level as it is now, which is why it is not done for every node.
+        Returns the node itself::
+
+            nodes = [node.track_changes() for node in Search('node').objects()]
+
+        .. versionadded:: 0.4
+        """
+        self._save_state(True)
+        return self
+
+    def _save_state(self, track):
+        normal = None
+        if track:
+            # The normal level of a lazily loaded node is kept as its
+            # Deferred text, and only compared once it has been decoded
+            normal = self._normal_level()
+            if not isinstance(normal, json.Deferred):
+                normal = _snapshot(normal)
+        self._saved = (list(self.run_list), self.chef_environment, normal)
+
+    def _normal_level(self):
+        levels = self.attributes.search_path
+        index = precedence_levels.index('normal')
+        if isinstance(levels, _DeferredLevels):
+            return levels.levels[index]
+        return levels[index]
+
+    def _normal_changed(self, saved):
+        if saved is None:
+            # Not tracking changes made in place
+            return False
+        normal = self._normal_level()
+        if isinstance(normal, json.Deferred):
+            return False
+        if isinstance(saved, json.Deferred):
+            saved = _snapshot(saved.load())
+        return _snapshot(normal) != saved
+
+    def save(self, api=None, only_if_changed=False):
+        """Save this node to the server, as with :meth:`ChefObject.save
+        <chef.base.ChefObject.save>`. With ``only_if_changed=True``, a node
+        that already exists is only sent if it has any :attr:`changes`.
+        Returns True if the node was sent::
+
+            changes = node.changes
+            if node.save(only_if_changed=True):
+                print 'Updated %s: %s' % (node, ', '.join(changes))
+
+        Changes made in place are only seen inside the ``normal`` level, and
+        only after :meth:`track_changes`, so leave ``only_if_changed`` off
+        after editing a value in place otherwise.
+
+        .. versionchanged:: 0.4
+            Added ``only_if_changed``.
+        """
+        if self.exists and only_if_changed and not self.changes:
+            return False
+        super(Node, self).save(api)
+        self.exists = True
+        self.attributes._state.changes.clear()
+        self.attributes._state.levels.clear()
+        self._save_state(self._saved[2] is not None)
+        return True
+
+    def expand(self, cache=None):
+        """Expand the :attr:`run_list` of this node in its environment,
+        following nested roles and their per-environment run lists, and work
+        out its effective attributes. Returns a
+        :class:`~chef.run_list.NodeExpansion` of ``recipes``, ``roles``,
+        ``missing_roles`` and ``attributes``, a read-only
+        :class:`NodeAttributes` with the role and environment attributes
+        layered over the stored levels as Chef does: environment then role
+        defaults above the node's default level, and role then environment
+        overrides above its override level.
+
+        Roles and environments come from ``cache``, a
+        :class:`~chef.run_list.RoleCache`, so pass the same one when expanding
+        many nodes to fetch each of them only once::
+
+            cache = RoleCache()
+            for name in Node.list():
+                expansion = Node(name).expand(cache)
+                print name, expansion.attributes.get_dotted('app.version')
+
+        .. versionadded:: 0.4
+        """
+        if cache is None:
+            cache = RoleCache(self.api)
+        expansion = cache.expand(self.run_list, self.chef_environment or '_default')
+        environment = cache.environment(expansion.environment)
+        env_default = environment and environment.default_attributes or {}
+        env_override = environment and environment.override_attributes or {}
+        automatic, override, normal, default = self.attributes.search_path
+        search_path = [automatic, env_override, expansion.override_attributes, override,
+                       normal, expansion.default_attributes, env_default, default]
+        return NodeExpansion(expansion.recipes, expansion.roles, expansion.missing_roles,
+                             NodeAttributes(search_path))
+
+    def compact(self):
+        """Reduce the memory used by this node's attributes, for holding many
+        nodes at once. Every key in the attribute tree, and every string value
+        of up to :attr:`compact_max_length` characters, is replaced by the
+        interned copy of the same string. Keys and values repeated across
+        nodes, such as Ohai's attribute names, package names or platform
+        versions, are then stored once per process rather than once per
+        node. On Python 2, where these strings are unicode and can't be
+        interned, they are shared through a table that keeps them for the
+        life of the process. Returns the node itself::
+
+            nodes = [node.compact() for node in Search('node').iter_all()]
+
+        .. versionadded:: 0.4
+        """
+        max_length = self.compact_max_length
+        def compact_value(value):
+            if type(value) is six.text_type:
+                if len(value) <= max_length:
+                    return _intern_text(value)
+            elif isinstance(value, dict):
+                stack.append(value)
+            elif isinstance(value, list):
+                value[:] = [compact_value(v) for v in value]
+            return value
+        stack = list(self.attributes.search_path)
+        while stack:
+            d = stack.pop()
+            items = list(six.iteritems(d))
+            d.clear()
+            for key, value in items:
+                if type(key) is six.text_type:
+                    key = _intern_text(key)
+                d[key] = compact_value(value)
+        return self
 
     def cookbooks(self, api=None):
         api = api or self.api
         return api[self.url + '/cookbooks']
+
+
+def _loads_lazy(s):
+    return json.loads_deferred(s, defer=precedence_levels)
+
+
+def extract(items, paths, default=None, columns=False):
+    """Read many attribute paths from many nodes in one pass, straight from
+    the attribute dicts. ``items`` can contain :class:`Node` objects,
+    :class:`NodeAttributes`, node documents such as the rows of a full
+    :class:`~chef.Search`, or the rows of a partial search whose keys are
+    the dotted paths. Top-level keys of documents and rows, such as
+    ``name`` or ``chef_environment``, can be read as well.
+
+    ``paths`` are dotted strings or :class:`AttributePath` objects, and
+    missing paths give ``default``. Returns a list with a tuple of values for
+    each item or, with ``columns=True``, a list with a list of values for
+    each path::
+
+        rows = Search('node', 'roles:web')
+        for name, fqdn in extract(rows, ['name', 'fqdn']):
+            print name, fqdn
+
+    .. versionadded:: 0.4
+    """
+    paths = [path if isinstance(path, AttributePath) else AttributePath(path) for path in paths]
+    results = []
+    for item in items:
+        if isinstance(item, Node):
+            top, levels = None, item.attributes.search_path
+        elif isinstance(item, NodeAttributes):
+            top, levels = None, item.search_path
+        else:
+            top = item
+            levels = [item[name] for name in precedence_levels if isinstance(item.get(name), dict)] or [item]
+        values = []
+        for path in paths:
+            if top is not None and path.path in top:
+                values.append(top[path.path])
+                continue
+            try:
+                values.append(path.lookup(levels))
+            except KeyError:
+                values.append(default)
+        results.append(tuple(values))
+    if columns:
+        return [list(column) for column in zip(*results)] if results else [[] for path in paths]
+    return results
@@ -0,0 +1,87 @@
+import collections
+import email.utils
+import random
+import threading
+import time
+
+
+class RetryPolicy(object):
+    """Controls how a :class:`~chef.ChefAPI` retries failed requests.
+
+    Requests using one of ``methods`` are retried when the connection fails
+    or the server answers with one of ``statuses``, up to ``max_attempts``
+    attempts in total. Between attempts the API waits for a random time of up
+    to ``backoff * 2 ** retry`` seconds, capped at ``max_backoff``, unless
+    the server sent a ``Retry-After`` header, which is honored instead. No
+    retry is attempted if it would end more than ``deadline`` seconds after
+    the first attempt started. Each attempt is signed again, so timestamps
+    stay valid.
+
+    Enable it by passing ``retry=True`` (or a RetryPolicy instance) when
+    creating the API::
+
+        api = ChefAPI('http://localhost:4000', 'client.pem', 'admin',
+                      retry=RetryPolicy(max_attempts=8, deadline=300))
+
+    The number of retries made for a request is available as the ``retries``
+    attribute of the returned response or raised
+    :class:`~chef.exceptions.ChefServerError`. Totals across all requests
+    are kept in :attr:`stats`, counting ``'requests'``, ``'retries'``,
+    ``'retried_requests'`` and ``'exhausted'`` requests as well as each
+    retried status code.
+
+    .. versionadded:: 0.4
+    """
+
+    def __init__(self, max_attempts=5, backoff=0.5, max_backoff=30, deadline=120,
+                 statuses=(429, 502, 503, 504),
+                 methods=('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(m.upper() for m in methods)
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+
+    def next_delay(self, method, attempt, elapsed, response=None):
+        """Return how many seconds to wait before retrying a failed attempt,
+        or None if the request should not be retried. ``attempt`` counts from
+        1, and ``response`` is None if the connection failed.
+        """
+        if method.upper() not in self.methods or attempt >= self.max_attempts:
+            return None
+        if response is not None and response.status_code not in self.statuses:
+            return None
+        delay = self.retry_after(response)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        if self.deadline is not None and elapsed + delay > self.deadline:
+            return None
+        return delay
+
+    @staticmethod
+    def retry_after(response):
+        """Parse the ``Retry-After`` header of a response, in seconds."""
+        value = response is not None and response.headers.get('retry-after')
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return int(value)
+        date = email.utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0, email.utils.mktime_tz(date) - time.time())
+
+    def record(self, retries, status_codes, success):
+        with self._lock:
+            self.stats['requests'] += 1
+            if retries:
+                self.stats['retries'] += retries
+                self.stats['retried_requests'] += 1
+            for code in status_codes:
+                self.stats[code] += 1
+            if not success and retries:
+                self.stats['exhausted'] += 1
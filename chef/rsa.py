@@ -1,5 +1,8 @@
 import six
+import collections
+import hashlib
 import sys
+import threading
 from ctypes import *
 from ctypes.util import find_library
 
@@ -88,6 +91,12 @@ PEM_read_bio_RSAPublicKey = _eay.PEM_read_bio_RSAPublicKey
 PEM_read_bio_RSAPublicKey.argtypes = [c_void_p, c_void_p, c_void_p, c_void_p]
 PEM_read_bio_RSAPublicKey.restype = c_void_p
 
+#RSA *PEM_read_bio_RSA_PUBKEY(BIO *bp, RSA **x,
+#                             pem_password_cb *cb, void *u);
+PEM_read_bio_RSA_PUBKEY = _eay.PEM_read_bio_RSA_PUBKEY
+PEM_read_bio_RSA_PUBKEY.argtypes = [c_void_p, c_void_p, c_void_p, c_void_p]
+PEM_read_bio_RSA_PUBKEY.restype = c_void_p
+
 #int PEM_write_bio_RSAPrivateKey(BIO *bp, RSA *x, const EVP_CIPHER *enc,
 #                                        unsigned char *kstr, int klen,
 #                                        pem_password_cb *cb, void *u);
@@ -115,6 +124,24 @@ RSA_public_decrypt.restype = c_int
 RSA_PKCS1_PADDING = 1
 RSA_NO_PADDING = 3
 
+#int RSA_sign(int type, const unsigned char *m, unsigned int m_len,
+#    unsigned char *sigret, unsigned int *siglen, RSA *rsa);
+RSA_sign = _eay.RSA_sign
+RSA_sign.argtypes = [c_int, c_void_p, c_uint, c_void_p, POINTER(c_uint), c_void_p]
+RSA_sign.restype = c_int
+
+#int RSA_verify(int type, const unsigned char *m, unsigned int m_len,
+#    const unsigned char *sigbuf, unsigned int siglen, RSA *rsa);
+RSA_verify = _eay.RSA_verify
+RSA_verify.argtypes = [c_int, c_void_p, c_uint, c_void_p, c_uint, c_void_p]
+RSA_verify.restype = c_int
+
+# Digest NIDs from objects.h, for RSA_sign and RSA_verify
+digest_nids = {
+    'sha1': 64,
+    'sha256': 672,
+}
+
 # int RSA_size(const RSA *rsa);
 RSA_size = _eay.RSA_size
 RSA_size.argtypes = [c_void_p]
@@ -133,22 +160,88 @@ RSA_F4 = 0x10001
 RSA_free = _eay.RSA_free
 RSA_free.argtypes = [c_void_p]
 
+# int RSA_up_ref(RSA *rsa);
+RSA_up_ref = _eay.RSA_up_ref
+RSA_up_ref.argtypes = [c_void_p]
+RSA_up_ref.restype = c_int
+
+class KeyCache(object):
+    """Parsed RSA handles shared by every :class:`Key` loaded from the same
+    file or PEM text, so creating a Key does not re-read and re-parse it.
+
+    Keys are looked up by the SHA-256 hash of their PEM text, whether it
+    was passed in or read from a file, so a key file that is rotated in
+    place is parsed again even if its size and modification time did not
+    change. The handles are reference counted by OpenSSL: the cache
+    and each Key using a handle hold a reference, and it is freed once the
+    last of them lets go. At most ``max_size`` handles are kept.
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def acquire(self, cache_key):
+        """Return ``(handle, public, raw)`` for a cached key, with a new
+        reference to the handle for the caller, or None.
+        """
+        with self._lock:
+            entry = self._entries.pop(cache_key, None)
+            if entry is None:
+                return None
+            self._entries[cache_key] = entry
+            RSA_up_ref(entry[0])
+            return entry
+
+    def add(self, cache_key, handle, public, raw):
+        with self._lock:
+            if cache_key in self._entries:
+                return
+            RSA_up_ref(handle)
+            self._entries[cache_key] = (handle, public, raw)
+            while len(self._entries) > self.max_size:
+                RSA_free(self._entries.popitem(last=False)[1][0])
+
+    def clear(self):
+        with self._lock:
+            while self._entries:
+                RSA_free(self._entries.popitem()[1][0])
+
+key_cache = KeyCache()
+
 class Key(object):
-    """An OpenSSL RSA key."""
+    """An OpenSSL RSA key.
+
+    Keys loaded from a file or PEM text share the parsed key through
+    :data:`key_cache`, so loading the same key again is cheap.
+    """
 
     def __init__(self, fp=None):
         self.key = None
         self.public = False
+        # Per-thread output buffers, reused across calls
+        self._buffers = threading.local()
         if not fp:
             return
         if isinstance(fp, six.binary_type) and fp.startswith(b'-----'):
             # PEM formatted text
             self.raw = fp
         elif isinstance(fp, six.string_types):
-            self.raw = open(fp, 'rb').read()
+            with open(fp, 'rb') as f:
+                self.raw = f.read()
         else:
             self.raw = fp.read()
+        cache_key = hashlib.sha256(self.raw).digest()
+        cached = key_cache.acquire(cache_key)
+        if cached is not None:
+            self.key, self.public, self.raw = cached
+            return
         self._load_key()
+        key_cache.add(cache_key, self.key, self.public, self.raw)
 
     def _load_key(self):
         if b'\0' in self.raw:
@@ -164,8 +257,15 @@ class Key(object):
                 BIO_reset(bio)
                 self.public = True
                 self.key = PEM_read_bio_RSAPublicKey(bio, 0, 0, 0)
+            if not self.key:
+                # X.509 SubjectPublicKeyInfo, as stored by the Chef server
+                BIO_reset(bio)
+                self.key = PEM_read_bio_RSA_PUBKEY(bio, 0, 0, 0)
             if not self.key:
                 raise SSLError('Unable to load RSA key')
+            # Drop the errors left by the formats that didn't match
+            while ERR_get_error():
+                pass
         finally:
             BIO_free(bio)
 
@@ -175,34 +275,59 @@ class Key(object):
         self.key = RSA_generate_key(size, exp, None, None)
         return self
 
+    def _output_buffer(self):
+        output = getattr(self._buffers, 'output', None)
+        if output is None:
+            output = self._buffers.output = create_string_buffer(RSA_size(self.key))
+        return output
+
     def private_encrypt(self, value, padding=RSA_PKCS1_PADDING):
         if self.public:
             raise SSLError('private method cannot be used on a public key')
         if six.PY3 and not isinstance(value, bytes):
-            buf = create_string_buffer(value.encode(), len(value))
-        else:
-            buf = create_string_buffer(value, len(value))
-        size = RSA_size(self.key)
-        output = create_string_buffer(size)
-        ret = RSA_private_encrypt(len(buf), buf, output, self.key, padding)
+            value = value.encode()
+        output = self._output_buffer()
+        ret = RSA_private_encrypt(len(value), value, output, self.key, padding)
         if ret <= 0:
             raise SSLError('Unable to encrypt data')
-        return output.raw[:ret]
+        return string_at(output, ret)
 
     def public_decrypt(self, value, padding=RSA_PKCS1_PADDING):
         if six.PY3 and not isinstance(value, bytes):
-            buf = create_string_buffer(value.encode(), len(value))
-        else:
-            buf = create_string_buffer(value, len(value))
-        size = RSA_size(self.key)
-        output = create_string_buffer(size)
-        ret = RSA_public_decrypt(len(buf), buf, output, self.key, padding)
+            value = value.encode()
+        output = self._output_buffer()
+        ret = RSA_public_decrypt(len(value), value, output, self.key, padding)
         if ret <= 0:
             raise SSLError('Unable to decrypt data')
-        if six.PY3 and isinstance(output.raw, bytes):
-            return output.raw[:ret].decode()
+        if six.PY3:
+            return string_at(output, ret).decode()
         else:
-            return output.raw[:ret]
+            return string_at(output, ret)
+
+    def sign(self, value, digest='sha256'):
+        """Create a PKCS #1 v1.5 signature of the given data."""
+        if self.public:
+            raise SSLError('private method cannot be used on a public key')
+        if six.PY3 and not isinstance(value, bytes):
+            value = value.encode()
+        hashed = hashlib.new(digest, value).digest()
+        output = self._output_buffer()
+        size = c_uint()
+        if RSA_sign(digest_nids[digest], hashed, len(hashed), output, byref(size), self.key) != 1:
+            raise SSLError('Unable to sign data')
+        return string_at(output, size.value)
+
+    def verify(self, value, signature, digest='sha256'):
+        """Check a PKCS #1 v1.5 signature created by :meth:`sign`."""
+        if six.PY3 and not isinstance(value, bytes):
+            value = value.encode()
+        hashed = hashlib.new(digest, value).digest()
+        if RSA_verify(digest_nids[digest], hashed, len(hashed), signature, len(signature), self.key) != 1:
+            # Don't leave the failure in the OpenSSL error queue
+            while ERR_get_error():
+                pass
+            return False
+        return True
 
     def private_export(self):
         if self.public:
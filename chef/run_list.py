@@ -0,0 +1,152 @@
+import collections
+import re
+import threading
+
+from chef.api import ChefAPI
+from chef.base import _parallel
+from chef.environment import Environment
+from chef.role import Role
+from chef.utils.merge import deep_merge
+
+_item_re = re.compile(r'(role|recipe)\[([^\[\]]+)\]\Z|([^\[\]]+)\Z')
+
+
+def parse_item(item):
+    """Split a run list item such as ``'role[web]'`` into its type and name,
+    as ``('role', 'web')``. A bare name is a recipe.
+
+    .. versionadded:: 0.4
+    """
+    match = _item_re.match(item)
+    if match is None:
+        raise ValueError('Invalid run list item %r' % (item,))
+    if match.group(3):
+        return 'recipe', match.group(3)
+    return match.group(1), match.group(2)
+
+
+# The expanded run list of a node, and its effective attributes
+NodeExpansion = collections.namedtuple('NodeExpansion', 'recipes roles missing_roles attributes')
+
+
+class RunListExpansion(object):
+    """The result of expanding a run list in an environment, see
+    :meth:`RoleCache.expand`.
+
+    ``recipes`` and ``roles`` list every recipe and role reached, in the
+    order Chef applies them and without duplicates, and ``missing_roles``
+    any role that does not exist. ``default_attributes`` and
+    ``override_attributes`` are the attributes of all the roles, merged so
+    that each role takes precedence over the roles nested in it and those
+    earlier in the run list.
+
+    Expansions are shared between every node with the same run list and
+    environment, so none of this should be modified.
+
+    .. versionadded:: 0.4
+    """
+
+    def __init__(self, environment):
+        self.environment = environment
+        self.recipes = []
+        self.roles = []
+        self.missing_roles = []
+        self.default_attributes = {}
+        self.override_attributes = {}
+
+    def __repr__(self):
+        return '<RunListExpansion %s>' % ', '.join(self.recipes)
+
+
+class RoleCache(object):
+    """Fetches roles and environments from the server once and keeps them,
+    for expanding the run lists of many nodes. Expansions are memoized as
+    well, so nodes with the same run list and environment share the work::
+
+        cache = RoleCache()
+        for row in Search('node').iter_all():
+            print row['name'], row.object.expand(cache).recipes
+
+    Nothing is refreshed once fetched, so use a new cache to pick up changes
+    made on the server.
+
+    .. versionadded:: 0.4
+    """
+
+    def __init__(self, api=None):
+        self.api = api or ChefAPI.get_global()
+        self.roles = {}
+        self.environments = {}
+        self._expansions = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, objects, name):
+        obj = objects.get(name)
+        if obj is None and name not in objects:
+            obj = cls(name, api=self.api)
+            if not obj.exists:
+                obj = None
+            with self._lock:
+                objects[name] = obj
+        return obj
+
+    def role(self, name):
+        """Return a :class:`~chef.Role`, or None if it does not exist."""
+        return self._get(Role, self.roles, name)
+
+    def environment(self, name):
+        """Return an :class:`~chef.Environment`, or None if it does not
+        exist.
+        """
+        return self._get(Environment, self.environments, name)
+
+    def prefetch(self, concurrency=10):
+        """Load every role on the server up front, using up to
+        ``concurrency`` requests at once.
+        """
+        names = [name for name in Role.list(api=self.api).names if name not in self.roles]
+        for name, role, error in _parallel(self.role, names, concurrency):
+            if error is not None:
+                raise error
+        return self
+
+    def expand(self, run_list, environment='_default'):
+        """Expand a run list in an environment, following nested roles and
+        the run list each role has for the environment. Returns a
+        :class:`RunListExpansion`.
+        """
+        key = (tuple(run_list), environment)
+        expansion = self._expansions.get(key)
+        if expansion is None:
+            expansion = RunListExpansion(environment)
+            self._expand(run_list, expansion, set(), set())
+            with self._lock:
+                self._expansions[key] = expansion
+        return expansion
+
+    def _expand(self, run_list, expansion, recipes, applied):
+        for item in run_list:
+            kind, name = parse_item(item)
+            if kind == 'recipe':
+                if name not in recipes:
+                    recipes.add(name)
+                    expansion.recipes.append(name)
+                continue
+            # Each role is applied once, which also stops cycles
+            if name in applied:
+                continue
+            applied.add(name)
+            role = self.role(name)
+            if role is None:
+                expansion.missing_roles.append(name)
+                continue
+            expansion.roles.append(name)
+            env_run_lists = role.env_run_lists or {}
+            if expansion.environment in env_run_lists:
+                role_run_list = env_run_lists[expansion.environment]
+            else:
+                role_run_list = role.run_list
+            self._expand(role_run_list or [], expansion, recipes, applied)
+            # As in Chef, a role's attributes win over those of its nested roles
+            expansion.default_attributes = deep_merge(expansion.default_attributes, role.default_attributes)
+            expansion.override_attributes = deep_merge(expansion.override_attributes, role.override_attributes)
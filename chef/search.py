@@ -2,13 +2,36 @@ import six
 import collections
 import copy
 import six.moves.urllib.parse
+import weakref
+from multiprocessing.pool import ThreadPool
+
+import pkg_resources
 
 from chef.api import ChefAPI
 from chef.base import ChefQuery, ChefObject
+from chef.exceptions import ChefAPIVersionError, ChefServerError
+
+# Whether the server of a ChefAPI older than Search.partial_version turned
+# out to support partial search anyway, see _partial_search()
+_partial_support = weakref.WeakKeyDictionary()
+
+def _object_class(chef_class):
+    # Decode Chef class name
+    if chef_class.startswith('Chef::'):
+        chef_class = chef_class[6:]
+    if chef_class == 'ApiClient':
+        chef_class = 'Client' # Special case since I don't match the Ruby name.
+    cls = ChefObject.types.get(chef_class.lower())
+    if not cls:
+        raise ValueError('Unknown class %s'%chef_class)
+    return cls
+
 
 class SearchRow(dict):
     """A single row in a search result."""
 
+    __slots__ = ('api', '_object')
+
     def __init__(self, row, api):
         super(SearchRow, self).__init__(row)
         self.api = api
@@ -17,15 +40,7 @@ class SearchRow(dict):
     @property
     def object(self):
         if self._object is  None:
-            # Decode Chef class name
-            chef_class = self.get('json_class', '')
-            if chef_class.startswith('Chef::'):
-                chef_class = chef_class[6:]
-            if chef_class == 'ApiClient':
-                chef_class = 'Client' # Special case since I don't match the Ruby name.
-            cls = ChefObject.types.get(chef_class.lower())
-            if not cls:
-                raise ValueError('Unknown class %s'%chef_class)
+            cls = _object_class(self.get('json_class', ''))
             self._object = cls.from_search(self, api=self.api)
         return self._object
 
@@ -43,21 +58,41 @@ class Search(collections.Sequence):
             print row['roles']
             print row.object.name
     
+    A partial search returns only the requested attributes of each result
+    instead of the whole object. Pass ``keys`` as a dict mapping the name to
+    use in each row to the attribute path to fetch::
+
+        for row in Search('node', 'roles:app', keys={'ip': ['ipaddress']}):
+            print row['ip']
+
+    Rows from a partial search do not support :attr:`SearchRow.object`.
+
     .. versionadded:: 0.1
+
+    .. versionadded:: 0.4
+        The ``keys`` argument. Partial search requires Chef server 11 or greater.
     """
 
     url = '/search'
 
-    def __init__(self, index, q='*:*', rows=1000, start=0, api=None):
+    partial_version = pkg_resources.parse_version('11.0.0')
+
+    def __init__(self, index, q='*:*', rows=1000, start=0, api=None, keys=None):
         self.name = index
         self.api = api or ChefAPI.get_global()
+        if keys is not None and self.api.version_parsed < self.partial_version and not _partial_support.get(self.api):
+            raise ChefAPIVersionError('Partial search requires Chef API 11.0 or greater')
+        self.keys = keys
         self._args = dict(q=q, rows=rows, start=start)
         self.url = self.__class__.url + '/' + self.name + '?' + six.moves.urllib.parse.urlencode(self._args)
 
     @property
     def data(self):
         if not hasattr(self, '_data'):
-            self._data = self.api[self.url]
+            if self.keys is None:
+                self._data = self.api[self.url]
+            else:
+                self._data = self.api.api_request('POST', self.url, data=self.keys)
         return self._data
 
     @property
@@ -67,17 +102,117 @@ class Search(collections.Sequence):
     def query(self, query):
         args = copy.copy(self._args)
         args['q'] = query
-        return self.__class__(self.name, api=self.api, **args)
+        return self.__class__(self.name, api=self.api, keys=self.keys, **args)
 
     def rows(self, rows):
         args = copy.copy(self._args)
         args['rows'] = rows
-        return self.__class__(self.name, api=self.api, **args)
+        return self.__class__(self.name, api=self.api, keys=self.keys, **args)
 
     def start(self, start):
         args = copy.copy(self._args)
         args['start'] = start
-        return self.__class__(self.name, api=self.api, **args)
+        return self.__class__(self.name, api=self.api, keys=self.keys, **args)
+
+    def _page(self, start):
+        return self.start(start).data
+
+    def _row(self, row):
+        if self.keys is not None:
+            row = row['data']
+        return SearchRow(row, self.api)
+
+    def iter_all(self, read_ahead=1):
+        """Iterate over every row matching this search rather than just the
+        current page. Pages of ``rows`` results are requested in turn, and
+        while one page is being consumed the next ``read_ahead`` pages are
+        fetched in the background. At most ``read_ahead + 1`` pages are held
+        in memory at once, regardless of the total number of results::
+
+            for row in Search('node').iter_all():
+                print row['name']
+
+        .. versionadded:: 0.4
+        """
+        rows = self._args['rows']
+        start = self._args['start']
+        if hasattr(self, '_data'):
+            data = self._data
+        else:
+            data = self._page(start)
+        total = data['total']
+        next_start = start + rows
+        pending = collections.deque()
+        pool = ThreadPool(read_ahead) if read_ahead > 0 else None
+        try:
+            while True:
+                while pool and len(pending) < read_ahead and next_start < total:
+                    pending.append(pool.apply_async(self._page, (next_start,)))
+                    next_start += rows
+                for row in data['rows']:
+                    if row is not None:
+                        yield self._row(row)
+                if pending:
+                    data = pending.popleft().get()
+                elif next_start < total:
+                    data = self._page(next_start)
+                    next_start += rows
+                else:
+                    break
+                if not data['rows']:
+                    # The index shrank since the first page, nothing more to read
+                    break
+        finally:
+            if pool:
+                pool.terminate()
+
+    def stream(self):
+        """Iterate over the rows of the current page as they are downloaded,
+        without holding the whole response in memory. Unlike :attr:`data`,
+        nothing is kept once the iteration completes.
+
+        .. versionadded:: 0.4
+        """
+        if hasattr(self, '_data'):
+            rows = (('rows', row) for row in self._data['rows'])
+        elif self.keys is None:
+            rows = self.api.iter_api_request('GET', self.url)
+        else:
+            rows = self.api.iter_api_request('POST', self.url, data=self.keys)
+        for key, row in rows:
+            if key == 'rows' and row is not None:
+                yield self._row(row)
+
+    def objects(self):
+        """Return the objects for every row of the current page, as
+        :attr:`SearchRow.object` would, built in one pass. Each class is looked
+        up and checked against the API version once per page rather than once
+        per row::
+
+            for node in Search('node', 'roles:app').objects():
+                print node.name, node.run_list
+
+        The objects share their data with the page, and null rows are left
+        out. Rows from a partial search have no objects.
+
+        .. versionadded:: 0.4
+        """
+        if self.keys is not None:
+            raise ValueError('Rows from a partial search have no objects')
+        api = self.api
+        hydrators = {}
+        objects = []
+        for row in self.data['rows']:
+            if row is None:
+                continue
+            chef_class = row.get('json_class', '')
+            hydrate = hydrators.get(chef_class)
+            if hydrate is None:
+                cls = _object_class(chef_class)
+                cls._check_api_version(api)
+                hydrate = hydrators[chef_class] = cls._hydrate
+            objects.append(hydrate(row, api))
+        return objects
 
     def __len__(self):
         return len(self.data['rows'])
@@ -93,7 +228,7 @@ class Search(collections.Sequence):
         # Check for null rows, just in case
         if row_value is None:
             return None
-        return SearchRow(row_value, self.api)
+        return self._row(row_value)
 
     def __contains__(self, name):
         for row in self:
@@ -115,3 +250,27 @@ class Search(collections.Sequence):
         api = api or ChefAPI.get_global()
         names = [name for name, url in six.iteritems(api[cls.url])]
         return ChefQuery(cls, names, api)
+
+
+def _partial_search(index, q, keys, rows=1000, api=None):
+    # A Search for only the given keys if the server supports partial
+    # search, or for whole objects otherwise. The default ChefAPI version
+    # predates partial search, so unless the version says the server has it,
+    # it is tried once for each ChefAPI. An old server rejects it without
+    # running the query, and then full searches are used from then on.
+    api = api or ChefAPI.get_global()
+    if api.version_parsed >= Search.partial_version or _partial_support.get(api):
+        return Search(index, q, rows=rows, api=api, keys=keys)
+    search = Search(index, q, rows=rows, api=api)
+    if api in _partial_support:
+        return search
+    search.keys = keys
+    try:
+        search.data
+    except ChefServerError as e:
+        if e.code not in (400, 404, 405):
+            raise
+        _partial_support[api] = False
+        return Search(index, q, rows=rows, api=api)
+    _partial_support[api] = True
+    return search
@@ -4,6 +4,7 @@ import random
 from functools import wraps
 
 import mock
+import requests
 from unittest2 import TestCase, skipUnless
 
 from chef.api import ChefAPI
@@ -34,6 +35,17 @@ class mockSearch(object):
         return search
 
 
+def mock_response(status_code=200, body=b'{}', headers={}):
+    """Build a real :class:`requests.Response` without touching the network."""
+    response = requests.models.Response()
+    response.status_code = status_code
+    response.reason = 'Mock %s' % status_code
+    response._content = body
+    response._content_consumed = True
+    response.headers.update(headers)
+    return response
+
+
 def test_chef_api(**kwargs):
     return ChefAPI('https://api.opscode.com/organizations/pycheftest', os.path.join(TEST_ROOT, 'client.pem'), 'unittests', **kwargs)
 
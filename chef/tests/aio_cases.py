@@ -0,0 +1,113 @@
+"""Tests for :mod:`chef.aio`, which use coroutine syntax and so are only
+imported by test_aio on Python 3.6 or newer.
+"""
+import asyncio
+import threading
+
+import mock
+from unittest2 import TestCase
+
+from chef import DataBag, Node
+from chef.aio import AsyncChefAPI
+from chef.tests import test_chef_api
+
+
+def run(coro):
+    if hasattr(asyncio, 'run'):
+        return asyncio.run(coro)
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+class AsyncChefAPITestCase(TestCase):
+    def setUp(self):
+        super(AsyncChefAPITestCase, self).setUp()
+        self.api = test_chef_api()
+        self.aapi = AsyncChefAPI(self.api, concurrency=4)
+
+    def tearDown(self):
+        self.aapi.close()
+
+    def test_getitem(self):
+        with mock.patch.object(self.api, 'api_request', return_value={'a': 1}) as api_request:
+            self.assertEqual(run(self.aapi['/nodes']), {'a': 1})
+            api_request.assert_called_once_with('GET', '/nodes', {}, None)
+
+    def test_private_pool(self):
+        session = self.api.session
+        with mock.patch.object(session, 'close') as close:
+            aapi = AsyncChefAPI(self.api, concurrency=50)
+            aapi.api.session
+            aapi.close()
+        self.assertFalse(close.called)
+        self.assertEqual(self.api.pool_size, 10)
+        self.assertIs(self.api.session, session)
+        self.assertIsNot(aapi.api, self.api)
+        self.assertEqual(aapi.api.pool_size, 50)
+        self.assertIsNot(aapi.api.session, session)
+
+    def test_load_many(self):
+        def api_request(method, path, headers={}, data=None):
+            return {'name': path.split('/')[-1], 'run_list': [path], 'normal': {}}
+        with mock.patch.object(self.api, 'api_request', side_effect=api_request):
+            nodes = run(self.aapi.load_many(Node, ['a', 'b', 'c']))
+        self.assertEqual(sorted(nodes), ['a', 'b', 'c'])
+        self.assertIsInstance(nodes['b'], Node)
+        self.assertEqual(nodes['b'].run_list, ['/nodes/b'])
+        self.assertTrue(nodes['b'].exists)
+
+    def test_save(self):
+        node = Node('a', api=self.api, skip_load=True)
+        with mock.patch.object(self.api, 'api_request') as api_request:
+            run(self.aapi.save(node))
+            api_request.assert_called_once_with('PUT', '/nodes/a', data=node)
+
+    def test_search(self):
+        def api_request(method, path, headers={}, data=None):
+            start = int(path.split('start=')[1])
+            rows = [{'name': 'node%d' % i} for i in range(start, min(start+2, 5))]
+            return {'total': 5, 'start': start, 'rows': rows}
+        async def collect():
+            return [row['name'] async for row in self.aapi.search('node', rows=2)]
+        with mock.patch.object(self.api, 'api_request', side_effect=api_request):
+            names = run(collect())
+        self.assertEqual(names, ['node0', 'node1', 'node2', 'node3', 'node4'])
+
+    def test_search_stop_early(self):
+        futures = []
+        release = threading.Event()
+        self.addCleanup(release.set)
+        def api_request(method, path, headers={}, data=None):
+            start = int(path.split('start=')[1])
+            if start > 1:
+                # Still in flight when the consumer stops
+                release.wait()
+            return {'total': 10, 'start': start, 'rows': [{'name': 'node%d' % start}]}
+        async def first_two():
+            rows = self.aapi.search('node', rows=1)
+            async for row in rows:
+                if row['name'] == 'node1':
+                    break
+            # Closing the generator runs its finally block
+            await rows.aclose()
+        real_ensure_future = asyncio.ensure_future
+        def ensure_future(coro):
+            future = real_ensure_future(coro)
+            futures.append(future)
+            return future
+        with mock.patch.object(self.api, 'api_request', side_effect=api_request), \
+                mock.patch('asyncio.ensure_future', side_effect=ensure_future):
+            run(first_two())
+        self.assertEqual(len(futures), 4)
+        self.assertEqual([future.cancelled() for future in futures], [False, True, True, True])
+
+    def test_data_bag_items(self):
+        bag = DataBag('bag', api=self.api, skip_load=True)
+        bag.names = ['x', 'y']
+        def api_request(method, path, headers={}, data=None):
+            return {'id': path.split('/')[-1]}
+        async def collect():
+            return dict([(name, item) async for name, item in self.aapi.data_bag_items(bag)])
+        with mock.patch.object(self.api, 'api_request', side_effect=api_request):
+            items = run(collect())
+        self.assertEqual(items['x']['id'], 'x')
+        self.assertEqual(items['y']['id'], 'y')
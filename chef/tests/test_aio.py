@@ -0,0 +1,6 @@
+import sys
+
+# The tests use coroutine syntax, which does not compile before Python 3.6
+if sys.version_info >= (3, 6):
+    from chef.tests.aio_cases import AsyncChefAPITestCase
+    __all__ = ['AsyncChefAPITestCase']
@@ -1,9 +1,14 @@
+import io
 import os
 
 import mock
 import unittest2
 
 from chef.api import ChefAPI
+from chef.auth import sha1_base64
+from chef.retry import RetryPolicy
+from chef.rsa import Key
+from chef.tests import TEST_ROOT, mock_response, test_chef_api
 
 
 class APITestCase(unittest2.TestCase):
@@ -48,3 +53,138 @@ class APITestCase(unittest2.TestCase):
         for item in invalids:
             self.assertRaises(
                 ValueError, ChefAPI, 'foobar', item, 'user')
+
+    def test_session_reused(self):
+        api = self.load('basic.rb')
+        self.assertIs(api.session, api.session)
+        adapter = api.session.get_adapter('https://chef:4000')
+        self.assertEqual(adapter._pool_maxsize, 10)
+
+    def test_pool_size(self):
+        api = ChefAPI('http://chef:4000', os.path.join(TEST_ROOT, 'client.pem'), 'test_1', pool_size=32)
+        adapter = api.session.get_adapter('http://chef:4000')
+        self.assertEqual(adapter._pool_maxsize, 32)
+
+    def test_close(self):
+        api = self.load('basic.rb')
+        session = api.session
+        with mock.patch.object(session, 'close') as mock_close:
+            api.close()
+            mock_close.assert_called_once_with()
+        self.assertIsNot(api.session, session)
+
+    def test_context_manager_closes(self):
+        api = self.load('basic.rb')
+        session = api.session
+        with mock.patch.object(session, 'close') as mock_close:
+            with api:
+                self.assertIs(ChefAPI.get_global(), api)
+            mock_close.assert_called_once_with()
+
+
+class SignerTestCase(unittest2.TestCase):
+    def setUp(self):
+        super(SignerTestCase, self).setUp()
+        self.api = test_chef_api()
+
+    def sent_headers(self):
+        with mock.patch.object(self.api, '_request', return_value=mock_response()) as _request:
+            self.api.request('GET', '/nodes')
+        return _request.call_args[0][3]
+
+    def test_cached(self):
+        self.assertIs(self.api.signer, self.api.signer)
+
+    def test_client_changed(self):
+        self.api.client = 'other'
+        self.assertEqual(self.sent_headers()['X-ops-userid'], 'other')
+
+    def test_key_changed(self):
+        signer = self.api.signer
+        self.api.key = Key(os.path.join(TEST_ROOT, 'client.pem'))
+        self.assertIsNot(self.api.signer, signer)
+        self.assertIs(self.api.signer.key, self.api.key)
+
+    def test_sign_version_changed(self):
+        self.api.sign_version = '1.3'
+        headers = self.sent_headers()
+        self.assertEqual(headers['X-ops-sign'], 'algorithm=sha256;version=1.3;')
+        self.assertEqual(headers['X-ops-server-api-version'], '0')
+
+    def test_invalid_sign_version(self):
+        with self.assertRaises(ValueError):
+            test_chef_api(sign_version='9.9')
+
+
+class RequestBodyTestCase(unittest2.TestCase):
+    def setUp(self):
+        super(RequestBodyTestCase, self).setUp()
+        self.api = test_chef_api()
+        self.sent = []
+
+    def fake_request(self, method, url, data, headers, stream=False):
+        self.sent.append((data.read(), headers['X-ops-content-hash']))
+        return mock_response()
+
+    def request(self, data):
+        with mock.patch.object(self.api, '_request', side_effect=self.fake_request):
+            self.api.request('PUT', '/nodes/a', data=data)
+        return self.sent[-1]
+
+    def test_file(self):
+        body = io.BytesIO(b'skip{"a": 1}')
+        body.read(4)
+        self.assertEqual(self.request(body), (b'{"a": 1}', sha1_base64('{"a": 1}')))
+
+    def test_iterable(self):
+        chunks = (chunk for chunk in [b'{"a"', b': 1', u'}'])
+        self.assertEqual(self.request(chunks), (b'{"a": 1}', sha1_base64('{"a": 1}')))
+
+    def test_spool_to_disk(self):
+        self.api.spool_size = 4
+        body = self.api._request_body(iter([b'{"a"', b': 1}']))
+        self.assertNotIsInstance(body, io.BytesIO)
+        self.assertEqual(body.read(), b'{"a": 1}')
+        self.assertIsInstance(self.api._request_body(iter([b'{}'])), io.BytesIO)
+
+    def test_not_iterator(self):
+        for data in ({'a': 1}, [b'{}'], (b'{}',)):
+            with mock.patch.object(self.api, '_request') as request:
+                with self.assertRaises(TypeError):
+                    self.api.request('PUT', '/nodes/a', data=data)
+            self.assertFalse(request.called)
+
+    def test_text_file(self):
+        body = io.StringIO(u'{"a": 1}')
+        self.assertEqual(self.request(body), (b'{"a": 1}', sha1_base64('{"a": 1}')))
+
+    def test_pipe(self):
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(write_fd, 'wb') as writer:
+            writer.write(b'{"a": 1}')
+        with os.fdopen(read_fd, 'rb') as reader:
+            self.assertEqual(self.request(reader), (b'{"a": 1}', sha1_base64('{"a": 1}')))
+
+    def test_closes_spooled_body(self):
+        bodies = []
+        def fake_request(method, url, data, headers, stream=False):
+            bodies.append(data)
+            return mock_response()
+        caller_body = io.BytesIO(b'{}')
+        with mock.patch.object(self.api, '_request', side_effect=fake_request):
+            self.api.request('PUT', '/nodes/a', data=iter([b'{}']))
+            self.api.request('PUT', '/nodes/a', data=caller_body)
+        self.assertTrue(bodies[0].closed)
+        self.assertFalse(caller_body.closed)
+
+    def test_retry_rewinds(self):
+        responses = [mock_response(503), mock_response()]
+        def fake_request(method, url, data, headers, stream=False):
+            self.sent.append(data.read())
+            return responses.pop(0)
+        self.api.retry = RetryPolicy()
+        with mock.patch.object(self.api, '_request', side_effect=fake_request):
+            with mock.patch('chef.api.time.sleep'):
+                response = self.api.request('PUT', '/nodes/a', data=iter([b'{"a": 1}']))
+        self.assertEqual(response.retries, 1)
+        self.assertEqual(self.sent, [b'{"a": 1}', b'{"a": 1}'])
@@ -0,0 +1,269 @@
+import base64
+import datetime
+import io
+import os
+from multiprocessing.pool import ThreadPool
+
+import mock
+import unittest2
+
+from chef import auth
+from chef.auth import PublicKeyCache, RequestSigner, canonical_request, digest_base64, sha1_base64, sign_request, verify_request
+from chef.exceptions import ChefAuthenticationError
+from chef.rsa import Key
+from chef.tests import TEST_ROOT
+
+TIMESTAMP = datetime.datetime(2010, 12, 4, 15, 47, 49)
+
+
+def signature(headers):
+    lines = []
+    i = 1
+    while 'x-ops-authorization-%s' % i in headers:
+        lines.append(headers['x-ops-authorization-%s' % i])
+        i += 1
+    return base64.b64decode(''.join(lines))
+
+
+class SignRequestTestCase(unittest2.TestCase):
+    def setUp(self):
+        super(SignRequestTestCase, self).setUp()
+        self.key = Key(os.path.join(TEST_ROOT, 'client.pem'))
+
+    def signature(self, headers):
+        self.assertTrue(all(len(v) <= 60 for k, v in headers.items() if k.startswith('x-ops-authorization-')))
+        return signature(headers)
+
+    def test_sign_request(self):
+        headers = sign_request(self.key, 'get', '/organizations//test/nodes/', '{"a": 1}',
+                               'api.opscode.com', TIMESTAMP, 'unittests')
+        self.assertEqual(headers['x-ops-sign'], 'version=1.0')
+        self.assertEqual(headers['x-ops-userid'], 'unittests')
+        self.assertEqual(headers['x-ops-timestamp'], '2010-12-04T15:47:49Z')
+        self.assertEqual(headers['x-ops-content-hash'], sha1_base64('{"a": 1}'))
+        expected = canonical_request('GET', '/organizations/test/nodes', sha1_base64('{"a": 1}'),
+                                     TIMESTAMP, 'unittests')
+        self.assertEqual(self.key.public_decrypt(self.signature(headers)), expected)
+
+    def test_signer_matches(self):
+        signer = RequestSigner(self.key, 'unittests')
+        self.assertEqual(signer.sign('PUT', '/nodes/a', b'{}', TIMESTAMP),
+                         sign_request(self.key, 'PUT', '/nodes/a', '{}', None, TIMESTAMP, 'unittests'))
+
+    def test_hashed_body(self):
+        signer = RequestSigner(self.key, 'unittests')
+        headers = signer.sign('PUT', '/nodes/a', None, TIMESTAMP, hashed_body='precomputed')
+        self.assertEqual(headers['x-ops-content-hash'], 'precomputed')
+
+    def test_hash_file(self):
+        body = b'x' * 1000
+        fp = io.BytesIO(b'head' + body)
+        fp.seek(4)
+        with mock.patch.object(auth, 'hash_chunk_size', 64):
+            self.assertEqual(digest_base64(fp, 'sha256'), digest_base64(body, 'sha256'))
+        self.assertEqual(fp.tell(), 4)
+        signer = RequestSigner(self.key, 'unittests')
+        self.assertEqual(signer.hash_body(fp), sha1_base64(body))
+
+    def test_threads(self):
+        signer = RequestSigner(self.key, 'unittests')
+        paths = ['/nodes/node%d' % i for i in range(50)]
+        pool = ThreadPool(8)
+        try:
+            results = pool.map(lambda path: signer.sign('GET', path, None, TIMESTAMP), paths)
+        finally:
+            pool.close()
+        for path, headers in zip(paths, results):
+            expected = canonical_request('GET', path, sha1_base64(''), TIMESTAMP, 'unittests')
+            self.assertEqual(self.key.public_decrypt(self.signature(headers)), expected)
+
+
+class SignVersionTestCase(unittest2.TestCase):
+    # Test vectors from mixlib-authentication
+    body = 'Spec Body'
+    path = '/organizations/clownco'
+    timestamp = datetime.datetime(2009, 1, 1, 12, 0, 0)
+
+    def setUp(self):
+        super(SignVersionTestCase, self).setUp()
+        self.key = Key(os.path.join(TEST_ROOT, 'client.pem'))
+        self.pubkey = Key(os.path.join(TEST_ROOT, 'client_pub.pem'))
+
+    def test_hash_body(self):
+        self.assertEqual(RequestSigner(self.key, 'spec-user').hash_body(self.body), 'DFteJZPVv6WKdQmMqZUQUumUyRs=')
+        self.assertEqual(RequestSigner(self.key, 'spec-user', '1.3').hash_body(self.body), 'hDlKNZhIhgso3Fs0S0pZwJ0xyBWtR1RBaeHs1DrzOho=')
+
+    def test_canonical_1_1(self):
+        signer = RequestSigner(self.key, 'spec-user', '1.1')
+        hashed_body = signer.hash_body(self.body)
+        self.assertEqual(signer.canonical_request('post', self.path, hashed_body, self.timestamp),
+            'Method:POST\nHashed Path:YtBWDn1blGGuFIuKksdwXzHU9oE=\n'
+            'X-Ops-Content-Hash:DFteJZPVv6WKdQmMqZUQUumUyRs=\n'
+            'X-Ops-Timestamp:2009-01-01T12:00:00Z\nX-Ops-UserId:' + sha1_base64('spec-user'))
+
+    def test_canonical_1_3(self):
+        signer = RequestSigner(self.key, 'spec-user', '1.3', server_api_version='1')
+        hashed_body = signer.hash_body(self.body)
+        self.assertEqual(signer.canonical_request('post', self.path, hashed_body, self.timestamp),
+            'Method:POST\nPath:/organizations/clownco\n'
+            'X-Ops-Content-Hash:hDlKNZhIhgso3Fs0S0pZwJ0xyBWtR1RBaeHs1DrzOho=\n'
+            'X-Ops-Sign:version=1.3\nX-Ops-Timestamp:2009-01-01T12:00:00Z\n'
+            'X-Ops-UserId:spec-user\nX-Ops-Server-API-Version:1')
+
+    def test_sign_1_1(self):
+        signer = RequestSigner(self.key, 'spec-user', '1.1')
+        headers = signer.sign('POST', self.path, self.body, self.timestamp)
+        self.assertEqual(headers['x-ops-sign'], 'algorithm=sha1;version=1.1;')
+        self.assertNotIn('x-ops-server-api-version', headers)
+        expected = signer.canonical_request('POST', self.path, signer.hash_body(self.body), self.timestamp)
+        self.assertEqual(self.pubkey.public_decrypt(signature(headers)), expected)
+
+    def test_sign_1_3(self):
+        signer = RequestSigner(self.key, 'spec-user', '1.3')
+        headers = signer.sign('POST', self.path, self.body, self.timestamp)
+        self.assertEqual(headers['x-ops-sign'], 'algorithm=sha256;version=1.3;')
+        self.assertEqual(headers['x-ops-server-api-version'], '0')
+        self.assertEqual(headers['x-ops-content-hash'], 'hDlKNZhIhgso3Fs0S0pZwJ0xyBWtR1RBaeHs1DrzOho=')
+        expected = signer.canonical_request('POST', self.path, signer.hash_body(self.body), self.timestamp)
+        sig = signature(headers)
+        self.assertTrue(self.pubkey.verify(expected, sig, 'sha256'))
+        self.assertFalse(self.pubkey.verify(expected + 'x', sig, 'sha256'))
+
+    def test_server_api_version_header(self):
+        headers = RequestSigner(self.key, 'spec-user', server_api_version='1').sign('GET', '/', None, self.timestamp)
+        self.assertEqual(headers['x-ops-sign'], 'version=1.0')
+        self.assertEqual(headers['x-ops-server-api-version'], '1')
+
+    def test_unknown_version(self):
+        with self.assertRaises(ValueError):
+            RequestSigner(self.key, 'spec-user', '1.2')
+
+
+class VerifyRequestTestCase(unittest2.TestCase):
+    path = '/organizations/test/nodes/a'
+    body = '{"a": 1}'
+
+    def setUp(self):
+        super(VerifyRequestTestCase, self).setUp()
+        self.key = Key(os.path.join(TEST_ROOT, 'client.pem'))
+        self.pubkey = Key(os.path.join(TEST_ROOT, 'client_spki.pem'))
+        self.keys = {'unittests': self.pubkey}
+
+    def sign(self, version='1.0', path=None, body=None):
+        return RequestSigner(self.key, 'unittests', version).sign(
+            'PUT', path or self.path, body or self.body, TIMESTAMP)
+
+    def verify(self, headers, path=None, body=None, **kwargs):
+        kwargs.setdefault('now', TIMESTAMP)
+        return verify_request(headers, 'PUT', path or self.path, body or self.body, self.keys.get, **kwargs)
+
+    def test_versions(self):
+        for version in ('1.0', '1.1', '1.3'):
+            self.assertEqual(self.verify(self.sign(version)), 'unittests')
+
+    def test_header_case(self):
+        headers = dict((k.title(), v) for k, v in self.sign().items())
+        self.assertEqual(self.verify(headers), 'unittests')
+
+    def test_query_string(self):
+        self.assertEqual(self.verify(self.sign(), path=self.path + '?a=1'), 'unittests')
+
+    def test_wrong_path(self):
+        for version in ('1.0', '1.1', '1.3'):
+            with self.assertRaises(ChefAuthenticationError):
+                self.verify(self.sign(version), path='/organizations/test/nodes/b')
+
+    def test_wrong_body(self):
+        with self.assertRaises(ChefAuthenticationError):
+            self.verify(self.sign(), body='{"a": 2}')
+
+    def test_forged_hash(self):
+        headers = self.sign()
+        headers['x-ops-content-hash'] = sha1_base64('{"a": 2}')
+        with self.assertRaises(ChefAuthenticationError):
+            self.verify(headers, body='{"a": 2}')
+
+    def test_wrong_key(self):
+        self.keys['unittests'] = Key.generate()
+        for version in ('1.0', '1.3'):
+            with self.assertRaises(ChefAuthenticationError):
+                self.verify(self.sign(version))
+
+    def test_unknown_client(self):
+        del self.keys['unittests']
+        with self.assertRaises(ChefAuthenticationError):
+            self.verify(self.sign())
+
+    def test_missing_header(self):
+        headers = self.sign()
+        del headers['x-ops-timestamp']
+        with self.assertRaises(ChefAuthenticationError):
+            self.verify(headers)
+
+    def test_missing_signature(self):
+        headers = dict((k, v) for k, v in self.sign().items() if not k.startswith('x-ops-authorization-'))
+        with self.assertRaises(ChefAuthenticationError):
+            self.verify(headers)
+
+    def test_unsupported_version(self):
+        headers = self.sign()
+        headers['x-ops-sign'] = 'version=1.2'
+        with self.assertRaises(ChefAuthenticationError):
+            self.verify(headers)
+
+    def test_clock_skew(self):
+        headers = self.sign()
+        self.assertEqual(self.verify(headers, now=TIMESTAMP + datetime.timedelta(minutes=14)), 'unittests')
+        self.assertEqual(self.verify(headers, now=TIMESTAMP - datetime.timedelta(minutes=14)), 'unittests')
+        with self.assertRaises(ChefAuthenticationError):
+            self.verify(headers, now=TIMESTAMP + datetime.timedelta(minutes=16))
+        with self.assertRaises(ChefAuthenticationError):
+            self.verify(headers, now=TIMESTAMP + datetime.timedelta(seconds=61), max_skew=60)
+
+
+class PublicKeyCacheTestCase(unittest2.TestCase):
+    def setUp(self):
+        super(PublicKeyCacheTestCase, self).setUp()
+        self.pem = open(os.path.join(TEST_ROOT, 'client_spki.pem')).read()
+        self.lookups = []
+
+    def lookup(self, name):
+        self.lookups.append(name)
+        return self.pem if name.startswith('client') else None
+
+    def test_cached(self):
+        keys = PublicKeyCache(self.lookup)
+        key = keys('client1')
+        self.assertTrue(key.public)
+        self.assertIs(keys('client1'), key)
+        self.assertEqual(self.lookups, ['client1'])
+
+    def test_unknown(self):
+        keys = PublicKeyCache(self.lookup)
+        self.assertEqual(keys('other'), None)
+        self.assertEqual(keys('other'), None)
+        self.assertEqual(self.lookups, ['other', 'other'])
+        self.assertEqual(len(keys), 0)
+
+    def test_max_size(self):
+        keys = PublicKeyCache(self.lookup, max_size=2)
+        keys('client1')
+        keys('client2')
+        keys('client1')
+        keys('client3')
+        self.assertEqual(len(keys), 2)
+        keys('client1')
+        keys('client2')
+        self.assertEqual(self.lookups, ['client1', 'client2', 'client3', 'client2'])
+
+    def test_invalidate(self):
+        keys = PublicKeyCache(self.lookup)
+        keys('client1')
+        keys.invalidate('client1')
+        keys('client1')
+        self.assertEqual(self.lookups, ['client1', 'client1'])
+
+    def test_verify_request(self):
+        key = Key(os.path.join(TEST_ROOT, 'client.pem'))
+        headers = RequestSigner(key, 'client1').sign('GET', '/nodes', None, TIMESTAMP)
+        self.assertEqual(verify_request(headers, 'GET', '/nodes', None, PublicKeyCache(self.lookup), now=TIMESTAMP), 'client1')
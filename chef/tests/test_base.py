@@ -0,0 +1,122 @@
+import mock
+import requests
+from unittest2 import TestCase
+
+from chef import DataBag, DataBagItem, Node
+from chef.base import ChefObject, _parallel
+from chef.exceptions import ChefServerError
+from chef.tests import test_chef_api
+
+
+def fake_api_request(method, path, headers={}, data=None):
+    name = path.split('/')[-1]
+    if name.startswith('broken'):
+        raise ChefServerError('Internal Server Error', code=500)
+    if name.startswith('garbled'):
+        raise ValueError('No JSON object could be decoded')
+    return {'name': name, 'id': name, 'normal': {'path': path}}
+
+
+class LoadManyTestCase(TestCase):
+    def setUp(self):
+        super(LoadManyTestCase, self).setUp()
+        self.api = test_chef_api()
+
+    def test_load_many(self):
+        with mock.patch.object(self.api, 'api_request', side_effect=fake_api_request) as api_request:
+            nodes = Node.load_many(['a', 'b', 'c'], api=self.api, concurrency=2)
+            self.assertEqual(api_request.call_count, 3)
+            self.assertEqual(sorted(nodes.objects), ['a', 'b', 'c'])
+            self.assertEqual(nodes['b'].normal['path'], '/nodes/b')
+            self.assertIs(nodes['b'], nodes.objects['b'])
+            # Served from the prefetched objects, no more requests
+            self.assertEqual(api_request.call_count, 3)
+
+    def test_load_many_errors(self):
+        with mock.patch.object(self.api, 'api_request', side_effect=fake_api_request):
+            nodes = Node.load_many(['a', 'broken1', 'c'], api=self.api)
+        self.assertEqual(sorted(nodes.objects), ['a', 'c'])
+        self.assertEqual(list(nodes.errors), ['broken1'])
+        self.assertEqual(nodes.errors['broken1'].code, 500)
+        with self.assertRaises(ChefServerError):
+            nodes['broken1']
+
+    def test_load_many_other_errors(self):
+        with mock.patch.object(self.api, 'api_request', side_effect=fake_api_request):
+            nodes = Node.load_many(['a', 'garbled1', 'c'], api=self.api)
+        self.assertEqual(sorted(nodes.objects), ['a', 'c'])
+        self.assertIsInstance(nodes.errors['garbled1'], ValueError)
+        with self.assertRaises(ValueError):
+            nodes['garbled1']
+
+    def test_parallel(self):
+        def fn(item):
+            if item == 2:
+                raise requests.Timeout('timed out')
+            return item * 10
+        results = _parallel(fn, [1, 2, 3], 2)
+        self.assertEqual([(item, result) for item, result, error in results], [(1, 10), (2, None), (3, 30)])
+        self.assertIsInstance(results[1][2], requests.Timeout)
+
+    def test_load_many_empty(self):
+        nodes = Node.load_many([], api=self.api)
+        self.assertEqual(nodes.objects, {})
+        self.assertEqual(len(nodes), 0)
+
+    def test_data_bag_prefetch(self):
+        bag = DataBag('bag', api=self.api, skip_load=True)
+        bag.names = ['x', 'y']
+        with mock.patch.object(self.api, 'api_request', side_effect=fake_api_request):
+            self.assertIs(bag.prefetch(), bag)
+        self.assertEqual(bag['x']['id'], 'x')
+        self.assertEqual(bag['y'].name, 'y')
+
+
+class SaveManyTestCase(TestCase):
+    def setUp(self):
+        super(SaveManyTestCase, self).setUp()
+        self.api = test_chef_api()
+
+    def fake_api_request(self, method, path, headers={}, data=None):
+        if 'broken' in path:
+            raise ChefServerError('Internal Server Error', code=500)
+        if 'unreachable' in path:
+            raise requests.ConnectionError('Connection refused')
+        self.saved.append((method, path))
+        return {}
+
+    def test_save_many(self):
+        self.saved = []
+        nodes = [Node('node%d' % i, api=self.api, skip_load=True) for i in range(20)]
+        with mock.patch.object(self.api, 'api_request', side_effect=self.fake_api_request):
+            errors = ChefObject.save_many(nodes, concurrency=4)
+        self.assertEqual(errors, {})
+        self.assertEqual(sorted(self.saved), sorted(('PUT', '/nodes/node%d' % i) for i in range(20)))
+
+    def test_save_many_errors(self):
+        self.saved = []
+        items = [DataBagItem('bag', name, api=self.api, skip_load=True) for name in ('a', 'broken1', 'c')]
+        with mock.patch.object(self.api, 'api_request', side_effect=self.fake_api_request):
+            errors = DataBagItem.save_many(items)
+        self.assertEqual(list(errors), ['broken1'])
+        self.assertEqual(errors['broken1'].code, 500)
+        self.assertEqual(sorted(self.saved), [('PUT', '/data/bag/a'), ('PUT', '/data/bag/c')])
+
+    def test_save_many_transport_errors(self):
+        self.saved = []
+        nodes = [Node(name, api=self.api, skip_load=True) for name in ('a', 'unreachable1', 'c')]
+        with mock.patch.object(self.api, 'api_request', side_effect=self.fake_api_request):
+            errors = ChefObject.save_many(nodes, concurrency=3)
+        self.assertEqual(list(errors), ['unreachable1'])
+        self.assertIsInstance(errors['unreachable1'], requests.ConnectionError)
+        self.assertEqual(sorted(self.saved), [('PUT', '/nodes/a'), ('PUT', '/nodes/c')])
+
+    def test_save_many_api(self):
+        self.saved = []
+        other = test_chef_api()
+        with mock.patch.object(other, 'api_request', side_effect=self.fake_api_request):
+            ChefObject.save_many([Node('a', api=self.api, skip_load=True)], api=other)
+        self.assertEqual(self.saved, [('PUT', '/nodes/a')])
+
+    def test_save_many_empty(self):
+        self.assertEqual(ChefObject.save_many([]), {})
@@ -0,0 +1,113 @@
+import mock
+from unittest2 import TestCase
+
+from chef.cache import ResponseCache
+from chef.tests import mock_response, test_chef_api
+
+
+class ResponseCacheTestCase(TestCase):
+    def test_lru(self):
+        cache = ResponseCache(max_size=2)
+        cache.set('/a', '1', etag='a')
+        cache.set('/b', '2', etag='b')
+        cache.get('/a')
+        cache.set('/c', '3', etag='c')
+        self.assertIn('/a', cache)
+        self.assertNotIn('/b', cache)
+        self.assertIn('/c', cache)
+
+    def test_ttl(self):
+        cache = ResponseCache(ttl=10)
+        with mock.patch('chef.cache.time.time', return_value=100):
+            cache.set('/a', '1', etag='a')
+        with mock.patch('chef.cache.time.time', return_value=105):
+            self.assertEqual(cache.get('/a').body, '1')
+        with mock.patch('chef.cache.time.time', return_value=111):
+            self.assertIsNone(cache.get('/a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate(self):
+        cache = ResponseCache()
+        cache.set('/nodes', '{}', etag='1')
+        cache.set('/nodes/a', '{}', etag='2')
+        cache.set('/nodes/b', '{}', etag='3')
+        cache.invalidate('/nodes/a')
+        self.assertNotIn('/nodes', cache)
+        self.assertNotIn('/nodes/a', cache)
+        self.assertIn('/nodes/b', cache)
+
+
+class APICacheTestCase(TestCase):
+    def setUp(self):
+        super(APICacheTestCase, self).setUp()
+        self.api = test_chef_api(cache=True)
+
+    def test_revalidate(self):
+        responses = [
+            mock_response(200, b'{"name": "a"}', {'ETag': '"v1"'}),
+            mock_response(304, b''),
+        ]
+        with mock.patch.object(self.api, '_request', side_effect=responses) as _request:
+            self.assertEqual(self.api['/nodes/a'], {'name': 'a'})
+            self.assertNotIn('If-none-match', _request.call_args[0][3])
+            data = self.api['/nodes/a']
+            self.assertEqual(data, {'name': 'a'})
+            self.assertEqual(_request.call_args[0][3]['If-none-match'], '"v1"')
+        # Each hit is decoded afresh
+        data['name'] = 'changed'
+        self.assertEqual(self.api.cache.get('/nodes/a').body, '{"name": "a"}')
+
+    def test_changed(self):
+        responses = [
+            mock_response(200, b'{"v": 1}', {'Last-Modified': 'Tue, 01 Jan 2030 00:00:00 GMT'}),
+            mock_response(200, b'{"v": 2}', {'Last-Modified': 'Wed, 02 Jan 2030 00:00:00 GMT'}),
+        ]
+        with mock.patch.object(self.api, '_request', side_effect=responses) as _request:
+            self.assertEqual(self.api['/roles/r'], {'v': 1})
+            self.assertEqual(self.api['/roles/r'], {'v': 2})
+            self.assertEqual(_request.call_args[0][3]['If-modified-since'], 'Tue, 01 Jan 2030 00:00:00 GMT')
+        self.assertEqual(self.api.cache.get('/roles/r').body, '{"v": 2}')
+
+    def test_no_validators(self):
+        with mock.patch.object(self.api, '_request', return_value=mock_response(200, b'{}')):
+            self.api['/nodes/a']
+        self.assertNotIn('/nodes/a', self.api.cache)
+
+    def test_validators_dropped(self):
+        self.api.cache.set('/nodes', '{}', etag='1')
+        self.api.cache.set('/nodes/a', '{"v": 1}', etag='2')
+        with mock.patch.object(self.api, '_request', return_value=mock_response(200, b'{"v": 2}')):
+            self.assertEqual(self.api['/nodes/a'], {'v': 2})
+        self.assertNotIn('/nodes/a', self.api.cache)
+        self.assertIn('/nodes', self.api.cache)
+
+    def test_not_modified_without_entry(self):
+        responses = [mock_response(304, b''), mock_response(200, b'{"v": 1}', {'ETag': '"v1"'})]
+        with mock.patch.object(self.api, '_request', side_effect=responses) as _request:
+            self.assertEqual(self.api.api_request('GET', '/nodes/a', headers={'If-None-Match': '"v0"'}), {'v': 1})
+        self.assertEqual(_request.call_count, 2)
+        self.assertNotIn('If-none-match', _request.call_args[0][3])
+        self.assertEqual(self.api.cache.get('/nodes/a').etag, '"v1"')
+
+    def test_not_modified_after_eviction(self):
+        self.api.cache.set('/nodes/a', '{"v": 1}', etag='"v1"')
+        def evicted(method, url, data, headers, stream=False):
+            self.api.cache.clear()
+            return mock_response(304, b'')
+        with mock.patch.object(self.api, '_request', side_effect=evicted) as _request:
+            self.assertEqual(self.api['/nodes/a'], {'v': 1})
+        self.assertEqual(_request.call_count, 1)
+
+    def test_write_invalidates(self):
+        self.api.cache.set('/nodes', '{}', etag='1')
+        self.api.cache.set('/nodes/a', '{}', etag='2')
+        with mock.patch.object(self.api, '_request', return_value=mock_response(200, b'{}')):
+            self.api.api_request('PUT', '/nodes/a', data={})
+        self.assertNotIn('/nodes', self.api.cache)
+        self.assertNotIn('/nodes/a', self.api.cache)
+
+    def test_disabled(self):
+        api = test_chef_api()
+        self.assertIsNone(api.cache)
+        with mock.patch.object(api, '_request', return_value=mock_response(200, b'{"a": 1}', {'ETag': '1'})):
+            self.assertEqual(api['/nodes/a'], {'a': 1})
@@ -1,7 +1,8 @@
 import mock
 
-from chef.fabric import chef_roledefs
-from chef.tests import ChefTestCase, mockSearch
+from chef.exceptions import ChefServerError
+from chef.fabric import Roledef, chef_roledefs
+from chef.tests import ChefTestCase, mockSearch, test_chef_api
 
 class FabricTestCase(ChefTestCase):
     @mock.patch('chef.search.Search')
@@ -24,3 +25,49 @@ class FabricTestCase(ChefTestCase):
     @mockSearch({('role', '*:*'): {1:2}})
     def test_roledef2(self, MockSearch):
         print(MockSearch('role').data)
+
+    def test_roledef_partial_search(self):
+        api = test_chef_api(version='12.0.0')
+        result = {'total': 2, 'start': 0, 'rows': [
+            {'url': '', 'data': {'name': 'web1', 'cloud.public_hostname': None, 'fqdn': 'web1.example.com'}},
+            {'url': '', 'data': {'name': 'web2', 'cloud.public_hostname': 'web2.cloud.com', 'fqdn': 'web2.example.com'}},
+        ]}
+        roledef = Roledef('roles:web', api, ['cloud.public_hostname', 'fqdn'])
+        with mock.patch.object(api, 'api_request', return_value=result) as api_request:
+            self.assertEqual(list(roledef()), ['web1.example.com', 'web2.cloud.com'])
+            method, path = api_request.call_args[0]
+            self.assertEqual(method, 'POST')
+            self.assertEqual(api_request.call_args[1]['data'], {
+                'name': ['name'],
+                'cloud.public_hostname': ['cloud', 'public_hostname'],
+                'fqdn': ['fqdn'],
+            })
+
+    def test_roledef_full_search(self):
+        api = test_chef_api(version='10.0.0')
+        result = {'total': 2, 'start': 0, 'rows': [
+            {'name': 'web1', 'automatic': {'fqdn': 'web1.example.com'}},
+            {'name': 'web2', 'automatic': {'fqdn': 'web2.example.com', 'cloud': {'public_hostname': 'web2.cloud.com'}}},
+        ]}
+        def api_request(method, path, headers={}, data=None):
+            if method == 'POST':
+                raise ChefServerError('Method Not Allowed', code=405)
+            return result
+        roledef = Roledef('roles:web', api, ['cloud.public_hostname', 'fqdn'])
+        with mock.patch.object(api, 'api_request', side_effect=api_request) as mock_request:
+            self.assertEqual(list(roledef()), ['web1.example.com', 'web2.cloud.com'])
+            self.assertEqual([c[0][0] for c in mock_request.call_args_list], ['POST', 'GET'])
+            # The server is only asked once
+            self.assertEqual(list(roledef()), ['web1.example.com', 'web2.cloud.com'])
+            self.assertEqual(mock_request.call_args_list[-1][0][0], 'GET')
+            self.assertEqual(mock_request.call_count, 3)
+
+    def test_roledef_default_api(self):
+        # The default API version predates partial search, which is tried
+        api = test_chef_api()
+        result = {'total': 1, 'start': 0, 'rows': [{'url': '', 'data': {'name': 'web1', 'fqdn': 'web1.example.com'}}]}
+        roledef = Roledef('roles:web', api, 'fqdn')
+        with mock.patch.object(api, 'api_request', return_value=result) as api_request:
+            self.assertEqual(list(roledef()), ['web1.example.com'])
+            self.assertEqual(api_request.call_args[0][0], 'POST')
+            self.assertEqual(api_request.call_args[1]['data'], {'name': ['name'], 'fqdn': ['fqdn']})
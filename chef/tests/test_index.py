@@ -0,0 +1,120 @@
+import mock
+from unittest2 import TestCase
+
+from chef.index import SearchIndex, flatten
+from chef.search import SearchRow
+from chef.tests import test_chef_api
+
+NODES = [
+    {'name': 'web1', 'json_class': 'Chef::Node', 'chef_environment': 'prod', 'run_list': ['role[web]', 'recipe[nginx::ssl]'],
+     'automatic': {'roles': ['web'], 'kernel': {'os': 'Linux'}, 'cpu': {'total': 4}, 'virtual': True},
+     'default': {'nginx': {'port': 80}}, 'override': {'nginx': {'port': 443}}, 'normal': {'tags': ['blue']}},
+    {'name': 'web2', 'chef_environment': 'staging', 'run_list': ['role[web]'],
+     'automatic': {'roles': ['web'], 'kernel': {'os': 'Linux'}, 'cpu': {'total': 16}},
+     'default': {'nginx': {'port': 80}}, 'normal': {'tags': []}},
+    {'name': 'db1', 'chef_environment': 'prod', 'run_list': ['role[db]', 'postgres'],
+     'automatic': {'roles': ['db', 'base'], 'kernel': {'os': 'Darwin'}, 'cpu': {'total': 8}},
+     'normal': {'tags': ['blue', 'green'], 'note': 'a b:c'}},
+]
+
+
+class FlattenTestCase(TestCase):
+    def test_expand(self):
+        fields = flatten({'kernel': {'os': 'Linux', 'modules': {'ext4': {'size': 10}}}, 'flags': [True, None]}, 'role')
+        self.assertEqual(fields['kernel_os'], set(['Linux']))
+        self.assertEqual(fields['os'], set(['Linux']))
+        self.assertEqual(fields['kernel_modules_ext4_size'], set(['10']))
+        self.assertEqual(fields['ext4_size'], set(['10']))
+        self.assertEqual(fields['size'], set(['10']))
+        self.assertEqual(fields['flags'], set(['true']))
+
+    def test_node(self):
+        fields = flatten(NODES[0])
+        self.assertEqual(fields['nginx_port'], set(['443']))
+        self.assertEqual(fields['role'], set(['web']))
+        self.assertEqual(fields['recipe'], set(['nginx::ssl']))
+        self.assertEqual(fields['run_list'], set(['role[web]', 'recipe[nginx::ssl]']))
+        self.assertEqual(fields['chef_environment'], set(['prod']))
+        self.assertNotIn('automatic_roles', fields)
+        self.assertEqual(flatten(NODES[2])['recipe'], set(['postgres']))
+
+
+class SearchIndexTestCase(TestCase):
+    def setUp(self):
+        super(SearchIndexTestCase, self).setUp()
+        self.index = SearchIndex(NODES)
+
+    def names(self, q):
+        return [row['name'] for row in self.index.search(q)]
+
+    def test_terms(self):
+        self.assertEqual(self.names('roles:web'), ['web1', 'web2'])
+        self.assertEqual(self.names('roles:web AND chef_environment:prod'), ['web1'])
+        self.assertEqual(self.names('roles:web chef_environment:prod'), ['web1'])
+        self.assertEqual(self.names('name:db1 OR name:web2'), ['web2', 'db1'])
+        self.assertEqual(self.names('os:Darwin'), ['db1'])
+        self.assertEqual(self.names('kernel_os:Linux'), ['web1', 'web2'])
+        self.assertEqual(self.names('tags:blue AND tags:green'), ['db1'])
+        self.assertEqual(self.names('nothing:here'), [])
+
+    def test_all(self):
+        self.assertEqual(self.names('*:*'), ['web1', 'web2', 'db1'])
+        self.assertEqual(self.names(''), ['web1', 'web2', 'db1'])
+        self.assertEqual(self.index.count(), 3)
+
+    def test_not(self):
+        self.assertEqual(self.names('NOT roles:web'), ['db1'])
+        self.assertEqual(self.names('-roles:web'), ['db1'])
+        self.assertEqual(self.names('chef_environment:prod AND NOT roles:db'), ['web1'])
+        self.assertEqual(self.names('chef_environment:prod !roles:db'), ['web1'])
+
+    def test_precedence(self):
+        self.assertEqual(self.names('name:web1 OR name:web2 AND chef_environment:prod'), ['web1'])
+        self.assertEqual(self.names('(name:web1 OR name:web2) AND chef_environment:staging'), ['web2'])
+        self.assertEqual(self.names('roles:(db OR web) && chef_environment:prod'), ['web1', 'db1'])
+
+    def test_wildcards(self):
+        self.assertEqual(self.names('name:web*'), ['web1', 'web2'])
+        self.assertEqual(self.names('name:?b1'), ['db1'])
+        self.assertEqual(self.names('recipe:nginx*'), ['web1'])
+        self.assertEqual(self.names('note:*'), ['db1'])
+        self.assertEqual(self.names('*_os:Darwin'), ['db1'])
+        self.assertEqual(self.names('Darwin'), ['db1'])
+
+    def test_escapes(self):
+        self.assertEqual(self.names('run_list:role\\[db\\]'), ['db1'])
+        self.assertEqual(self.names('recipe:nginx\\:\\:ssl'), ['web1'])
+        self.assertEqual(self.names('note:"a b:c"'), ['db1'])
+        self.assertEqual(self.names('name:web\\*'), [])
+
+    def test_ranges(self):
+        self.assertEqual(self.names('cpu_total:[4 TO 8]'), ['web1', 'db1'])
+        self.assertEqual(self.names('cpu_total:{4 TO 16]'), ['web2', 'db1'])
+        self.assertEqual(self.names('cpu_total:[10 TO *]'), ['web2'])
+        self.assertEqual(self.names('name:[a TO w]'), ['db1'])
+
+    def test_invalid(self):
+        for q in ('roles:(web', 'roles:web)', 'roles:', 'AND', '"open'):
+            with self.assertRaises(ValueError):
+                self.index.search(q)
+
+    def test_cache(self):
+        self.assertEqual(self.index.ids('roles:web'), (0, 1))
+        self.assertIn('roles:web', self.index._cache)
+        self.index.add(dict(NODES[1], name='web3'))
+        self.assertNotIn('roles:web', self.index._cache)
+        self.assertEqual(self.names('roles:web'), ['web1', 'web2', 'web3'])
+
+    def test_rows(self):
+        rows = self.index.search('name:web1')
+        self.assertIsInstance(rows[0], SearchRow)
+        self.assertEqual(rows[0].object.chef_environment, 'prod')
+
+    def test_load(self):
+        api = test_chef_api()
+        result = {'total': 3, 'start': 0, 'rows': NODES}
+        with mock.patch.object(api, 'api_request', return_value=result):
+            index = SearchIndex.load('node', api=api)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.count('role:db'), 1)
+        self.assertIs(index.search('role:db')[0].api, api)
@@ -0,0 +1,128 @@
+import mock
+from unittest2 import TestCase, skipIf
+
+from chef import inventory as inventory_module
+from chef.exceptions import ChefServerNotFoundError
+from chef.inventory import Inventory, inventory
+from chef.tests import test_chef_api
+
+NODES = [
+    {'name': 'web1', 'automatic': {'platform': 'ubuntu', 'cpu': {'total': 2}, 'uptime': 10.5, 'virtual': True}},
+    {'name': 'web2', 'automatic': {'platform': 'ubuntu', 'cpu': {'total': 4}, 'uptime': 20.5, 'virtual': False}},
+    {'name': 'db1', 'automatic': {'platform': 'centos', 'cpu': {'total': 16}, 'uptime': None}},
+    {'name': 'db2', 'automatic': {'platform': 'centos', 'cpu': {'total': 'many'}}},
+    {'name': 'odd', 'automatic': {}},
+]
+
+COLUMNS = ['name', 'platform', 'cpu.total', 'uptime', 'virtual']
+
+
+class InventoryTestCase(TestCase):
+    def setUp(self):
+        super(InventoryTestCase, self).setUp()
+        self.inv = Inventory.from_rows(NODES, COLUMNS, types={'cpu.total': int})
+
+    def test_columns(self):
+        self.assertEqual(len(self.inv), 5)
+        self.assertEqual(self.inv['name'].tolist(), ['web1', 'web2', 'db1', 'db2', 'odd'])
+        self.assertEqual(self.inv['platform'].tolist(), ['ubuntu', 'ubuntu', 'centos', 'centos', None])
+        self.assertEqual(self.inv['platform'].categories, ['ubuntu', 'centos'])
+        self.assertEqual(self.inv['cpu.total'].type, int)
+        self.assertEqual(self.inv['cpu.total'].tolist(), [2, 4, 16, None, None])
+        self.assertEqual(self.inv['uptime'].tolist(), [10.5, 20.5, None, None, None])
+        self.assertEqual(self.inv['virtual'].tolist(), [True, False, None, None, None])
+        self.assertEqual(self.inv['cpu.total'].count(), 3)
+        self.assertEqual(list(self.inv)[0], ('web1', 'ubuntu', 2, 10.5, True))
+
+    def test_types(self):
+        # Mixed values are kept as strings unless a type is given
+        inv = Inventory.from_rows(NODES, ['cpu.total', 'uptime'], types={'uptime': int})
+        self.assertEqual(inv['cpu.total'].type, str)
+        self.assertEqual(inv['cpu.total'].tolist(), ['2', '4', '16', 'many', None])
+        self.assertEqual(inv['uptime'].tolist(), [None, None, None, None, None])
+        with self.assertRaises(ValueError):
+            Inventory.from_rows(NODES, ['name'], types={'name': list})
+
+    def test_promote(self):
+        # The type inferred from the first batch widens for later rows
+        rows = [{'name': 'n%d' % i, 'automatic': {'load': i, 'flag': True}} for i in range(1500)]
+        rows.append({'name': 'float', 'automatic': {'load': 1.5, 'flag': 'yes'}})
+        rows.append({'name': 'list', 'automatic': {'load': [1], 'flag': False}})
+        inv = Inventory.from_rows(rows, ['load', 'flag'])
+        self.assertEqual(inv['load'].type, float)
+        self.assertEqual(inv['load'].tolist()[:3], [0.0, 1.0, 2.0])
+        self.assertEqual(inv['load'].tolist()[-2:], [1.5, None])
+        self.assertEqual(inv['flag'].type, str)
+        self.assertEqual(inv['flag'].tolist()[-3:], ['True', 'yes', 'False'])
+        self.assertEqual(inv['load'].count(), 1501)
+
+    def test_missing_column(self):
+        inv = Inventory.from_rows(NODES, ['nope'])
+        self.assertEqual(inv['nope'].tolist(), [None] * 5)
+        self.assertEqual(len(Inventory.from_rows([], ['name'])), 0)
+
+    def test_count(self):
+        self.assertEqual(self.inv.count(), 5)
+        self.assertEqual(self.inv.count(by='platform'), {'ubuntu': 2, 'centos': 2})
+        self.assertEqual(self.inv.count(by='virtual'), {True: 1, False: 1})
+        self.assertEqual(self.inv.count(by='cpu.total'), {2: 1, 4: 1, 16: 1})
+
+    def test_percentile(self):
+        self.assertEqual(self.inv.percentile('cpu.total', 50), 4.0)
+        self.assertEqual(self.inv.percentile('cpu.total', 75), 10.0)
+        self.assertEqual(self.inv.percentile('cpu.total', 100, by='platform'), {'ubuntu': 4.0, 'centos': 16.0})
+        self.assertEqual(self.inv.percentile('uptime', 50, by='platform'), {'ubuntu': 15.5, 'centos': None})
+        with self.assertRaises(TypeError):
+            self.inv.percentile('platform', 50)
+
+    def test_group_by(self):
+        groups = self.inv.group_by('platform')
+        self.assertEqual(sorted(groups), ['centos', 'ubuntu'])
+        self.assertEqual(groups['centos']['name'].tolist(), ['db1', 'db2'])
+        self.assertEqual(groups['ubuntu']['cpu.total'].tolist(), [2, 4])
+
+    def test_inventory_partial(self):
+        api = test_chef_api(version='12.0.0')
+        result = {'total': 1, 'start': 0, 'rows': [{'url': '', 'data': {'name': 'web1', 'cpu.total': 2}}]}
+        with mock.patch.object(api, 'api_request', return_value=result) as api_request:
+            inv = inventory('roles:web', ['name', 'cpu.total'], api=api)
+        self.assertEqual(list(inv), [('web1', 2)])
+        method, url = api_request.call_args[0][:2]
+        self.assertEqual(method, 'POST')
+        self.assertEqual(api_request.call_args[1]['data'], {'name': ['name'], 'cpu.total': ['cpu', 'total']})
+
+    def test_inventory_full(self):
+        api = test_chef_api(version='10.0.0')
+        result = {'total': 2, 'start': 0, 'rows': NODES[:2]}
+        def api_request(method, path, headers={}, data=None):
+            if method == 'POST':
+                raise ChefServerNotFoundError('Not Found', code=404)
+            return result
+        with mock.patch.object(api, 'api_request', side_effect=api_request) as mock_request:
+            inv = inventory('roles:web', ['name', 'cpu.total'], api=api)
+        self.assertEqual(list(inv), [('web1', 2), ('web2', 4)])
+        self.assertEqual([c[0][0] for c in mock_request.call_args_list], ['POST', 'GET'])
+
+    def test_inventory_default_api(self):
+        # The default API version predates partial search, which is tried
+        # and then used for every page
+        api = test_chef_api()
+        pages = [{'total': 2, 'start': 0, 'rows': [{'url': '', 'data': {'name': 'web1'}}]},
+                 {'total': 2, 'start': 1, 'rows': [{'url': '', 'data': {'name': 'web2'}}]}]
+        with mock.patch.object(api, 'api_request', side_effect=pages) as api_request:
+            inv = inventory('roles:web', ['name'], rows=1, api=api)
+        self.assertEqual(inv['name'].tolist(), ['web1', 'web2'])
+        self.assertEqual([c[0][0] for c in api_request.call_args_list], ['POST', 'POST'])
+
+
+@skipIf(inventory_module.numpy is None, 'NumPy is not installed')
+class PurePythonInventoryTestCase(InventoryTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(inventory_module, 'numpy', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super(PurePythonInventoryTestCase, self).setUp()
+
+    def test_arrays(self):
+        self.assertEqual(self.inv['cpu.total'].values.typecode, inventory_module._int_typecode)
+        self.assertIsInstance(self.inv['cpu.total'].mask, bytearray)
@@ -0,0 +1,155 @@
+import json as stdlib_json
+
+from unittest2 import TestCase
+
+from chef import Node
+from chef.acl import Acl
+from chef.node import NodeAttributes
+from chef.utils import json
+
+DOC = {
+    'total': 3,
+    'start': 0,
+    'rows': [
+        {'name': 'web1', 'automatic': {'fqdn': 'web1.example.com', 'uptime': 123456789}},
+        None,
+        {'name': u'caf\xe9', 'run_list': ['role[web]'], 'number': -1.5e10},
+    ],
+    'extra': {'nested': [1, [2, 3], {'a': 'b'}]},
+}
+
+
+def chunked(data, size):
+    return [data[i:i+size] for i in range(0, len(data), size)]
+
+
+class IterLoadTestCase(TestCase):
+    def setUp(self):
+        super(IterLoadTestCase, self).setUp()
+        self.raw = stdlib_json.dumps(DOC, ensure_ascii=False, indent=1).encode('utf-8')
+
+    def assertStreamed(self, items):
+        self.assertEqual(items[:2], [('total', 3), ('start', 0)])
+        self.assertEqual(items[2:5], [('rows', row) for row in DOC['rows']])
+        self.assertEqual(items[5:], [('extra', DOC['extra'])])
+
+    def test_whole(self):
+        items = sorted(json.iterload([self.raw]), key=lambda item: item[0])
+        self.assertEqual(dict(items), DOC)
+
+    def test_stream_rows(self):
+        # Split at every possible point, including inside UTF-8 sequences
+        for size in range(1, 40):
+            items = list(json.iterload(chunked(self.raw, size), stream=('rows',)))
+            items.sort(key=lambda item: ['total', 'start', 'rows', 'extra'].index(item[0]))
+            self.assertStreamed(items)
+
+    def test_number_split(self):
+        items = list(json.iterload([b'{"total": 12', b'34}']))
+        self.assertEqual(items, [('total', 1234)])
+        self.assertEqual(list(json.iterload([b'{"total": 1.', b'5}'])), [('total', 1.5)])
+        self.assertEqual(list(json.iterload([b'{"rows": [1.', b'5]}'], stream=('rows',))), [('rows', 1.5)])
+        self.assertEqual(list(json.iterload([b'{"a": 1e', b'3}'])), [('a', 1000.0)])
+
+    def test_number_split_everywhere(self):
+        raw = b'{"a": 1.5, "b": -12e3, "c": 4E-2, "d": 7, "rows": [1.25, -3, 6.02e+23, 0], "e": 10}'
+        expected = stdlib_json.loads(raw.decode('utf-8'))
+        for i in range(len(raw) + 1):
+            items = list(json.iterload([raw[:i], raw[i:]]))
+            self.assertEqual(dict(items), expected)
+            items = list(json.iterload([raw[:i], raw[i:]], stream=('rows',)))
+            self.assertEqual([value for key, value in items if key == 'rows'], expected['rows'])
+
+    def test_empty(self):
+        self.assertEqual(list(json.iterload([b' { } '])), [])
+        self.assertEqual(list(json.iterload([b'{"rows": [ ]}'], stream=('rows',))), [])
+
+    def test_lazy(self):
+        def chunks():
+            yield b'{"rows": [{"a": 1}, '
+            raise AssertionError('Read too far')
+        items = json.iterload(chunks(), stream=('rows',))
+        self.assertEqual(next(items), ('rows', {'a': 1}))
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            list(json.iterload([b'{"rows": [{"a": 1}'], stream=('rows',)))
+
+
+class LoadsDeferredTestCase(TestCase):
+    def test_deferred(self):
+        raw = stdlib_json.dumps(DOC, ensure_ascii=False, indent=1).encode('utf-8')
+        data = json.loads_deferred(raw, defer=('rows', 'extra'))
+        self.assertEqual(data['total'], 3)
+        self.assertIsInstance(data['rows'], json.Deferred)
+        self.assertEqual(data['rows'].load(), DOC['rows'])
+        self.assertEqual(data['extra'].load(), DOC['extra'])
+        self.assertEqual(json.loads(json.dumps(data)), DOC)
+
+    def test_nothing_deferred(self):
+        raw = stdlib_json.dumps(DOC)
+        self.assertEqual(json.loads_deferred(raw), DOC)
+        self.assertEqual(json.loads_deferred(' { } '), {})
+
+    def test_invalid(self):
+        for raw in ('[]', '{"a": 1', '{"a": [1}', '{"a": 1} x', '{1: 2}', '{"a" 1}'):
+            with self.assertRaises(ValueError):
+                json.loads_deferred(raw, defer=('a',))
+
+
+class BackendTestCase(TestCase):
+    def setUp(self):
+        super(BackendTestCase, self).setUp()
+        self.addCleanup(json.use, json.backend)
+
+    def available(self):
+        for name, loader in json.backends:
+            try:
+                json.use(name)
+            except (ImportError, TypeError):
+                continue
+            yield name
+
+    def test_stdlib_available(self):
+        self.assertIn('json', list(self.available()))
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            json.use('nope')
+
+    def test_roundtrip(self):
+        node = Node('web1', skip_load=True)
+        node.normal['a'] = {'b': [1, 2.5, None, True]}
+        node.run_list = ['role[web]']
+        doc = {'node': node, 'attrs': node.attributes, u'caf\xe9': u'\u2603', 'big': 2**70, 'rows': (1, 2)}
+        expected = stdlib_json.loads(stdlib_json.dumps(doc, cls=json.JSONEncoder))
+        for name in self.available():
+            self.assertEqual(json.loads(json.dumps(doc)), expected, name)
+            data = json.dumpb(doc)
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(json.loads(data), expected, name)
+            self.assertEqual(json.loads(data.decode('utf-8')), expected, name)
+
+    def test_kwargs_use_stdlib(self):
+        for name in self.available():
+            self.assertEqual(json.dumps({'b': 1, 'a': 2}, sort_keys=True), '{"a": 2, "b": 1}')
+
+    def test_register_type(self):
+        class Base(object):
+            pass
+        class Child(Base):
+            pass
+        json.register_type(Base, lambda obj: 'converted')
+        self.assertEqual(json.to_json(Child()), 'converted')
+        self.assertEqual(json.dumps([Child()]), '["converted"]')
+
+    def test_native_hooks(self):
+        attrs = NodeAttributes([{'a': 1}, {'a': 2, 'b': 3}])
+        self.assertEqual(json.to_json(attrs), {'a': 1, 'b': 3})
+        acl = Acl('nodes', 'web1', api=None, skip_load=True)
+        self.assertEqual(sorted(json.to_json(acl)), sorted(Acl.ace_types))
+
+    def test_unserializable(self):
+        for name in self.available():
+            with self.assertRaises(TypeError):
+                json.dumps(object())
@@ -0,0 +1,49 @@
+from unittest2 import TestCase
+
+from chef.node import NodeAttributes
+from chef.utils.merge import deep_merge
+
+
+class DeepMergeTestCase(TestCase):
+    def test_nested(self):
+        merged = deep_merge({'a': {'b': 1, 'c': {'d': 2, 'e': 3}}}, {'a': {'b': 4, 'c': {'e': 5}}})
+        self.assertEqual(merged, {'a': {'b': 4, 'c': {'d': 2, 'e': 5}}})
+
+    def test_precedence(self):
+        self.assertEqual(deep_merge({'a': 1}, {'a': 2}, {'a': 3}), {'a': 3})
+        self.assertEqual(deep_merge({'a': 1}, {}, None), {'a': 1})
+        self.assertEqual(deep_merge(), {})
+
+    def test_lists_replaced(self):
+        self.assertEqual(deep_merge({'a': [1, 2]}, {'a': [3]}), {'a': [3]})
+
+    def test_type_mismatch(self):
+        self.assertEqual(deep_merge({'a': {'b': 1}}, {'a': 2}), {'a': 2})
+        self.assertEqual(deep_merge({'a': 2}, {'a': {'b': 1}}), {'a': {'b': 1}})
+        self.assertEqual(deep_merge({'a': {'b': 1}}, {'a': 2}, {'a': {'c': 3}}), {'a': {'c': 3}})
+
+    def test_structural_sharing(self):
+        low = {'shared': {'x': {'y': 1}}, 'both': {'p': {'q': 1}, 'r': 2}}
+        high = {'both': {'r': 3}}
+        merged = deep_merge(low, high)
+        self.assertIs(merged['shared'], low['shared'])
+        self.assertIs(merged['both']['p'], low['both']['p'])
+        self.assertIsNot(merged['both'], low['both'])
+        self.assertEqual(low['both']['r'], 2)
+        self.assertIsNot(deep_merge(low), low)
+
+    def test_deep(self):
+        low = high = {}
+        for i in range(5000):
+            low = {'k': low, 'low': i}
+            high = {'k': high, 'high': i}
+        merged = deep_merge(low, high)
+        for i in reversed(range(5000)):
+            self.assertEqual((merged['low'], merged['high']), (i, i))
+            merged = merged['k']
+
+
+class NodeAttributesToDictTestCase(TestCase):
+    def test_to_dict(self):
+        attrs = NodeAttributes([{'a': {'b': 1}}, {'a': {'c': 2}, 'd': 3}, {'a': {'b': 4, 'e': 5}}])
+        self.assertEqual(attrs.to_dict(), {'a': {'b': 1, 'c': 2, 'e': 5}, 'd': 3})
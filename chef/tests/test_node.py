@@ -1,9 +1,16 @@
+import copy
+import json as stdlib_json
+
+import mock
+import six
 from unittest2 import TestCase, skip
 
 from chef import Node
 from chef.exceptions import ChefError
-from chef.node import NodeAttributes
-from chef.tests import ChefTestCase
+from chef.node import AttributePath, NodeAttributes, extract
+from chef.search import Search, SearchRow
+from chef.utils import json
+from chef.tests import ChefTestCase, mock_response, test_chef_api
 
 class NodeAttributeTestCase(TestCase):
     def test_getitem(self):
@@ -99,6 +106,319 @@ class NodeAttributeTestCase(TestCase):
         self.assertEqual(data['a']['c']['d'], 2)
 
 
+
+class NodeAttributeCacheTestCase(TestCase):
+    def setUp(self):
+        super(NodeAttributeCacheTestCase, self).setUp()
+        self.normal = {'a': {'b': 1}, 'c': 2}
+        self.attrs = NodeAttributes([{'a': {'x': 0}}, self.normal], write=self.normal)
+
+    def test_cached_view(self):
+        self.assertIs(self.attrs['a'], self.attrs['a'])
+        self.assertEqual(sorted(self.attrs['a']), ['b', 'x'])
+        self.assertEqual(len(self.attrs), 2)
+
+    def test_cached_view_last(self):
+        # Only the nested view read last is kept
+        attrs = NodeAttributes([{'a': {'x': 0}, 'b': {'y': 1}}])
+        a = attrs['a']
+        self.assertIs(attrs['a'], a)
+        attrs['b']
+        self.assertIsNot(attrs['a'], a)
+
+    def test_cached_view_invalidated(self):
+        a = self.attrs['a']
+        self.assertIs(self.attrs['a'], a)
+        self.attrs['a'] = {'z': 1}
+        self.assertEqual(sorted(self.attrs['a']), ['x', 'z'])
+        self.assertEqual(sorted(self.attrs['a']), ['x', 'z'])
+
+    def test_setitem_invalidates(self):
+        a = self.attrs['a']
+        self.assertEqual(len(a), 2)
+        self.attrs['a']['y'] = 3
+        self.assertEqual(len(a), 3)
+        self.assertEqual(sorted(self.attrs['a']), ['b', 'x', 'y'])
+        self.attrs['c'] = {'d': 4}
+        self.assertEqual(self.attrs['c']['d'], 4)
+
+    def test_delitem_invalidates(self):
+        self.assertEqual(len(self.attrs), 2)
+        del self.attrs['c']
+        self.assertEqual(len(self.attrs), 1)
+        self.assertNotIn('c', self.attrs)
+
+    def test_set_dotted_invalidates(self):
+        self.assertEqual(self.attrs['a']['b'], 1)
+        self.attrs.set_dotted('a.b', {'e': 5})
+        self.assertEqual(self.attrs.get_dotted('a.b.e'), 5)
+
+    def test_node_views_shared(self):
+        node = Node.from_search({'name': 'test', 'normal': {'a': {'b': 1}}, 'default': {'a': {'c': 2}}})
+        self.assertEqual(sorted(node['a']), ['b', 'c'])
+        node.normal['a']['d'] = 3
+        self.assertEqual(sorted(node['a']), ['b', 'c', 'd'])
+        node['e'] = 4
+        self.assertEqual(node.normal['e'], 4)
+
+
+
+NODE_DOC = {
+    'name': 'web1',
+    'chef_environment': 'prod',
+    'automatic': {'fqdn': 'web1.example.com', 'cloud': {'provider': 'ec2'}},
+    'override': {'app': {'port': 8080}},
+    'normal': {'app': {'version': '2.0'}, 'tags': ['web']},
+    'default': {'app': {'port': 80, 'user': 'www'}, 'cloud': 'none'},
+}
+
+
+class AttributePathTestCase(TestCase):
+    def test_keys(self):
+        path = AttributePath('cloud.public_hostname')
+        self.assertEqual(path.keys, ('cloud', 'public_hostname'))
+        self.assertEqual(str(path), 'cloud.public_hostname')
+        self.assertEqual(AttributePath(path), path)
+        self.assertEqual(len(set([path, AttributePath('cloud.public_hostname')])), 1)
+
+    def test_lookup(self):
+        levels = [NODE_DOC[name] for name in ('automatic', 'override', 'normal', 'default')]
+        self.assertEqual(AttributePath('app.port').lookup(levels), 8080)
+        self.assertEqual(AttributePath('app.user').lookup(levels), 'www')
+        self.assertEqual(AttributePath('app').lookup(levels), {'port': 8080, 'version': '2.0', 'user': 'www'})
+        self.assertEqual(AttributePath('cloud.provider').lookup(levels), 'ec2')
+        with self.assertRaises(KeyError):
+            AttributePath('fqdn.x').lookup(levels)
+        with self.assertRaises(KeyError):
+            AttributePath('app.missing').lookup(levels)
+        self.assertEqual(AttributePath('a.b').lookup([{'a': {'b': 1}}]), 1)
+
+    def test_get_dotted(self):
+        node = Node.from_search(copy.deepcopy(NODE_DOC))
+        path = AttributePath('app.port')
+        self.assertEqual(node.attributes.get_dotted(path), 8080)
+        self.assertTrue(node.attributes.has_dotted(path))
+        node.attributes.set_dotted(AttributePath('app.debug'), True)
+        self.assertEqual(node.normal['app']['debug'], True)
+
+
+class ExtractTestCase(TestCase):
+    paths = ['name', 'fqdn', 'app.port', 'app.version', 'missing']
+
+    def test_documents(self):
+        docs = [NODE_DOC, {'name': 'web2', 'automatic': {'fqdn': 'web2.example.com'}}]
+        self.assertEqual(extract(docs, self.paths), [
+            ('web1', 'web1.example.com', 8080, '2.0', None),
+            ('web2', 'web2.example.com', None, None, None),
+        ])
+
+    def test_columns(self):
+        docs = [NODE_DOC, {'name': 'web2'}]
+        self.assertEqual(extract(docs, ['name', AttributePath('app.port')], default=0, columns=True),
+                         [['web1', 'web2'], [8080, 0]])
+        self.assertEqual(extract([], ['name', 'fqdn'], columns=True), [[], []])
+
+    def test_nodes(self):
+        node = Node.from_search(copy.deepcopy(NODE_DOC))
+        self.assertEqual(extract([node, node.attributes], self.paths[1:]), [
+            ('web1.example.com', 8080, '2.0', None),
+            ('web1.example.com', 8080, '2.0', None),
+        ])
+
+    def test_partial_rows(self):
+        rows = [{'name': 'web1', 'cloud.public_hostname': None, 'fqdn': 'web1.example.com'}]
+        self.assertEqual(extract(rows, ['name', 'cloud.public_hostname', 'fqdn']),
+                         [('web1', None, 'web1.example.com')])
+
+
+
+class CompactNodeTestCase(TestCase):
+    def test_lazy_views(self):
+        node = Node.from_search(copy.deepcopy(NODE_DOC))
+        self.assertIsNone(node._default)
+        self.assertEqual(node.default['app']['user'], 'www')
+        self.assertIs(node.default, node._default)
+        self.assertEqual(node.override['app']['port'], 8080)
+        self.assertEqual(node.automatic['fqdn'], 'web1.example.com')
+        node.normal['app']['version'] = '3.0'
+        self.assertEqual(node['app']['version'], '3.0')
+        node.default = NodeAttributes({'x': 1})
+        self.assertEqual(node.default['x'], 1)
+
+    def test_to_dict(self):
+        node = Node.from_search(copy.deepcopy(NODE_DOC))
+        data = node.to_dict()
+        for level in ('automatic', 'override', 'normal', 'default'):
+            self.assertEqual(data[level], NODE_DOC[level])
+        self.assertEqual(data['chef_environment'], 'prod')
+
+    def test_search_row_slots(self):
+        self.assertFalse(hasattr(SearchRow({}, None), '__dict__'))
+
+    def test_compact(self):
+        # Strings decoded from JSON are unicode on Python 2 as well
+        key = u''.join([u'compact', u'-key'])
+        value = u''.join([u'compact', u'-value'])
+        long_value = u'x' * 100
+        nodes = []
+        for i in range(2):
+            doc = copy.deepcopy(NODE_DOC)
+            doc['automatic'][key[:]] = {'list': [value[:], {'nested': long_value[:]}]}
+            doc['automatic']['copy'] = u''.join([u'compact', u'-value'])
+            nodes.append(Node.from_search(doc))
+        self.assertIsNot(nodes[0]['copy'], nodes[1]['copy'])
+        for node in nodes:
+            self.assertIs(node.compact(), node)
+        self.assertIs(nodes[0]['copy'], nodes[1]['copy'])
+        self.assertIsInstance(nodes[0]['copy'], six.text_type)
+        keys = [[k for k in node.automatic if k.startswith('compact')][0] for node in nodes]
+        self.assertIs(keys[0], keys[1])
+        self.assertIs(nodes[0][key]['list'][0], nodes[1][key]['list'][0])
+        self.assertEqual(nodes[0][key]['list'][1]['nested'], long_value)
+        self.assertEqual(nodes[0]['app']['port'], 8080)
+
+
+class LazyNodeTestCase(TestCase):
+    def load(self, doc=NODE_DOC, **kwargs):
+        api = test_chef_api(**kwargs)
+        body = stdlib_json.dumps(doc).encode('utf-8')
+        with mock.patch.object(api, '_request', return_value=mock_response(200, body, {'ETag': '1'})):
+            return Node('web1', api=api, lazy=True)
+
+    def decoded(self, node):
+        return [not isinstance(level, json.Deferred) for level in node.attributes.search_path.levels]
+
+    def test_top_level(self):
+        node = self.load()
+        self.assertTrue(node.exists)
+        self.assertEqual(node.chef_environment, 'prod')
+        self.assertEqual(node.run_list, [])
+        self.assertEqual(self.decoded(node), [False] * 4)
+
+    def test_level(self):
+        node = self.load()
+        self.assertEqual(node.default['app']['user'], 'www')
+        self.assertEqual(self.decoded(node), [False, False, False, True])
+        self.assertEqual(node['app']['port'], 8080)
+        self.assertEqual(self.decoded(node), [True] * 4)
+
+    def test_write(self):
+        node = self.load()
+        node['new'] = 1
+        self.assertEqual(self.decoded(node), [False, False, True, False])
+        self.assertEqual(node.normal['new'], 1)
+        node['app']['version'] = '3.0'
+        self.assertEqual(node.normal['app']['version'], '3.0')
+
+    def test_to_dict(self):
+        node = self.load()
+        data = stdlib_json.loads(json.dumps(node))
+        for level in ('automatic', 'override', 'normal', 'default'):
+            self.assertEqual(data[level], NODE_DOC[level])
+
+    def test_cached(self):
+        node = self.load(cache=True)
+        self.assertEqual(node.automatic['fqdn'], 'web1.example.com')
+        self.assertEqual(len(node.api.cache), 1)
+
+
+class NodeChangesTestCase(TestCase):
+    def setUp(self):
+        super(NodeChangesTestCase, self).setUp()
+        self.api = test_chef_api()
+        self.node = Node.from_search(copy.deepcopy(NODE_DOC), api=self.api)
+
+    def save(self, node, **kwargs):
+        with mock.patch.object(self.api, 'api_request', return_value={}) as api_request:
+            saved = node.save(**kwargs)
+        self.assertEqual(api_request.called, saved)
+        return saved
+
+    def test_unchanged(self):
+        self.assertEqual(self.node.changes, [])
+        self.node['app']['port']
+        self.assertFalse(self.save(self.node, only_if_changed=True))
+        self.assertTrue(self.save(self.node))
+
+    def test_attributes(self):
+        self.node.normal['app']['version'] = '3.0'
+        self.node.attributes.set_dotted('a.b', 1)
+        del self.node.attributes['tags']
+        self.assertEqual(self.node.changes, ['normal.a', 'normal.a.b', 'normal.app.version', 'normal.tags'])
+        self.assertEqual(self.node.normal.changes, ['a', 'a.b', 'app.version', 'tags'])
+        self.assertTrue(self.save(self.node, only_if_changed=True))
+        self.assertEqual(self.node.changes, [])
+        self.assertFalse(self.save(self.node, only_if_changed=True))
+
+    def test_in_place(self):
+        self.assertIs(self.node.track_changes(), self.node)
+        self.node.normal['tags'].append('blue')
+        self.assertEqual(self.node.changes, ['normal'])
+        self.assertTrue(self.save(self.node, only_if_changed=True))
+        self.assertEqual(self.node.changes, [])
+        self.node['app']['version'] = '3.0'
+        self.assertEqual(self.node.changes, ['normal.app.version'])
+        self.assertTrue(self.save(self.node))
+        self.node.normal['tags'].append('green')
+        self.assertEqual(self.node.changes, ['normal'])
+
+    def test_in_place_untracked(self):
+        self.node.normal['tags'].append('blue')
+        self.assertEqual(self.node.changes, [])
+
+    def test_track_changes_load(self):
+        body = stdlib_json.dumps(NODE_DOC).encode('utf-8')
+        with mock.patch.object(self.api, '_request', return_value=mock_response(200, body, {})):
+            node = Node('web1', api=self.api, track_changes=True)
+        node.normal['tags'].append('blue')
+        self.assertEqual(node.changes, ['normal'])
+
+    def test_no_snapshot_by_default(self):
+        search = Search('node', api=self.api)
+        search._data = {'total': 2, 'start': 0, 'rows': [dict(copy.deepcopy(NODE_DOC), json_class='Chef::Node') for i in range(2)]}
+        with mock.patch('chef.node._snapshot') as snapshot:
+            nodes = search.objects()
+            Node.from_search(copy.deepcopy(NODE_DOC), api=self.api)
+            self.assertTrue(self.save(nodes[0]))
+            self.assertFalse(snapshot.called)
+            nodes[1].track_changes()
+            self.assertEqual(snapshot.call_count, 1)
+
+    def test_in_place_lazy(self):
+        node = Node.from_search({'name': 'web1', 'normal': json.Deferred('{"tags": ["web"]}')}, api=self.api)
+        node.track_changes()
+        self.assertEqual(node.changes, [])
+        node.normal['tags']
+        self.assertEqual(node.changes, [])
+        node.normal['tags'].append('blue')
+        self.assertEqual(node.changes, ['normal'])
+
+    def test_run_list_environment(self):
+        self.node.run_list.append('role[web]')
+        self.node.chef_environment = 'staging'
+        self.assertEqual(self.node.changes, ['chef_environment', 'run_list'])
+        self.assertTrue(self.save(self.node))
+        self.assertEqual(self.node.changes, [])
+        self.node.run_list = ['role[web]']
+        self.assertEqual(self.node.changes, [])
+
+    def test_replace_level(self):
+        self.node.default = NodeAttributes({'x': 1})
+        self.assertEqual(self.node.changes, ['default'])
+
+    def test_new_node(self):
+        node = Node('web2', api=self.api, skip_load=True)
+        self.assertEqual(node.changes, [])
+        self.assertTrue(self.save(node, only_if_changed=True))
+        self.assertTrue(node.exists)
+        self.assertFalse(self.save(node, only_if_changed=True))
+
+    def test_read_only_levels(self):
+        with self.assertRaises(ChefError):
+            self.node.default['app'] = {}
+        self.assertEqual(self.node.changes, [])
+
+
 class NodeTestCase(ChefTestCase):
     def setUp(self):
         super(NodeTestCase, self).setUp()
@@ -0,0 +1,107 @@
+import mock
+import requests
+from unittest2 import TestCase
+
+from chef.exceptions import ChefServerError, ChefServerNotFoundError
+from chef.retry import RetryPolicy
+from chef.tests import mock_response, test_chef_api
+
+
+class RetryPolicyTestCase(TestCase):
+    def test_backoff(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        with mock.patch('chef.retry.random.uniform', side_effect=lambda a, b: b):
+            self.assertEqual(policy.next_delay('GET', 1, 0), 1)
+            self.assertEqual(policy.next_delay('GET', 3, 0), 4)
+            self.assertEqual(policy.next_delay('GET', 4, 0), 5)
+
+    def test_max_attempts(self):
+        policy = RetryPolicy(max_attempts=2)
+        self.assertIsNotNone(policy.next_delay('GET', 1, 0))
+        self.assertIsNone(policy.next_delay('GET', 2, 0))
+
+    def test_method_not_idempotent(self):
+        self.assertIsNone(RetryPolicy().next_delay('POST', 1, 0))
+
+    def test_status_not_retryable(self):
+        self.assertIsNone(RetryPolicy().next_delay('GET', 1, 0, mock_response(500)))
+
+    def test_retry_after(self):
+        response = mock_response(503, headers={'Retry-After': '7'})
+        self.assertEqual(RetryPolicy().next_delay('GET', 1, 0, response), 7)
+
+    def test_retry_after_date(self):
+        response = mock_response(429, headers={'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        with mock.patch('chef.retry.time.time', return_value=1445412470):
+            self.assertEqual(RetryPolicy().next_delay('GET', 1, 0, response), 10)
+
+    def test_deadline(self):
+        response = mock_response(503, headers={'Retry-After': '7'})
+        self.assertIsNone(RetryPolicy(deadline=10).next_delay('GET', 1, 5, response))
+
+
+@mock.patch('chef.api.time.sleep')
+class APIRetryTestCase(TestCase):
+    def setUp(self):
+        super(APIRetryTestCase, self).setUp()
+        self.api = test_chef_api(retry=True)
+
+    def test_retry_then_succeed(self, sleep):
+        responses = [mock_response(503), mock_response(429), mock_response(200, b'{"a": 1}')]
+        with mock.patch.object(self.api, '_request', side_effect=responses):
+            response = self.api.request('GET', '/nodes')
+        self.assertEqual(response.json(), {'a': 1})
+        self.assertEqual(response.retries, 2)
+        self.assertEqual(sleep.call_count, 2)
+        stats = self.api.retry.stats
+        self.assertEqual((stats['requests'], stats['retries'], stats[503], stats[429]), (1, 2, 1, 1))
+
+    def test_resigned(self, sleep):
+        responses = [mock_response(502), mock_response(200)]
+        with mock.patch.object(self.api, '_request', side_effect=responses):
+            with mock.patch.object(self.api.signer, 'sign', return_value={'x-ops-timestamp': 'now'}) as sign:
+                self.api.request('PUT', '/nodes/a', data='{}')
+        self.assertEqual(sign.call_count, 2)
+
+    def test_closes_retried_responses(self, sleep):
+        responses = [mock_response(503), mock_response(200)]
+        for response in responses:
+            response.close = mock.Mock()
+        with mock.patch.object(self.api, '_request', side_effect=responses):
+            self.api.request('GET', '/nodes', stream=True)
+        responses[0].close.assert_called_once_with()
+        self.assertFalse(responses[1].close.called)
+
+    def test_connection_error(self, sleep):
+        responses = [requests.ConnectionError('boom'), mock_response(200)]
+        with mock.patch.object(self.api, '_request', side_effect=responses):
+            self.assertEqual(self.api.request('GET', '/nodes').retries, 1)
+
+    def test_exhausted(self, sleep):
+        self.api.retry.max_attempts = 3
+        with mock.patch.object(self.api, '_request', return_value=mock_response(503)) as _request:
+            with self.assertRaises(ChefServerError) as cm:
+                self.api.request('GET', '/nodes')
+        self.assertEqual(_request.call_count, 3)
+        self.assertEqual(cm.exception.retries, 2)
+        self.assertEqual(self.api.retry.stats['exhausted'], 1)
+
+    def test_not_found_not_retried(self, sleep):
+        with mock.patch.object(self.api, '_request', return_value=mock_response(404)) as _request:
+            with self.assertRaises(ChefServerNotFoundError):
+                self.api.request('GET', '/nodes/missing')
+        self.assertEqual(_request.call_count, 1)
+
+    def test_post_not_retried(self, sleep):
+        with mock.patch.object(self.api, '_request', return_value=mock_response(503)) as _request:
+            with self.assertRaises(ChefServerError):
+                self.api.request('POST', '/nodes', data='{}')
+        self.assertEqual(_request.call_count, 1)
+
+    def test_disabled(self, sleep):
+        api = test_chef_api()
+        with mock.patch.object(api, '_request', return_value=mock_response(503)) as _request:
+            with self.assertRaises(ChefServerError):
+                api.request('GET', '/nodes')
+        self.assertEqual(_request.call_count, 1)
+        sleep.assert_not_called()
@@ -1,8 +1,10 @@
 import os
+import shutil
+import tempfile
 
 import unittest2
 
-from chef.rsa import Key, SSLError
+from chef.rsa import Key, KeyCache, RSA_free, SSLError, key_cache
 from chef.tests import TEST_ROOT, skipSlowTest
 
 class RSATestCase(unittest2.TestCase):
@@ -14,6 +16,13 @@ class RSATestCase(unittest2.TestCase):
         key = Key(os.path.join(TEST_ROOT, 'client_pub.pem'))
         self.assertTrue(key.public)
 
+    def test_load_public_spki(self):
+        key = Key(os.path.join(TEST_ROOT, 'client_spki.pem'))
+        self.assertTrue(key.public)
+        msg = 'Test string!'
+        private = Key(os.path.join(TEST_ROOT, 'client.pem'))
+        self.assertEqual(key.public_decrypt(private.private_encrypt(msg)), msg)
+
     def test_private_export(self):
         key = Key(os.path.join(TEST_ROOT, 'client.pem'))
         raw = open(os.path.join(TEST_ROOT, 'client.pem'), 'rb').read()
@@ -64,3 +73,96 @@ class RSATestCase(unittest2.TestCase):
     def test_load_public_pem_string(self):
         key = Key(open(os.path.join(TEST_ROOT, 'client_pub.pem'), 'rb').read())
         self.assertTrue(key.public)
+
+
+class KeyCacheTestCase(unittest2.TestCase):
+    def setUp(self):
+        super(KeyCacheTestCase, self).setUp()
+        key_cache.clear()
+        self.path = os.path.join(TEST_ROOT, 'client.pem')
+        self.msg = 'Test string!'
+
+    def tearDown(self):
+        key_cache.clear()
+        super(KeyCacheTestCase, self).tearDown()
+
+    def test_shared_handle(self):
+        key = Key(self.path)
+        key2 = Key(os.path.join(TEST_ROOT, '..', 'tests', 'client.pem'))
+        self.assertEqual(key.key, key2.key)
+        self.assertEqual(key.raw, key2.raw)
+        self.assertFalse(key2.public)
+        self.assertEqual(len(key_cache), 1)
+
+    def test_pem_string(self):
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        key = Key(raw)
+        self.assertEqual(Key(raw).key, key.key)
+        # The same text read from a file shares the handle
+        self.assertEqual(Key(self.path).key, key.key)
+        self.assertEqual(len(key_cache), 1)
+
+    def test_refcount(self):
+        key = Key(self.path)
+        signed = key.private_encrypt(self.msg)
+        key2 = Key(self.path)
+        del key2
+        key_cache.clear()
+        # The handle is still owned by key
+        self.assertEqual(key.private_encrypt(self.msg), signed)
+        self.assertNotEqual(Key(self.path).key, None)
+
+    def test_modified(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'client.pem')
+            shutil.copy(self.path, path)
+            key = Key(path)
+            shutil.copy(os.path.join(TEST_ROOT, 'client_pub.pem'), path)
+            os.utime(path, (0, 0))
+            key2 = Key(path)
+            self.assertNotEqual(key.key, key2.key)
+            self.assertTrue(key2.public)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_rotated_in_place(self):
+        # A new key of the same size, with the old modification time
+        old = Key.generate().private_export()
+        new = Key.generate().private_export()
+        while len(new) != len(old):
+            new = Key.generate().private_export()
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'client.pem')
+            with open(path, 'wb') as f:
+                f.write(old)
+            stat = os.stat(path)
+            key = Key(path)
+            with open(path, 'wb') as f:
+                f.write(new)
+            os.utime(path, (stat.st_atime, stat.st_mtime))
+            key2 = Key(path)
+            self.assertNotEqual(key.key, key2.key)
+            self.assertEqual(key2.private_export(), new)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_max_size(self):
+        cache = KeyCache(max_size=1)
+        key = Key.generate()
+        cache.add('a', key.key, False, None)
+        cache.add('b', key.key, False, None)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.acquire('a'), None)
+        handle, public, raw = cache.acquire('b')
+        self.assertEqual(handle, key.key)
+        # Release the reference taken by acquire
+        RSA_free(handle)
+        cache.clear()
+        self.assertEqual(key.public_decrypt(key.private_encrypt(self.msg)), self.msg)
+
+    def test_missing_file(self):
+        with self.assertRaises(IOError):
+            Key(os.path.join(TEST_ROOT, 'missing.pem'))
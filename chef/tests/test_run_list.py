@@ -0,0 +1,108 @@
+import mock
+from unittest2 import TestCase
+
+from chef.exceptions import ChefServerNotFoundError
+from chef.node import Node
+from chef.run_list import RoleCache, parse_item
+from chef.tests import test_chef_api
+
+OBJECTS = {
+    '/roles/base': {'name': 'base', 'run_list': ['recipe[ntp]', 'recipe[users]'],
+                    'default_attributes': {'ntp': {'server': 'pool.ntp.org'}, 'app': {'port': 8000}},
+                    'override_attributes': {}},
+    '/roles/web': {'name': 'web', 'run_list': ['role[base]', 'recipe[nginx]', 'recipe[ntp]'],
+                   'env_run_lists': {'prod': ['role[base]', 'role[monitored]', 'recipe[nginx::ssl]']},
+                   'default_attributes': {'app': {'port': 8080, 'workers': 4}},
+                   'override_attributes': {'nginx': {'gzip': True}}},
+    '/roles/monitored': {'name': 'monitored', 'run_list': ['recipe[collectd]', 'role[web]'],
+                         'default_attributes': {}, 'override_attributes': {'app': {'workers': 8}}},
+    '/environments/prod': {'name': 'prod', 'default_attributes': {'app': {'port': 80, 'debug': False}},
+                           'override_attributes': {'nginx': {'gzip': False}}},
+    '/environments/_default': {'name': '_default'},
+}
+
+
+class RunListTestCase(TestCase):
+    def setUp(self):
+        super(RunListTestCase, self).setUp()
+        self.api = test_chef_api()
+        self.cache = RoleCache(self.api)
+        patcher = mock.patch.object(self.api, 'api_request', side_effect=self.request)
+        self.api_request = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, path, *args, **kwargs):
+        if path == '/roles':
+            return dict((name[7:], 'url') for name in OBJECTS if name.startswith('/roles/'))
+        if path not in OBJECTS:
+            raise ChefServerNotFoundError('Not found', 404)
+        return dict(OBJECTS[path])
+
+    def paths(self):
+        return sorted(call[0][1] for call in self.api_request.call_args_list)
+
+    def test_parse_item(self):
+        self.assertEqual(parse_item('role[web]'), ('role', 'web'))
+        self.assertEqual(parse_item('recipe[nginx::ssl]'), ('recipe', 'nginx::ssl'))
+        self.assertEqual(parse_item('nginx'), ('recipe', 'nginx'))
+        with self.assertRaises(ValueError):
+            parse_item('role[web')
+
+    def test_expand(self):
+        expansion = self.cache.expand(['role[web]', 'recipe[app]'])
+        self.assertEqual(expansion.roles, ['web', 'base'])
+        self.assertEqual(expansion.recipes, ['ntp', 'users', 'nginx', 'app'])
+        self.assertEqual(expansion.missing_roles, [])
+        self.assertEqual(expansion.default_attributes['app'], {'port': 8080, 'workers': 4})
+        self.assertEqual(expansion.default_attributes['ntp'], {'server': 'pool.ntp.org'})
+
+    def test_env_run_lists(self):
+        # monitored includes web again, which is only applied once
+        expansion = self.cache.expand(['role[web]'], 'prod')
+        self.assertEqual(expansion.roles, ['web', 'base', 'monitored'])
+        self.assertEqual(expansion.recipes, ['ntp', 'users', 'collectd', 'nginx::ssl'])
+        self.assertEqual(expansion.override_attributes, {'nginx': {'gzip': True}, 'app': {'workers': 8}})
+
+    def test_missing_role(self):
+        expansion = self.cache.expand(['role[gone]', 'recipe[app]'])
+        self.assertEqual(expansion.missing_roles, ['gone'])
+        self.assertEqual(expansion.recipes, ['app'])
+        self.assertIs(self.cache.role('gone'), None)
+        self.assertEqual(self.paths(), ['/roles/gone'])
+
+    def test_memoized(self):
+        self.cache.expand(['role[web]'])
+        self.cache.expand(['role[base]', 'recipe[app]'])
+        self.assertIs(self.cache.expand(['role[web]']), self.cache.expand(['role[web]']))
+        self.assertEqual(self.paths(), ['/roles/base', '/roles/web'])
+
+    def test_prefetch(self):
+        self.cache.prefetch()
+        self.cache.expand(['role[web]'], 'prod')
+        self.assertEqual(self.paths(), ['/roles', '/roles/base', '/roles/monitored', '/roles/web'])
+
+    def test_node_expand(self):
+        nodes = [Node.from_search({'name': 'web%d' % i, 'chef_environment': 'prod', 'run_list': ['role[web]'],
+                                   'default': {'app': {'port': 1, 'name': 'shop'}},
+                                   'normal': {'app': {'name': 'store'}},
+                                   'automatic': {'fqdn': 'web%d.example.com' % i}}, api=self.api)
+                 for i in range(3)]
+        for node in nodes:
+            expansion = node.expand(self.cache)
+            self.assertEqual(expansion.recipes, ['ntp', 'users', 'collectd', 'nginx::ssl'])
+            attributes = expansion.attributes
+            # Role defaults beat the environment's, which beat the node's
+            self.assertEqual(attributes['app']['port'], 8080)
+            self.assertEqual(attributes['app']['name'], 'store')
+            self.assertEqual(attributes['app']['workers'], 8)
+            self.assertEqual(attributes['app']['debug'], False)
+            # Environment overrides beat role overrides
+            self.assertEqual(attributes.get_dotted('nginx.gzip'), False)
+            self.assertEqual(attributes['fqdn'], node.name + '.example.com')
+        self.assertEqual(self.paths(), ['/environments/prod', '/roles/base', '/roles/monitored', '/roles/web'])
+
+    def test_node_default_environment(self):
+        node = Node.from_search({'name': 'app1', 'run_list': ['role[base]'], 'normal': {}}, api=self.api)
+        expansion = node.expand(self.cache)
+        self.assertEqual(expansion.attributes.get_dotted('app.port'), 8000)
+        self.assertEqual(expansion.attributes.to_dict()['ntp'], {'server': 'pool.ntp.org'})
@@ -1,7 +1,13 @@
+import copy
+
+import mock
 from unittest2 import skip
 
-from chef import Search, Node
-from chef.exceptions import ChefError
+from chef import Search, Node, DataBagItem, Role
+from chef import search as search_module
+from chef.exceptions import ChefAPIVersionError, ChefError, ChefServerError
+from chef.search import _partial_search
+from chef.tests import mock_response, test_chef_api
 from chef.tests import ChefTestCase, mockSearch
 
 class SearchTestCase(ChefTestCase):
@@ -80,3 +86,164 @@ class MockSearchTestCase(ChefTestCase):
         s = chef.search.Search('node')
         self.assertEqual(len(s), 1)
         self.assertIn('fake_1', s)
+
+
+class IterAllTestCase(ChefTestCase):
+    def fake_api_request(self, method, path, headers={}, data=None):
+        self.requested.append(path)
+        args = dict(arg.split('=') for arg in path.split('?')[1].split('&'))
+        start, rows = int(args['start']), int(args['rows'])
+        return {
+            'total': 7,
+            'start': start,
+            'rows': [{'name': 'node%d' % i} for i in range(start, min(start+rows, 7))],
+        }
+
+    def setUp(self):
+        super(IterAllTestCase, self).setUp()
+        self.requested = []
+        patcher = mock.patch.object(self.api, 'api_request', side_effect=self.fake_api_request)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def names(self, rows):
+        return [row['name'] for row in rows]
+
+    def test_iter_all(self):
+        rows = list(Search('node', rows=3).iter_all())
+        self.assertEqual(self.names(rows), ['node%d' % i for i in range(7)])
+        self.assertEqual(len(self.requested), 3)
+
+    def test_iter_all_start(self):
+        rows = Search('node', rows=3, start=2).iter_all()
+        self.assertEqual(self.names(rows), ['node%d' % i for i in range(2, 7)])
+
+    def test_iter_all_no_read_ahead(self):
+        rows = Search('node', rows=2).iter_all(read_ahead=0)
+        self.assertEqual(self.names(rows), ['node%d' % i for i in range(7)])
+
+    def test_iter_all_read_ahead(self):
+        rows = Search('node', rows=2).iter_all(read_ahead=3)
+        self.assertEqual(next(rows)['name'], 'node0')
+        self.assertEqual(self.names(rows), ['node%d' % i for i in range(1, 7)])
+
+    def test_iter_all_bounded(self):
+        rows = Search('node', rows=1).iter_all(read_ahead=2)
+        next(rows)
+        # The first page plus two pages of read-ahead
+        self.assertLessEqual(len(self.requested), 3)
+        rows.close()
+
+
+class ObjectsTestCase(ChefTestCase):
+    ROWS = [
+        {'name': 'web1', 'json_class': 'Chef::Node', 'chef_environment': 'prod', 'run_list': ['role[web]'],
+         'automatic': {'fqdn': 'web1.example.com'}, 'normal': {'tags': ['blue']}},
+        None,
+        {'name': 'data_bag_item_users_alice', 'json_class': 'Chef::DataBagItem', 'data_bag': 'users',
+         'raw_data': {'id': 'alice', 'shell': '/bin/zsh'}},
+        {'name': 'web', 'json_class': 'Chef::Role', 'run_list': ['recipe[nginx]']},
+        {'name': 'web2', 'json_class': 'Chef::Node', 'run_list': [], 'normal': {}},
+    ]
+
+    def setUp(self):
+        super(ObjectsTestCase, self).setUp()
+        self.api = test_chef_api()
+        self.search = Search('node', api=self.api)
+        self.search._data = {'total': 4, 'start': 0, 'rows': copy.deepcopy(self.ROWS)}
+
+    def test_objects(self):
+        node, item, role, node2 = self.search.objects()
+        self.assertIsInstance(node, Node)
+        self.assertEqual(node.name, 'web1')
+        self.assertEqual(node.url, '/nodes/web1')
+        self.assertIs(node.api, self.api)
+        self.assertTrue(node.exists)
+        self.assertFalse(node.lazy)
+        self.assertEqual(node['fqdn'], 'web1.example.com')
+        self.assertEqual(node.chef_environment, 'prod')
+        self.assertEqual(node2.chef_environment, '_default')
+        self.assertEqual(node.changes, [])
+        node.normal['tags'] = []
+        self.assertEqual(node.changes, ['normal.tags'])
+        self.assertIsInstance(item, DataBagItem)
+        self.assertEqual(item.name, 'alice')
+        self.assertEqual(item.url, '/data/users/alice')
+        self.assertEqual(item._bag, 'users')
+        self.assertEqual(item['shell'], '/bin/zsh')
+        self.assertIsInstance(role, Role)
+        self.assertEqual(role.run_list, ['recipe[nginx]'])
+
+    def test_same_as_rows(self):
+        for obj, row in zip(self.search.objects(), [row for row in self.search if row is not None]):
+            self.assertIs(obj.__class__, row.object.__class__)
+            self.assertEqual(obj.url, row.object.url)
+            self.assertEqual(obj.to_dict(), row.object.to_dict())
+
+    def test_api_version_checked_once(self):
+        with mock.patch.object(Node, '_check_api_version') as check:
+            self.search.objects()
+        check.assert_called_once_with(self.api)
+
+    def test_unknown_class(self):
+        self.search._data['rows'].append({'name': 'x', 'json_class': 'Chef::Nope'})
+        with self.assertRaises(ValueError):
+            self.search.objects()
+
+    def test_partial(self):
+        search = Search('node', api=test_chef_api(version='12.0.0'), keys={'ip': ['ipaddress']})
+        with self.assertRaises(ValueError):
+            search.objects()
+
+
+class PartialSearchTestCase(ChefTestCase):
+    def setUp(self):
+        super(PartialSearchTestCase, self).setUp()
+        self.api = test_chef_api(version='12.0.0')
+
+    def test_partial(self):
+        keys = {'ip': ['ipaddress'], 'name': ['name']}
+        result = {'total': 1, 'start': 0, 'rows': [
+            {'url': 'https://chef/nodes/web1', 'data': {'ip': '10.0.0.1', 'name': 'web1'}},
+        ]}
+        with mock.patch.object(self.api, 'api_request', return_value=result) as api_request:
+            s = Search('node', 'roles:web', api=self.api, keys=keys)
+            self.assertEqual(s[0], {'ip': '10.0.0.1', 'name': 'web1'})
+            api_request.assert_called_once_with('POST', s.url, data=keys)
+
+    def test_partial_chained(self):
+        keys = {'ip': ['ipaddress']}
+        s = Search('node', api=self.api, keys=keys).query('roles:web').rows(10).start(5)
+        self.assertEqual(s.keys, keys)
+        self.assertEqual(s._args, {'q': 'roles:web', 'rows': 10, 'start': 5})
+
+    def test_partial_old_server(self):
+        with self.assertRaises(ChefAPIVersionError):
+            Search('node', api=test_chef_api(), keys={'ip': ['ipaddress']})
+
+    def test_partial_search_error(self):
+        # Errors other than a rejected partial search are raised
+        api = test_chef_api()
+        with mock.patch.object(api, 'api_request', side_effect=ChefServerError('Boom', code=500)):
+            with self.assertRaises(ChefServerError):
+                _partial_search('node', '*:*', {'ip': ['ipaddress']}, api=api)
+        self.assertNotIn(api, search_module._partial_support)
+
+
+class StreamTestCase(ChefTestCase):
+    def test_stream(self):
+        body = b'{"total": 2, "start": 0, "rows": [{"name": "a"}, null, {"name": "b"}]}'
+        response = mock_response(200, body)
+        with mock.patch.object(self.api, '_request', return_value=response) as _request:
+            s = Search('node')
+            self.assertEqual([row['name'] for row in s.stream()], ['a', 'b'])
+            self.assertTrue(_request.call_args[1]['stream'])
+        self.assertFalse(hasattr(s, '_data'))
+
+    def test_stream_partial(self):
+        api = test_chef_api(version='12.0.0')
+        body = b'{"total": 1, "start": 0, "rows": [{"url": "x", "data": {"ip": "10.0.0.1"}}]}'
+        with mock.patch.object(api, '_request', return_value=mock_response(200, body)) as _request:
+            rows = list(Search('node', api=api, keys={'ip': ['ipaddress']}).stream())
+            self.assertEqual(_request.call_args[0][0], 'POST')
+        self.assertEqual(rows, [{'ip': '10.0.0.1'}])
@@ -1,26 +1,338 @@
 from __future__ import absolute_import
+import codecs
+import os
+import re
 import types
 try:
     import json
 except ImportError:
     import simplejson as json
 
+import six
+
 def maybe_call(x):
     if callable(x):
         return x()
     return x
 
+# Conversion functions registered with register_type(), and the function
+# resolved for each concrete type seen so far
+_converters = {}
+_resolved = {}
+
+def register_type(cls, fn):
+    """Register a function converting instances of ``cls``, or of any
+    subclass, into JSON-compatible values. This is used by every backend and
+    is faster than probing each object for ``to_dict``/``to_list``.
+
+    .. versionadded:: 0.4
+    """
+    _converters[cls] = fn
+    _resolved.clear()
+
+def _convert_generic(obj):
+    if hasattr(obj, 'to_dict'):
+        return maybe_call(obj.to_dict)
+    elif hasattr(obj, 'to_list'):
+        return maybe_call(obj.to_list)
+    elif isinstance(obj, types.GeneratorType):
+        return list(obj)
+    raise TypeError('%r is not JSON serializable' % (obj,))
+
+def to_json(obj):
+    """Convert an object the JSON backends don't know about into one they
+    do, or raise :exc:`TypeError`.
+    """
+    cls = type(obj)
+    fn = _resolved.get(cls)
+    if fn is None:
+        for base in cls.__mro__:
+            if base in _converters:
+                fn = _converters[base]
+                break
+        else:
+            fn = _convert_generic
+        _resolved[cls] = fn
+    return fn(obj)
+
 class JSONEncoder(json.JSONEncoder):
     """Custom encoder to allow arbitrary classes."""
 
     def default(self, obj):
-        if hasattr(obj, 'to_dict'):
-            return maybe_call(obj.to_dict)
-        elif hasattr(obj, 'to_list'):
-            return maybe_call(obj.to_list)
-        elif isinstance(obj, types.GeneratorType):
-            return list(obj)
-        return super(JSONEncoder, self).default(obj)
-
-loads = json.loads
-dumps = lambda obj, **kwargs: json.dumps(obj, cls=JSONEncoder, **kwargs)
+        try:
+            return to_json(obj)
+        except TypeError:
+            return super(JSONEncoder, self).default(obj)
+
+
+def _stdlib_loads(s):
+    if isinstance(s, six.binary_type):
+        s = s.decode('utf-8')
+    return json.loads(s)
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, cls=JSONEncoder)
+
+def _load_orjson():
+    import orjson
+    option = orjson.OPT_NON_STR_KEYS
+    def dumpb(obj):
+        return orjson.dumps(obj, default=to_json, option=option)
+    return orjson.loads, lambda obj: dumpb(obj).decode('utf-8'), dumpb
+
+def _load_rapidjson():
+    import rapidjson
+    def dumps(obj):
+        return rapidjson.dumps(obj, default=to_json)
+    return rapidjson.loads, dumps, None
+
+def _load_ujson():
+    import ujson
+    def dumps(obj):
+        return ujson.dumps(obj, default=to_json)
+    # Older ujson releases have no default hook
+    dumps({})
+    return ujson.loads, dumps, None
+
+def _load_stdlib():
+    return _stdlib_loads, _stdlib_dumps, None
+
+# In order of preference
+backends = [
+    ('orjson', _load_orjson),
+    ('rapidjson', _load_rapidjson),
+    ('ujson', _load_ujson),
+    ('json', _load_stdlib),
+]
+
+backend = None
+_loads = _dumps = _dumpb = None
+
+def use(name=None):
+    """Select the JSON library used to encode and decode API data. With no
+    name, the first available of orjson, rapidjson, ujson and the standard
+    library :mod:`json` is used. The default can also be chosen with the
+    ``PYCHEF_JSON_BACKEND`` environment variable. Returns the backend name.
+
+    .. versionadded:: 0.4
+    """
+    global backend, _loads, _dumps, _dumpb
+    for backend_name, loader in backends:
+        if name is not None and name != backend_name:
+            continue
+        try:
+            _loads, _dumps, _dumpb = loader()
+        except (ImportError, TypeError):
+            if name is not None:
+                raise
+        else:
+            backend = backend_name
+            return backend
+    raise ValueError('Unknown JSON backend %s' % name)
+
+def loads(s):
+    try:
+        return _loads(s)
+    except ValueError:
+        if backend == 'json':
+            raise
+        # The stdlib is more permissive, e.g. with NaN
+        return _stdlib_loads(s)
+
+def dumps(obj, **kwargs):
+    if not kwargs and backend != 'json':
+        try:
+            return _dumps(obj)
+        except (TypeError, OverflowError, ValueError):
+            pass # Let the stdlib handle it, or raise a consistent error
+    return json.dumps(obj, cls=JSONEncoder, **kwargs)
+
+def dumpb(obj):
+    """Like :func:`dumps`, but return UTF-8 encoded bytes.
+
+    .. versionadded:: 0.4
+    """
+    if _dumpb is not None:
+        try:
+            return _dumpb(obj)
+        except (TypeError, OverflowError, ValueError):
+            pass
+    return dumps(obj).encode('utf-8')
+
+use(os.environ.get('PYCHEF_JSON_BACKEND') or None)
+
+
+class _StreamReader(object):
+    """Incrementally decode JSON text from an iterable of byte chunks."""
+
+    decoder = json.JSONDecoder()
+    whitespace = ' \t\n\r'
+    # Characters that can carry on a number raw_decode has already accepted
+    number_chars = '.eE+-'
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self):
+        for chunk in self.chunks:
+            if chunk:
+                self.buf += self.text.decode(chunk)
+                return
+        self.buf += self.text.decode(b'', True)
+        self.eof = True
+
+    def compact(self):
+        # Drop everything already decoded so memory is bounded by one value
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self.whitespace:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError('Unexpected end of JSON data')
+            self.compact()
+            self.read_more()
+
+    def expect(self, chars):
+        c = self.peek()
+        if c not in chars:
+            raise ValueError('Expected %r at position %s, found %r' % (chars, self.pos, c))
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self.eof:
+                    raise
+            else:
+                # A number is only complete once a delimiter follows it, as
+                # one split across chunks such as '1.' + '5' decodes as 1
+                # with the rest left over
+                if self.eof or not (isinstance(value, six.integer_types + (float,)) and
+                                    (end == len(self.buf) or self.buf[end] in self.number_chars)):
+                    self.pos = end
+                    return value
+            self.read_more()
+
+
+def iterload(chunks, stream=()):
+    """Incrementally decode a JSON object from an iterable of UTF-8 byte
+    chunks, such as :meth:`requests.Response.iter_content`. Yields a
+    ``(key, value)`` pair for each member of the top-level object as soon as
+    it has been read. Members named in ``stream`` that hold an array are
+    yielded one ``(key, item)`` pair per element instead, so only one element
+    needs to be held in memory at a time::
+
+        for key, value in iterload(response.iter_content(65536), stream=('rows',)):
+            if key == 'rows':
+                print value['name']
+
+    .. versionadded:: 0.4
+    """
+    reader = _StreamReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key in stream and reader.peek() == '[':
+            reader.pos += 1
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield key, reader.value()
+                    reader.compact()
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            yield key, reader.value()
+        reader.compact()
+        if reader.expect(',}') == '}':
+            return
+
+
+class Deferred(object):
+    """The undecoded JSON text of a member skipped by :func:`loads_deferred`.
+
+    .. versionadded:: 0.4
+    """
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return '<Deferred %d characters>' % len(self.text)
+
+    def load(self):
+        """Decode the text."""
+        return loads(self.text)
+
+register_type(Deferred, Deferred.load)
+
+_whitespace = re.compile(r'[ \t\n\r]*')
+# Finds where a value ends without building its objects
+_skip_decoder = json.JSONDecoder(object_pairs_hook=lambda pairs: None)
+
+
+def loads_deferred(s, defer=()):
+    """Decode a JSON object, except for the members named in ``defer``,
+    which are left as :class:`Deferred` text to be decoded when needed. A
+    member that is never used then costs only its text, rather than all the
+    objects it would decode to::
+
+        data = loads_deferred(response.content, defer=('automatic',))
+        print data['run_list']
+        automatic = data['automatic'].load()
+
+    .. versionadded:: 0.4
+    """
+    if isinstance(s, six.binary_type):
+        s = s.decode('utf-8')
+    decoder = _StreamReader.decoder
+    data = {}
+    pos = _whitespace.match(s).end()
+    if s[pos:pos+1] != '{':
+        raise ValueError('Expected an object at position %s' % pos)
+    pos = _whitespace.match(s, pos + 1).end()
+    if s[pos:pos+1] == '}':
+        pos += 1
+    else:
+        while True:
+            key, pos = decoder.raw_decode(s, _whitespace.match(s, pos).end())
+            if not isinstance(key, six.string_types):
+                raise ValueError('Expected a key at position %s' % pos)
+            pos = _whitespace.match(s, pos).end()
+            if s[pos:pos+1] != ':':
+                raise ValueError("Expected ':' at position %s" % pos)
+            start = _whitespace.match(s, pos + 1).end()
+            if key in defer:
+                pos = _skip_decoder.raw_decode(s, start)[1]
+                data[key] = Deferred(s[start:pos])
+            else:
+                data[key], pos = decoder.raw_decode(s, start)
+            pos = _whitespace.match(s, pos).end()
+            c = s[pos:pos+1]
+            pos += 1
+            if c == '}':
+                break
+            if c != ',':
+                raise ValueError("Expected ',' or '}' at position %s" % (pos - 1))
+    if _whitespace.match(s, pos).end() != len(s):
+        raise ValueError('Extra data at position %s' % pos)
+    return data
@@ -0,0 +1,49 @@
+import six
+
+
+def deep_merge(*dicts):
+    """Merge nested dicts, each one taking precedence over those before it,
+    the way Chef merges attribute precedence levels. Nested dicts are merged
+    key by key, while any other value, including lists, replaces whatever
+    the lower levels had under that key.
+
+    The merge is done without recursion, and a subtree found in only one of
+    the dicts is shared with the result rather than copied, so merging large
+    trees that rarely overlap is cheap. Only the returned dict and the
+    subtrees that had to be merged are new objects; copy the result before
+    modifying anything deeper in it.
+
+    Example::
+
+        >>> merged = deep_merge({'a': {'b': 1, 'c': 2}}, {'a': {'b': 3}, 'd': [4]})
+        >>> merged['a']
+        {'b': 3, 'c': 2}
+        >>> merged['d']
+        [4]
+
+    .. versionadded:: 0.4
+    """
+    result = {}
+    stack = [(result, [d for d in dicts if d])]
+    while stack:
+        dest, sources = stack.pop()
+        # The dicts to merge under each key, in order of precedence
+        merges = {}
+        for source in sources:
+            for key, value in six.iteritems(source):
+                if isinstance(value, dict):
+                    parts = merges.get(key)
+                    if parts is None:
+                        merges[key] = [value]
+                    else:
+                        parts.append(value)
+                else:
+                    merges.pop(key, None)
+                    dest[key] = value
+        for key, parts in six.iteritems(merges):
+            if len(parts) == 1:
+                dest[key] = parts[0]
+            else:
+                dest[key] = child = {}
+                stack.append((child, parts))
+    return result